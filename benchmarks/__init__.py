@@ -0,0 +1,10 @@
+#  Author: micr0softDrestlife
+"""End-to-end benchmark suite: capture → preprocess → OCR → AI.
+
+    python -m benchmarks.run                  # 运行并与 benchmarks/baseline.json 比较
+    python -m benchmarks.run --save-baseline  # 把本次结果保存为新的基线
+
+题目截图由 corpus.json 中的标准答案文本在运行时按几种分辨率渲染出来（中文需要本机有
+中文字体，没有时跳过中文题目）；截图通过 FakeScreenshotManager 提供，OCR 使用真实的
+OCREngine，AI 请求发给本地的 StubAIServer（模拟 Ollama 和 OpenAI 兼容接口，可配置延迟）。
+"""
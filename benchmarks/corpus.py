@@ -0,0 +1,96 @@
+#  Author: micr0softDrestlife
+"""Benchmark corpus: question screenshots rendered from ground-truth text."""
+
+import glob
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus.json')
+
+# 按顺序尝试的字体（Windows / macOS / Linux）
+LATIN_FONTS = [
+    'C:/Windows/Fonts/arial.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    'DejaVuSans.ttf',
+]
+CJK_FONTS = [
+    'C:/Windows/Fonts/msyh.ttc',
+    'C:/Windows/Fonts/simhei.ttf',
+    'C:/Windows/Fonts/simsun.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    '/System/Library/Fonts/STHeiti Medium.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+]
+
+
+@dataclass
+class Sample:
+    id: str
+    lang: str
+    resolution: str
+    truth: str
+    image: np.ndarray  # RGB uint8，和 ScreenshotManager.capture_region 的返回值一致
+
+
+def find_font(lang):
+    """返回可用字体文件路径；中文找不到字体时返回 None"""
+    candidates = CJK_FONTS if lang.startswith('chi') else LATIN_FONTS + CJK_FONTS
+    for path in candidates:
+        try:
+            ImageFont.truetype(path, 12)
+            return path
+        except OSError:
+            continue
+    if lang.startswith('chi'):
+        # 兜底：系统字体目录中任何名字像中文字体的文件
+        for pattern in ('/usr/share/fonts/**/*CJK*', '/usr/share/fonts/**/*wqy*'):
+            for path in glob.glob(pattern, recursive=True):
+                return path
+    return None
+
+
+def render(text, width, font_size, font_path, dark=False):
+    """把多行文本渲染成类似答题界面的截图（左上留白，行距 1.5 倍字高）"""
+    font = ImageFont.truetype(font_path, font_size) if font_path else ImageFont.load_default(font_size)
+    lines = text.splitlines()
+    line_height = int(font_size * 1.5)
+    margin = font_size
+    height = margin * 2 + line_height * len(lines)
+    bg, fg = ((32, 33, 36), (232, 234, 237)) if dark else ((250, 250, 250), (20, 20, 20))
+    image = Image.new('RGB', (width, height), bg)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((margin, margin + i * line_height), line, font=font, fill=fg)
+    return np.asarray(image)
+
+
+def load_corpus(path=CORPUS_PATH, langs=None, resolutions=None):
+    """渲染语料，返回 (samples, skipped)。skipped 为因缺少字体而跳过的题目 id 列表"""
+    with open(path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    samples, skipped = [], []
+    fonts = {}
+    for question in corpus['questions']:
+        lang = question['lang']
+        if langs and lang not in langs:
+            continue
+        if lang not in fonts:
+            fonts[lang] = find_font(lang)
+        if fonts[lang] is None and lang.startswith('chi'):
+            skipped.append(question['id'])
+            continue
+        for res in corpus['resolutions']:
+            if resolutions and res['name'] not in resolutions:
+                continue
+            image = render(question['text'], res['width'], res['font_size'], fonts[lang])
+            samples.append(Sample(question['id'], lang, res['name'], question['text'], image))
+    return samples, skipped
@@ -0,0 +1,31 @@
+#  Author: micr0softDrestlife
+"""Stand-in for ScreenshotManager that serves pre-rendered frames."""
+
+
+class FakeScreenshotManager:
+    """与 core.screenshot.ScreenshotManager 接口相同，但从给定的帧列表中依次返回截图"""
+
+    def __init__(self, frames=None):
+        self.frames = list(frames or [])
+        self.selected_region = None
+        self.regions = {}
+        self._index = 0
+
+    def set_frames(self, frames):
+        self.frames = list(frames)
+        self._index = 0
+
+    def set_region(self, region):
+        self.selected_region = tuple(region) if region else None
+        self.regions = {'region1': self.selected_region} if region else {}
+
+    def split_regions(self, frame):
+        """帧列表中的每一帧都视为唯一的区域"""
+        return {'region1': frame} if frame is not None else {}
+
+    def capture_region(self, reuse=False):
+        if not self.frames:
+            return None
+        frame = self.frames[self._index % len(self.frames)]
+        self._index += 1
+        return frame
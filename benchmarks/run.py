@@ -0,0 +1,260 @@
+#  Author: micr0softDrestlife
+"""Run the end-to-end benchmark and compare it with a stored baseline.
+
+    python -m benchmarks.run --rounds 5 --provider openai --first-token-delay 0.3
+    python -m benchmarks.run --save-baseline
+
+每个阶段（capture / preprocess / ocr / ai_first_token / ai_total / end_to_end）报告
+p50/p95/p99（毫秒）；OCR 准确率为去掉空白后的字符准确率（1 - 编辑距离 / 标准答案长度）。
+与基线相比 p50/p95 变慢超过 --tolerance，或平均准确率下降超过 --accuracy-drop 时视为回归，
+退出码为 1。
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import platform
+import sys
+import time
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.corpus import load_corpus
+from benchmarks.fake_capture import FakeScreenshotManager
+from benchmarks.stub_server import StubAIServer
+from config.settings import AppConfig
+from core.ai_client import get_ai_client
+from core.ocr_engine import OCREngine
+from core.ocr_pool import shutdown_ocr_pool
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+STAGES = ('capture', 'preprocess', 'ocr', 'ai_first_token', 'ai_total', 'end_to_end')
+SYSTEM_PROMPT = "快速回答下面问题，不需要任何解释"
+
+
+def percentile(values, q):
+    """线性插值的百分位数；values 为空时返回 None"""
+    if not values:
+        return None
+    return float(np.percentile(np.asarray(values, dtype=float), q))
+
+
+def summarize(seconds):
+    """把一组耗时（秒）汇总成毫秒为单位的统计"""
+    ms = [s * 1000.0 for s in seconds]
+    return {
+        'n': len(ms),
+        'mean': (sum(ms) / len(ms)) if ms else None,
+        'p50': percentile(ms, 50),
+        'p95': percentile(ms, 95),
+        'p99': percentile(ms, 99),
+    }
+
+
+def levenshtein(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(text, truth):
+    """去掉所有空白后比较（tesseract 会在中文字符之间插入空格）"""
+    text = ''.join((text or '').split())
+    truth = ''.join(truth.split())
+    if not truth:
+        return 1.0 if not text else 0.0
+    return max(0.0, 1.0 - levenshtein(text, truth) / float(len(truth)))
+
+
+def bench_config(server, provider='ollama', base=None):
+    """把 AI 请求指向本地 stub；关闭两级缓存，否则第二轮以后测到的都是缓存"""
+    config = base or AppConfig()
+    return dataclasses.replace(
+        config,
+        AI_PROVIDER='ollama' if provider == 'ollama' else 'deepseek',
+        OLLAMA_BASE_URL=server.url,
+        DEEPSEEK_API_URL=server.openai_url,
+        DEEPSEEK_API_KEY='benchmark',
+        AI_HEDGE_PROVIDER='',
+        AI_CACHE_ENABLED=False,
+        OCR_CACHE_ENABLED=False,
+    )
+
+
+def ocr_available(engine):
+    """用一张空白图试跑一次 backend，tesseract 不可用时返回 (False, 原因)"""
+    try:
+        engine.backend.recognize(np.full((32, 32), 255, np.uint8), lang=engine.lang)
+        return True, ''
+    except Exception as e:
+        return False, str(e)
+
+
+def run_benchmark(rounds=3, provider='ollama', first_token_delay=0.05, token_delay=0.01,
+                  langs=None, resolutions=None, config=None, engine=None, log=print):
+    samples, skipped = load_corpus(langs=langs, resolutions=resolutions)
+    for qid in skipped:
+        log(f"跳过 {qid}：没有找到中文字体")
+
+    capture = FakeScreenshotManager()
+    capture.set_region((0, 0, 1, 1))
+    timings = {stage: [] for stage in STAGES}
+    accuracy = {}
+
+    with StubAIServer(first_token_delay=first_token_delay, token_delay=token_delay) as server:
+        cfg = bench_config(server, provider, base=config)
+        if engine is None:
+            engine = OCREngine(cfg.TESSERACT_PATH, cfg)
+        client = get_ai_client(cfg)
+        ocr_ok, reason = ocr_available(engine)
+        if not ocr_ok:
+            log(f"OCR 不可用（{reason}），只测预处理，AI 阶段使用标准答案文本")
+
+        for round_no in range(rounds):
+            for sample in samples:
+                capture.set_frames([sample.image])
+                started = time.perf_counter()
+                frame = capture.capture_region()
+                captured = time.perf_counter()
+
+                if ocr_ok:
+                    text = engine.extract_text(frame)
+                    recognized = time.perf_counter()
+                    pre = sum(engine.pipeline.last_timings.values())
+                    timings['preprocess'].append(pre)
+                    timings['ocr'].append(max(0.0, recognized - captured - pre))
+                    if round_no == 0:
+                        accuracy[f"{sample.id}@{sample.resolution}"] = char_accuracy(text, sample.truth)
+                else:
+                    engine.preprocess_image(frame)
+                    recognized = time.perf_counter()
+                    timings['preprocess'].append(recognized - captured)
+                    text = sample.truth
+
+                first = None
+                for _ in client.stream_response(text, system_prompt=SYSTEM_PROMPT):
+                    if first is None:
+                        first = time.perf_counter()
+                finished = time.perf_counter()
+
+                timings['capture'].append(captured - started)
+                timings['ai_first_token'].append((first or finished) - recognized)
+                timings['ai_total'].append(finished - recognized)
+                timings['end_to_end'].append(finished - started)
+
+    return {
+        'meta': {
+            'rounds': rounds,
+            'provider': provider,
+            'first_token_delay': first_token_delay,
+            'token_delay': token_delay,
+            'samples': len(samples),
+            'skipped': skipped,
+            'ocr_available': ocr_ok,
+            'ocr_backend': getattr(engine.backend, 'name', type(engine.backend).__name__),
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'stages': {stage: summarize(values) for stage, values in timings.items()},
+        'accuracy': {
+            'mean': (sum(accuracy.values()) / len(accuracy)) if accuracy else None,
+            'samples': accuracy,
+        },
+    }
+
+
+def compare(report, baseline, tolerance=0.2, accuracy_drop=0.02, min_delta_ms=1.0):
+    """返回回归描述列表。绝对差小于 min_delta_ms 的变化视为噪声"""
+    regressions = []
+    for stage, current in report['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base:
+            continue
+        for q in ('p50', 'p95'):
+            old, new = base.get(q), current.get(q)
+            if old is None or new is None:
+                continue
+            if new > old * (1.0 + tolerance) and new - old > min_delta_ms:
+                regressions.append(f"{stage} {q}: {old:.1f}ms -> {new:.1f}ms (+{(new / old - 1) * 100 if old else 0:.0f}%)")
+
+    old_acc = (baseline.get('accuracy') or {}).get('mean')
+    new_acc = (report.get('accuracy') or {}).get('mean')
+    if old_acc is not None and new_acc is not None and new_acc < old_acc - accuracy_drop:
+        regressions.append(f"OCR准确率: {old_acc:.3f} -> {new_acc:.3f}")
+    return regressions
+
+
+def format_report(report, regressions=None):
+    lines = [f"{'stage':<16}{'n':>5}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)"]
+    for stage, s in report['stages'].items():
+        if not s['n']:
+            continue
+        lines.append(f"{stage:<16}{s['n']:>5}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}")
+
+    acc = report.get('accuracy') or {}
+    if acc.get('mean') is not None:
+        lines.append(f"OCR准确率（平均）: {acc['mean']:.3f}")
+        for key, value in sorted(acc.get('samples', {}).items()):
+            lines.append(f"  {key:<28}{value:.3f}")
+    else:
+        lines.append("OCR准确率: 未测量（OCR 不可用）")
+
+    if regressions is not None:
+        if regressions:
+            lines.append("回归:")
+            lines.extend(f"  {r}" for r in regressions)
+        else:
+            lines.append("与基线相比没有回归")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='capture → preprocess → OCR → AI 端到端基准测试')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--provider', choices=('ollama', 'openai'), default='ollama')
+    parser.add_argument('--first-token-delay', type=float, default=0.05)
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--lang', action='append', help='只测指定语言（eng / chi_sim），可重复')
+    parser.add_argument('--resolution', action='append', help='只测指定分辨率（small / medium / large），可重复')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--accuracy-drop', type=float, default=0.02)
+    parser.add_argument('--json', help='把完整报告写入该文件')
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        rounds=args.rounds, provider=args.provider,
+        first_token_delay=args.first_token_delay, token_delay=args.token_delay,
+        langs=args.lang, resolutions=args.resolution
+    )
+    shutdown_ocr_pool()
+
+    regressions = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.accuracy_drop)
+    print(format_report(report, regressions))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#  Author: micr0softDrestlife
+"""Measure startup: time-to-window and time-to-first-Solve-ready.
+
+    python -m benchmarks.startup                # 无界面：导入 main.py、加载组件、预热
+    python -m benchmarks.startup --gui          # 同时启动图形界面（python main.py --startup-probe）
+
+每一轮都在新的 Python 进程中运行（冷启动），报告各里程碑的 p50/max（毫秒）：
+    import_main   导入 main.py 完成（不应加载 cv2 / numpy / requests 等重模块）
+    window        主窗口进入事件循环（仅 --gui）
+    components    OCR 引擎 / AI 客户端 / 截图模块创建完成
+    solve_ready   tesseract 与 AI 连接预热完成
+    process       从启动子进程到输出结果的总时间（含解释器启动）
+超过 BUDGET_MS 中的预算时退出码为 1；test_startup.py 用同样的预算检查启动时间。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import percentile
+from benchmarks.stub_server import StubAIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动预算（毫秒）
+BUDGET_MS = {
+    'import_main': 300.0,
+    'window': 1000.0,
+    'solve_ready': 8000.0,
+}
+
+# 在子进程中执行：模拟图形界面启动时主线程和后台加载线程做的事，但不创建窗口
+_HEADLESS_PROBE = r'''
+import dataclasses, json, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import main
+from core import startup
+startup.clock.started = started
+startup.clock.mark('import_main')
+heavy = [name for name in startup.HEAVY_MODULES if name in sys.modules]
+config = dataclasses.replace(main.AppConfig(), **json.loads(sys.argv[2]))
+ocr_engine, ai_client, _ = startup.load_components(config)
+startup.warm_up(ocr_engine, ai_client)
+print(json.dumps({'milestones': startup.clock.milestones, 'heavy_modules': heavy}), flush=True)
+'''
+
+
+def _last_json_line(output):
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if line.startswith('{'):
+            return json.loads(line)
+    raise RuntimeError(f"启动探针没有输出结果: {output[-500:]}")
+
+
+def probe_headless(overrides=None, timeout=60):
+    """在新进程中导入 main.py 并加载、预热组件，返回 {'milestones': {...}, 'heavy_modules': [...]}"""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', _HEADLESS_PROBE, ROOT, json.dumps(overrides or {})],
+        capture_output=True, text=True, timeout=timeout, cwd=ROOT
+    )
+    result = _last_json_line(proc.stdout)
+    result['milestones']['process'] = round((time.perf_counter() - started) * 1000.0, 1)
+    return result
+
+
+def probe_gui(timeout=60):
+    """启动 python main.py --startup-probe，可以 Solve 时它会输出里程碑并退出"""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'main.py'), '--startup-probe'],
+        capture_output=True, text=True, timeout=timeout, cwd=ROOT
+    )
+    milestones = _last_json_line(proc.stdout)
+    milestones['process'] = round((time.perf_counter() - started) * 1000.0, 1)
+    return {'milestones': milestones}
+
+
+def over_budget(milestones, budget=None):
+    """返回超出预算的里程碑 {name: (实际, 预算)}"""
+    budget = BUDGET_MS if budget is None else budget
+    return {name: (milestones[name], limit) for name, limit in budget.items()
+            if name in milestones and milestones[name] > limit}
+
+
+def summarize_runs(runs):
+    names = []
+    for run in runs:
+        names.extend(name for name in run if name not in names)
+    return {name: {'p50': percentile([r[name] for r in runs if name in r], 50),
+                   'max': max(r[name] for r in runs if name in r)} for name in names}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='启动时间基准：窗口出现与可以 Solve 的时间')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--gui', action='store_true', help='同时测量图形界面启动（需要显示器）')
+    parser.add_argument('--json', help='把结果写入该文件')
+    args = parser.parse_args(argv)
+
+    headless, gui = [], []
+    with StubAIServer() as server:
+        # AI 预连接发给本地 stub，不依赖网络
+        overrides = {'AI_PROVIDER': 'ollama', 'OLLAMA_BASE_URL': server.url, 'AI_HEDGE_PROVIDER': ''}
+        for _ in range(args.rounds):
+            result = probe_headless(overrides)
+            if result['heavy_modules']:
+                print(f"警告: 导入 main.py 时加载了 {', '.join(result['heavy_modules'])}")
+            headless.append(result['milestones'])
+    if args.gui:
+        for _ in range(args.rounds):
+            gui.append(probe_gui()['milestones'])
+
+    report = {'headless': summarize_runs(headless)}
+    if gui:
+        report['gui'] = summarize_runs(gui)
+    failed = {}
+    for mode, stats in report.items():
+        print(f"[{mode}]")
+        for name, s in stats.items():
+            limit = BUDGET_MS.get(name)
+            flag = '  超出预算' if limit is not None and s['p50'] > limit else ''
+            budget = f" (预算 {limit:.0f})" if limit is not None else ''
+            print(f"  {name:<12} p50 {s['p50']:8.1f}  max {s['max']:8.1f}{budget}{flag}")
+        failed.update(over_budget({name: s['p50'] for name, s in stats.items()}))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
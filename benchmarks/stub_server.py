@@ -0,0 +1,214 @@
+#  Author: micr0softDrestlife
+"""Local stub of the Ollama and OpenAI-compatible HTTP APIs.
+
+支持的接口：
+    GET  /, /api/tags                 （预连接 / 健康检查）
+    GET  /api/ps                      Ollama，当前加载在内存中的模型
+    POST /api/generate                Ollama，stream 默认为 true（NDJSON）；不带 prompt 时只加载模型，
+                                      keep_alive 为 0 时卸载模型
+    POST /v1/chat/completions         OpenAI 兼容，stream=true 时返回 SSE
+
+first_token_delay 模拟模型开始输出前的等待，token_delay 模拟逐段输出的间隔，
+load_delay 模拟模型未加载时的加载时间（stub.loaded 可以直接改为 False 模拟被卸载）。
+stub.disconnects 为接下来不返回任何字节就断开的 POST 数（模拟被服务端关闭的 keep-alive 连接），
+stub.fail_statuses 为接下来的 POST 依次返回的错误状态码。
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'StubAI/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def stub(self):
+        return self.server.stub
+
+    def _send_json(self, obj, status=200):
+        data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path.startswith('/api/tags'):
+            self._send_json({'models': [{'name': self.stub.model}]})
+        elif self.path.startswith('/api/ps'):
+            models = [{'name': self.stub.model, 'model': self.stub.model}] if self.stub.loaded else []
+            self._send_json({'models': models})
+        else:
+            self._send_json({'status': 'ok'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'invalid json'}, status=400)
+            return
+        if self.stub.take_disconnect():
+            self.close_connection = True
+            return
+        self.stub.record(self.path, body)
+        status = self.stub.take_fail_status()
+        if status:
+            data = json.dumps({'error': f'status {status}'}).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        if self.path.rstrip('/').endswith('/api/generate'):
+            self._ollama(body)
+        elif self.path.rstrip('/').endswith('/chat/completions'):
+            self._openai(body)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def _ollama(self, body):
+        stub = self.stub
+        stub.load()
+        if body.get('keep_alive') == 0:
+            stub.loaded = False
+        if 'prompt' not in body:
+            self._send_json({'model': stub.model, 'response': '', 'done': True, 'done_reason': 'load'})
+            return
+        if not body.get('stream', True):
+            stub.wait_full()
+            self._send_json({'model': stub.model, 'response': stub.answer, 'done': True})
+            return
+        self._start_chunked('application/x-ndjson')
+        for chunk in stub.chunks():
+            line = json.dumps({'model': stub.model, 'response': chunk, 'done': False}, ensure_ascii=False)
+            self._write_chunk((line + '\n').encode('utf-8'))
+        self._write_chunk((json.dumps({'model': stub.model, 'response': '', 'done': True}) + '\n').encode('utf-8'))
+        self._end_chunked()
+
+    def _openai(self, body):
+        stub = self.stub
+        if not body.get('stream', False):
+            stub.wait_full()
+            self._send_json({
+                'model': stub.model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': stub.answer}}],
+            })
+            return
+        self._start_chunked('text/event-stream')
+        for chunk in stub.chunks():
+            event = {'model': stub.model, 'choices': [{'index': 0, 'delta': {'content': chunk}}]}
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+
+class StubAIServer:
+    def __init__(self, answer='答案：B', model='stub-model', first_token_delay=0.0, token_delay=0.0,
+                 chunk_size=2, load_delay=0.0, host='127.0.0.1', port=0):
+        self.answer = answer
+        self.model = model
+        self.first_token_delay = float(first_token_delay)
+        self.token_delay = float(token_delay)
+        self.chunk_size = max(1, int(chunk_size))
+        self.load_delay = float(load_delay)
+        self.loaded = False
+        self.loads = 0
+        self.requests = []
+        self.disconnects = 0
+        self.fail_statuses = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_url(self):
+        return f"{self.url}/v1"
+
+    def record(self, path, body):
+        with self._lock:
+            self.requests.append((path, body))
+
+    def take_disconnect(self):
+        with self._lock:
+            if self.disconnects > 0:
+                self.disconnects -= 1
+                return True
+            return False
+
+    def take_fail_status(self):
+        with self._lock:
+            return self.fail_statuses.pop(0) if self.fail_statuses else None
+
+    def load(self):
+        """模型未加载时先等 load_delay 秒；加载期间到达的请求一起等待"""
+        with self._load_lock:
+            if not self.loaded:
+                self.loads += 1
+                time.sleep(self.load_delay)
+                self.loaded = True
+
+    def chunks(self):
+        """按 chunk_size 切分回答并模拟输出间隔"""
+        time.sleep(self.first_token_delay)
+        for i in range(0, len(self.answer), self.chunk_size):
+            if i:
+                time.sleep(self.token_delay)
+            yield self.answer[i:i + self.chunk_size]
+
+    def wait_full(self):
+        # 非流式请求：等整段回答“生成”完再返回
+        pieces = max(1, -(-len(self.answer) // self.chunk_size))
+        time.sleep(self.first_token_delay + self.token_delay * (pieces - 1))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-ai-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
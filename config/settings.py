@@ -1,20 +1,28 @@
 #  Author: micr0softDrestlife
 import os
 from dataclasses import dataclass
+from typing import Optional
 # dataclass可以自动为类生成特殊方法如 __init__ 和 __repr__，使代码更简洁易读
 @dataclass
 class AppConfig:
     """应用程序配置类，存储各种配置选项"""
 
     # AI 提供方配置：'ollama'/'qianwen'/'qianwen'/'deepseek'/''。
-    ## 可缩写：'qw'/'ds'
+    ## 可缩写：'qw'/'ds'；远程提供方没有填写 API key 时改用 Ollama
     # 默认使用 Ollama 本地服务
-    AI_PROVIDER: str = 'ds'
+    AI_PROVIDER: str = 'ollama'
     
     # Ollama 配置
     ## 默认模型供应商与模型
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "qwen2.5-coder:7b"  
+    # 模型常驻：OLLAMA_KEEP_ALIVE 随每个请求发送，为最后一次请求后模型继续留在内存中的时长
+    ## 例如 '30m'、'1h'，'-1' 表示一直常驻，留空使用服务端默认（5 分钟）
+    OLLAMA_KEEP_ALIVE: str = '30m'
+    # 启动时在后台把模型加载到内存；"开始答题"开关打开期间每 OLLAMA_KEEP_WARM_INTERVAL 秒
+    ## 查询一次 /api/ps 并刷新常驻时间（模型已被卸载时重新加载），0 表示不做周期保活
+    OLLAMA_PRELOAD: bool = True
+    OLLAMA_KEEP_WARM_INTERVAL: float = 60.0
 
     # 千问 相关配置
     # qw模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
@@ -28,17 +36,114 @@ class AppConfig:
     DEEPSEEK_API_KEY: str = ""
     DEEPSEEK_MODEL: str = "deepseek-chat" # 默认使用v3-non-reasoner
 
+    # 对冲请求：填写备用提供方（同 AI_PROVIDER 的取值）后，主提供方超过 AI_HEDGE_DELAY 秒
+    ## 仍未返回可用回答时，同时向备用提供方发送同一问题，先返回的胜出。留空表示关闭
+    AI_HEDGE_PROVIDER: str = ''
+    AI_HEDGE_DELAY: float = 2.0
+
+    # AI HTTP 连接配置：每个客户端持有一个 keep-alive 连接池
+    ## 连接超时/读取超时（秒）；连接建立失败、没有收到任何响应就被断开或返回 429/503 时
+    ## 按 Retry-After 或指数退避重试；收到响应后的读取超时和其他 5xx 不重试（避免同一问题被重复生成和计费）
+    AI_CONNECT_TIMEOUT: float = 5.0
+    AI_READ_TIMEOUT: float = 120.0
+    AI_MAX_RETRIES: int = 2
+    AI_RETRY_BACKOFF: float = 0.5
+    AI_POOL_SIZE: int = 4
+
+    # AI 回答缓存：键为 提供方+模型+规范化后的问题+system prompt，保存在 SQLite 中
+    ## TTL 单位为秒；超过条目上限时淘汰最久未使用的回答；错误提示不会被缓存
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_PATH: str = os.path.join(os.path.expanduser('~'), '.ak_subject_one', 'ai_cache.sqlite3')
+    AI_CACHE_TTL: int = 12 * 3600
+    AI_CACHE_MAX_ENTRIES: int = 2000
+
+    # 发送前整理 OCR 文本（见 core/prompt.py）：去掉杂散符号、汉字间空格和界面按钮/计时等文字，选择题按每行一个选项重排
+    ## PROMPT_BOILERPLATE 为额外的整行正则（匹配的行会被删除）；关闭 PROMPT_COMPACT 时原样发送
+    PROMPT_COMPACT: bool = True
+    PROMPT_BOILERPLATE: Optional[list] = None
+    # 按题型（'choice'/'multi'/'judge'/'open'）限制回答的 token 数（OpenAI 兼容接口为 max_tokens，Ollama 为 num_predict）
+    ## 例如 {'open': 2048}；未填写的题型使用 core/prompt.py 中的默认值，简化模式使用 PROMPT_MAX_TOKENS_SIMPLIFY
+    PROMPT_MAX_TOKENS: Optional[dict] = None
+    PROMPT_MAX_TOKENS_SIMPLIFY: Optional[dict] = None
+
     # OCR 配置
     # 将相对路径解析为项目内的绝对路径，避免不同工作目录导致找不到可执行文件
     TESSERACT_PATH: str = os.path.abspath(# abspath打印当前工作目录中文件的绝对路径
         os.path.join(os.path.dirname(__file__), '..', 'te_exe', 'tesseract.exe')
     )
+    # tessdata 目录（进程内 libtesseract 需要显式指定模型路径）
+    TESSDATA_PATH: str = os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'te_exe', 'tessdata')
+    )
+    # OCR 后端：'auto' 优先使用常驻进程内的 libtesseract，不可用时回退到 'subprocess'（每次启动 tesseract 子进程）
+    ## 可选：'auto'/'capi'/'subprocess'
+    OCR_BACKEND: str = 'auto'
+    OCR_LANG: str = 'chi_sim+eng'
+    # OCR 预处理：预设 'default'（原流程）/'fast'（无双边滤波、Otsu阈值）/'accurate'/'none'
+    ## OCR_PREPROCESS_STAGES 非空时覆盖预设，例如 ['grayscale', ('upscale', {'target_width': 1600}), 'otsu']
+    OCR_PREPROCESS_PROFILE: str = 'default'
+    OCR_PREPROCESS_STAGES: Optional[list] = None
+    # 多预处理方案并行识别：各方案在进程池中同时运行，按 tesseract 词置信度取最优结果
+    ## 某个方案的平均置信度达到 OCR_CONFIDENCE_THRESHOLD 时不再等待其余方案；OCR_WORKERS 为 0 时按 CPU 核数
+    OCR_MULTI_VARIANT: bool = False
+    OCR_VARIANTS: Optional[list] = None
+    OCR_CONFIDENCE_THRESHOLD: float = 85.0
+    OCR_WORKERS: int = 0
+    # 版面分析：预处理后的图像超过 OCR_LAYOUT_MIN_PIXELS 像素时，先找出文字块并裁掉空白，
+    ## 再把各文字块分给 OCR 进程池同时识别，最后按阅读顺序拼接
+    ## 默认关闭：开启后启动时就要拉起 OCR 进程池，且分块识别的文字顺序、换行可能与整图识别不同
+    OCR_LAYOUT_ENABLED: bool = False
+    OCR_LAYOUT_MIN_PIXELS: int = 1200 * 600
+    # 增量识别：按行间空白把选区切成横向文字带并逐条哈希，只识别新出现或变化了的文字带，
+    ## 其余直接使用上次的识别结果（题目滚动、只换了选项时只识别变化的几行）；开启后代替版面分析
+    ## OCR_BAND_CACHE_ENTRIES 为记住的文字带数
+    OCR_INCREMENTAL: bool = False
+    OCR_BAND_CACHE_ENTRIES: int = 1024
+    # 语言路由：OCR_LANG 包含多种语言时，先识别一小条样本判断选区的主要文字，正式识别只用需要的模型；
+    ## 每个选区记住判断结果，用缩小后的语言识别出的平均词置信度低于 OCR_LANG_RECHECK_CONFIDENCE 时
+    ## 重新判断或改回完整的语言组合；默认关闭，样本条不代表整个选区时可能漏识别另一种语言
+    ## 改回完整语言组合的判断只保留 OCR_LANG_FALLBACK_FRAMES 次识别，之后重新判断
+    OCR_LANG_ROUTING: bool = False
+    OCR_LANG_RECHECK_CONFIDENCE: float = 60.0
+    OCR_LANG_FALLBACK_FRAMES: int = 20
+    # OCR 结果缓存：按条目数和文本字节数限制的 LRU；OCR_CACHE_PATH 非空时同时写入 SQLite 文件，重启后仍然有效
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_MAX_ENTRIES: int = 256
+    OCR_CACHE_MAX_BYTES: int = 4 * 1024 * 1024
+    OCR_CACHE_PATH: str = ''
+    # 推测识别：选好区域后（以及自动模式检测到变化但暂不 Solve 时）立即在后台OCR，结果与画面哈希一起保存；
+    ## 点击 Solve 时画面没有变化则跳过OCR直接调用AI
+    OCR_SPECULATIVE: bool = True
+
+    # 每次 Solve 的各阶段耗时（JSON Lines），文件超过 METRICS_LOG_MAX_BYTES 时轮转，保留 METRICS_LOG_BACKUPS 个旧文件
+    ## 留空表示不写日志；状态栏和 core.metrics.snapshot() 不受影响
+    METRICS_LOG_PATH: str = os.path.join(os.path.expanduser('~'), '.ak_subject_one', 'solves.jsonl')
+    METRICS_LOG_MAX_BYTES: int = 1024 * 1024
+    METRICS_LOG_BACKUPS: int = 3
+
+    # 本地 HTTP 服务（python main.py serve）：SERVER_WORKERS 为 OCR 进程数（0 为 CPU 核数），
+    ## 排队的请求超过 SERVER_QUEUE_SIZE 时返回 429
+    SERVER_HOST: str = '127.0.0.1'
+    SERVER_PORT: int = 8765
+    SERVER_WORKERS: int = 0
+    SERVER_QUEUE_SIZE: int = 16
+    SERVER_REQUEST_TIMEOUT: float = 180.0
+
+    # 截图：'auto' 在 Linux X11 下使用共享内存（XShm）截图，否则使用 PIL.ImageGrab；
+    ## 'file' 从 CAPTURE_SOURCE（目录 / glob / 图片路径）依次读取帧，用于测试和回放
+    CAPTURE_BACKEND: str = 'auto'
+    CAPTURE_SOURCE: str = ''
 
     # 界面配置
     WINDOW_WIDTH: int = 400
     WINDOW_HEIGHT: int = 300
     WINDOW_ALPHA: float = 0.9
 
+    # 自动模式配置：轮询频率(Hz)、触发前需要连续稳定的帧数、缩略图单像素灰度差阈值
+    WATCH_POLL_HZ: float = 4.0
+    WATCH_STABLE_FRAMES: int = 3
+    WATCH_DIFF_THRESHOLD: int = 8
+
     # 热键配置
     SCREENSHOT_HOTKEY: str = 'ctrl+alt+r'
     # 调试模式：开启后会把OCR原始识别结果输出到结果显示区域，便于调试
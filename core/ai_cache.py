@@ -0,0 +1,229 @@
+#  Author: micr0softDrestlife
+"""Persistent AI answer cache.
+
+同一个班次里经常会把同一道题再问一遍。CachedAIClient 包装 get_ai_client 返回的
+客户端，用 (provider, model, 规范化后的 prompt, system prompt, max_tokens) 作为键把回答
+保存在 SQLite 中，带 TTL，超过条目上限时按最近使用时间淘汰。错误提示（如
+"Ollama API调用失败"）永远不会被缓存。
+
+命中时只读不写：最近使用时间先记在内存里，积累到 TOUCH_BATCH 条或下一次写入时才一起提交。
+异步接口在线程池中读写缓存，SQLite 的 I/O 不会阻塞共享的事件循环（流式输出、对冲请求都在上面）。
+"""
+
+import asyncio
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from core.ai_client import BaseAIClient, is_error_response, is_error_stream
+
+_WHITESPACE = re.compile(r'\s+')
+
+# 命中后待写回的最近使用时间达到该数量时一起提交
+TOUCH_BATCH = 32
+
+
+def normalize_prompt(text) -> str:
+    """去掉首尾空白并把连续空白合并成一个空格，OCR 的换行/空格差异不影响命中"""
+    if not text:
+        return ''
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class AnswerCache:
+    def __init__(self, db_path=None, ttl=12 * 3600, max_entries=2000):
+        """db_path 为空时使用内存数据库（进程退出后失效）"""
+        self.db_path = db_path or ':memory:'
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        # key -> 最近使用时间，尚未写回数据库
+        self._touched = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(provider, model, prompt, system_prompt=None, **options) -> str:
+        parts = {
+            'provider': provider or '',
+            'model': model or '',
+            'prompt': normalize_prompt(prompt),
+            'system': normalize_prompt(system_prompt),
+            'options': {k: v for k, v in sorted(options.items()) if v is not None},
+        }
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer, created FROM ai_cache WHERE key = ?", (key,)
+            ).fetchone()
+            # 过期的条目在下一次 put 时删除
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self):
+        """把内存中的最近使用时间写回数据库（调用方持有锁并负责提交）"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE ai_cache SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def put(self, key, answer):
+        if is_error_response(answer):
+            return
+        now = time.time()
+        with self._lock:
+            # 先写回最近使用时间，淘汰才按真实的使用顺序进行
+            self._flush_touched()
+            self._db.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, answer, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now)
+            )
+            self._db.execute("DELETE FROM ai_cache WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM ai_cache WHERE key NOT IN "
+                "(SELECT key FROM ai_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._db.execute("DELETE FROM ai_cache")
+            self._db.commit()
+
+    def flush(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+
+class CachedAIClient(BaseAIClient):
+    """在任意 BaseAIClient 外面加一层回答缓存，其余属性透传给内部客户端"""
+
+    def __init__(self, client: BaseAIClient, cache: AnswerCache):
+        self.client = client
+        self.cache = cache
+
+    @property
+    def provider(self):
+        return self.client.provider
+
+    @property
+    def model(self):
+        return self.client.model
+
+    def __getattr__(self, name):
+        # 只有在本对象上找不到的属性才会走到这里
+        return getattr(self.client, name)
+
+    def preconnect(self):
+        self.client.preconnect()
+
+    def preload(self):
+        return self.client.preload()
+
+    def model_state(self):
+        return self.client.model_state()
+
+    def _key(self, prompt, system_prompt=None, **options):
+        return self.cache.make_key(self.provider, self.model, prompt, system_prompt, **options)
+
+    def generate_response(self, prompt, system_prompt=None, max_tokens=None):
+        key = self._key(prompt, system_prompt, max_tokens=max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        answer = self.client.generate_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+        self.cache.put(key, answer)
+        return answer
+
+    def stream_response(self, prompt, system_prompt=None, max_tokens=None):
+        """命中时一次性产出缓存的回答；未命中时边流式产出边累积，完整结束后再写入缓存"""
+        key = self._key(prompt, system_prompt, max_tokens=max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        for chunk in self.client.stream_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens):
+            parts.append(chunk)
+            yield chunk
+        # 任何一段是错误提示（包括中途断流）时整段不缓存
+        if not is_error_stream(parts):
+            self.cache.put(key, ''.join(parts))
+
+    async def _aget(self, key):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.cache.get, key)
+
+    async def _aput(self, key, answer):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.cache.put, key, answer)
+
+    async def agenerate_response(self, prompt, system_prompt=None, max_tokens=None):
+        key = self._key(prompt, system_prompt, max_tokens=max_tokens)
+        cached = await self._aget(key)
+        if cached is not None:
+            return cached
+
+        answer = await self.client.agenerate_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+        await self._aput(key, answer)
+        return answer
+
+    async def astream_response(self, prompt, system_prompt=None, max_tokens=None):
+        key = self._key(prompt, system_prompt, max_tokens=max_tokens)
+        cached = await self._aget(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        async for chunk in self.client.astream_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens):
+            parts.append(chunk)
+            yield chunk
+        # 被取消时不会执行到这里，半截回答不会进入缓存
+        if not is_error_stream(parts):
+            await self._aput(key, ''.join(parts))
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.cache.flush)
+        await self.client.aclose()
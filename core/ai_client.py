@@ -10,75 +10,496 @@ Implemented:
    Qianwen deployment — see docstring and AppConfig fields in config/settings.py)
 
 Use get_ai_client(config) to obtain a client instance appropriate to
-`config.AI_PROVIDER`.
+`config.AI_PROVIDER`. When `config.AI_HEDGE_PROVIDER` is set the request is raced
+against that second provider (see core/ai_hedge.py); when `config.AI_CACHE_ENABLED`
+is set the client is wrapped in a CachedAIClient (see core/ai_cache.py).
+
+Every client offers blocking methods (generate_response / stream_response, via
+requests) and asyncio ones (agenerate_response / astream_response, via aiohttp).
+Coroutines are meant to run on the shared loop from core/event_loop.py. When
+aiohttp is not installed the async methods fall back to running the blocking
+client in the loop's executor.
 """
 
-from typing import Optional
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Iterator, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
+from urllib3.util.retry import Retry
 
+try:
+    import aiohttp
+except ImportError:  # 可选依赖，缺失时异步接口退化为在线程池中调用同步接口
+    aiohttp = None
+
+from core import metrics
+
+
+# 默认的连接/读取超时（秒）。读取超时是两次收到数据之间的最长间隔，流式响应下不会限制总时长
+DEFAULT_TIMEOUT = (5, 120)
+
+# 服务端明确表示没有处理请求（限流 / 暂时不可用），按 Retry-After 或退避策略重试。
+## 500/502/504 说明请求已经到达服务端（可能已经开始生成），不重试
+RETRY_STATUS = (429, 503)
+
+
+# 客户端在出错时返回的提示文字前缀；这些结果不能被缓存，也不能当作有效答案
+ERROR_PREFIXES = (
+    "Ollama API调用失败",
+    "无法连接到Ollama服务",
+    "AI调用错误",
+    "OpenAI API key 未配置",
+    "OpenAI API 调用失败",
+    "无法连接到 OpenAI 服务",
+    "OpenAI 调用错误",
+)
+
+
+def is_error_response(text) -> bool:
+    """判断 generate_response 的返回值（完整回答）是否为错误提示而不是模型的回答"""
+    if not isinstance(text, str) or not text.strip():
+        return True
+    return text.startswith(ERROR_PREFIXES)
+
+
+def is_error_chunk(chunk) -> bool:
+    """判断流式输出中的一段是否为错误提示。只含换行/空格的一段是正常输出，不能当作错误"""
+    return not isinstance(chunk, str) or chunk.startswith(ERROR_PREFIXES)
+
+
+def is_error_stream(parts) -> bool:
+    """流式输出的各段拼起来是否不能当作有效回答：没有内容，或者其中一段是错误提示（包括中途断流）"""
+    return is_error_response(''.join(parts)) or any(is_error_chunk(part) for part in parts)
 
 
 class BaseAIClient:
     """Minimal interface for AI clients."""
 
-    def generate_response(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    provider = 'base'
+    model = None
+
+    def generate_response(self, prompt: str, system_prompt: Optional[str] = None,
+                          max_tokens: Optional[int] = None) -> str:
         raise NotImplementedError()
 
+    def stream_response(self, prompt: str, system_prompt: Optional[str] = None,
+                        max_tokens: Optional[int] = None) -> Iterator[str]:
+        """逐段产出回复文本。默认实现一次性产出完整回复，支持流式的客户端应覆盖此方法。
+
+        出错时与 generate_response 一样产出错误提示文字（见 ERROR_PREFIXES）。
+        """
+        yield self.generate_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+
+    def preconnect(self):
+        """预先建立到服务端的连接（TCP/TLS 握手），让第一次 Solve 不必再付出握手开销"""
+        pass
+
+    def preload(self):
+        """预先把模型加载到内存并刷新常驻时间，返回是否成功。只有本地模型（Ollama）需要"""
+        return False
+
+    def model_state(self):
+        """模型的加载状态：'loaded'/'unloaded'/'offline'（服务不可达）；不适用（远程服务）时为 None"""
+        return None
+
+    async def agenerate_response(self, prompt: str, system_prompt: Optional[str] = None,
+                                 max_tokens: Optional[int] = None) -> str:
+        """generate_response 的协程版本。默认在事件循环的线程池中调用同步实现"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.generate_response(
+            prompt, system_prompt=system_prompt, max_tokens=max_tokens))
+
+    async def astream_response(self, prompt: str, system_prompt: Optional[str] = None,
+                               max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """stream_response 的异步生成器版本。默认一次性产出完整回复"""
+        yield await self.agenerate_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+
+    async def aclose(self):
+        pass
+
 
-class OllamaClient(BaseAIClient):
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "qwen2.5-coder:7b"):
+def _is_reset_before_response(err):
+    """连接在收到任何响应之前被对方断开（RemoteDisconnected 是 ConnectionResetError 的子类）"""
+    return isinstance(err, ProtocolError) and any(isinstance(arg, ConnectionResetError) for arg in err.args)
+
+
+class _Retry(Retry):
+    """把“没有收到任何响应就被断开”当作连接错误重试。
+
+    复用的 keep-alive 连接可能已经被服务端因空闲关闭，请求写进去后立即被断开；
+    这时服务端没有处理请求，POST 也可以安全地重发。
+    """
+
+    def _is_connection_error(self, err):
+        return super()._is_connection_error(err) or _is_reset_before_response(err)
+
+
+def create_session(pool_size=4, max_retries=2, backoff_factor=0.5) -> requests.Session:
+    """创建带连接池和重试策略的 Session。
+
+    同一个 Session 会复用 TCP/TLS 连接（keep-alive）；连接建立失败、没有收到任何响应就被断开，
+    或服务端返回 429/503 时按 Retry-After 或指数退避最多重试 max_retries 次。收到响应后的
+    读取超时/断开以及其他 5xx 不重试：LLM 的 POST 不是幂等的，重发会让服务端再生成（并计费）一次，
+    一次 Solve 也可能等上几倍的读取超时。
+    """
+    retry = _Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        other=0,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=frozenset({'GET', 'HEAD', 'POST'}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 服务端没有处理请求的错误（连接被拒绝、DNS 失败、连接超时、没有收到任何响应就被断开），
+## 可以安全地重试。aiohttp 3.10 之前连接超时与读取超时是同一个异常，无法区分时不重试
+_CONNECT_ERRORS = ()
+if aiohttp is not None:
+    _CONNECT_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError) + (
+        (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, 'ConnectionTimeoutError') else ()
+    )
+
+
+def _retry_after(resp, default):
+    """响应头 Retry-After 给出的秒数；没有或不是秒数时返回 default"""
+    try:
+        return max(0.0, float(resp.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return default
+
+
+class _AsyncHTTPMixin:
+    """为客户端提供基于 aiohttp 的连接池会话和带退避的重试。
+
+    aiohttp 的 ClientSession 绑定在创建它的事件循环上，因此按循环缓存；
+    正常情况下所有协程都在 core/event_loop.py 的共享循环中运行，只会创建一个。
+    """
+
+    timeout = DEFAULT_TIMEOUT
+    pool_size = 4
+    max_retries = 2
+    backoff_factor = 0.5
+    _asession = None
+    _asession_loop = None
+
+    def _get_asession(self):
+        loop = asyncio.get_running_loop()
+        if self._asession is None or self._asession.closed or self._asession_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            timeout = aiohttp.ClientTimeout(connect=self.timeout[0], sock_read=self.timeout[1])
+            self._asession = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._asession_loop = loop
+        return self._asession
+
+    async def _apost(self, url, **kwargs):
+        """POST 并在连接错误/429/503 时重试；返回的响应需由调用方 release()
+
+        与 create_session 相同，收到响应后的读取超时或断开以及其他 5xx 不重试（见 _CONNECT_ERRORS）。
+        """
+        session = self._get_asession()
+        attempt = 0
+        while True:
+            try:
+                resp = await session.post(url, **kwargs)
+            except _CONNECT_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_factor * (2 ** attempt)
+            else:
+                if resp.status not in RETRY_STATUS or attempt >= self.max_retries:
+                    return resp
+                delay = _retry_after(resp, self.backoff_factor * (2 ** attempt))
+                resp.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        if self._asession is not None and not self._asession.closed:
+            await self._asession.close()
+        self._asession = None
+
+
+async def _aiter_stream_lines(resp) -> AsyncIterator[str]:
+    """按行读取 aiohttp 流式响应并按 UTF-8 解码"""
+    async for raw in resp.content:
+        line = raw.strip()
+        if line:
+            yield line.decode('utf-8', errors='replace')
+
+
+def _iter_stream_lines(response) -> Iterator[str]:
+    """按行读取流式响应。SSE 响应常常不声明 charset，这里统一按 UTF-8 解码"""
+    for raw in response.iter_lines():
+        if raw:
+            yield raw.decode('utf-8', errors='replace')
+
+
+def _keep_alive_value(value):
+    """Ollama 的 keep_alive 可以是时长字符串（'30m'）或秒数；纯数字的字符串（如 '-1'）按数字发送"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() else number
+    return value
+
+
+def _model_matches(entry, model):
+    """/api/ps 返回的条目是否为 model（未写标签的模型名对应 ':latest'）"""
+    names = {model, f"{model}:latest"} if model and ':' not in model else {model}
+    return entry.get('name') in names or entry.get('model') in names
+
+
+def _parse_ollama_result(result, raw_text):
+    """宽容地解析 /api/generate 的非流式返回，兼容不同 Ollama 版本的返回形状"""
+    if isinstance(result, dict):
+        if 'response' in result and isinstance(result['response'], str):
+            return result['response']
+
+        outputs = result.get('outputs') or result.get('result')
+        if isinstance(outputs, list):
+            parts = []
+            for out in outputs:
+                if isinstance(out, dict):
+                    for key in ('content', 'text', 'message'):
+                        if key in out and isinstance(out[key], str):
+                            parts.append(out[key])
+                            break
+                elif isinstance(out, str):
+                    parts.append(out)
+            if parts:
+                return '\n'.join(parts)
+
+    return raw_text
+
+
+def _parse_ollama_line(line):
+    """解析 NDJSON 中的一行，返回 (text, done, error)"""
+    try:
+        chunk = json.loads(line)
+    except ValueError:
+        return None, False, None
+    if not isinstance(chunk, dict):
+        return None, False, None
+    if chunk.get('error'):
+        return None, True, chunk['error']
+    text = chunk.get('response')
+    if not isinstance(text, str) or not text:
+        text = None
+    return text, bool(chunk.get('done')), None
+
+
+def _parse_chat_result(data, raw_text):
+    """解析 /chat/completions 的非流式返回，取第一个 choice 的内容"""
+    if isinstance(data, dict):
+        choices = data.get('choices') or []
+        if choices and isinstance(choices, list):
+            first = choices[0]
+            if isinstance(first, dict):
+                message = first.get('message') or first.get('text')
+                if isinstance(message, dict) and 'content' in message:
+                    return message['content'].strip()
+                if isinstance(message, str):
+                    return message.strip()
+
+    return raw_text
+
+
+def _parse_sse_line(line):
+    """解析 SSE 中的一行，返回 (text, done)"""
+    if not line.startswith('data:'):
+        return None, False
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return None, True
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return None, False
+    choices = chunk.get('choices') if isinstance(chunk, dict) else None
+    if not choices or not isinstance(choices[0], dict):
+        return None, False
+    delta = choices[0].get('delta') or {}
+    text = delta.get('content') if isinstance(delta, dict) else None
+    if isinstance(text, str) and text:
+        return text, False
+    return None, False
+
+
+class OllamaClient(_AsyncHTTPMixin, BaseAIClient):
+    provider = 'ollama'
+
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "qwen2.5-coder:7b",
+                 session: Optional[requests.Session] = None, timeout=DEFAULT_TIMEOUT,
+                 pool_size=4, max_retries=2, backoff_factor=0.5, keep_alive=None):
         self.base_url = base_url.rstrip('/') if base_url else base_url
         self.model = model
+        # 随每个请求发送，决定模型在最后一次请求之后继续常驻内存多久（None 为服务端默认的 5 分钟）
+        self.keep_alive = _keep_alive_value(keep_alive)
+        self.session = session or create_session(pool_size, max_retries, backoff_factor)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+    def preconnect(self):
+        try:
+            self.session.get(self.base_url, timeout=self.timeout[0])
+        except Exception:
+            pass
+
+    def preload(self):
+        """只带 model 不带 prompt 调用 /api/generate：Ollama 只加载模型不生成，模型已加载时立即返回，
+        同时按 keep_alive 重新计算卸载时间"""
+        payload = {"model": self.model, "stream": False}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        started = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+        except Exception:
+            return False
+        metrics.histogram('ai.preload_ms').observe((time.perf_counter() - started) * 1000.0)
+        return response.status_code == 200
+
+    def model_state(self):
+        """查询 /api/ps（当前加载在内存中的模型）"""
+        try:
+            response = self.session.get(f"{self.base_url}/api/ps", timeout=self.timeout[0])
+            if response.status_code != 200:
+                # 旧版本 Ollama 没有 /api/ps
+                return None
+            models = response.json().get('models') or []
+        except Exception:
+            return 'offline'
+        return 'loaded' if any(_model_matches(entry, self.model) for entry in models) else 'unloaded'
+
+    def _payload(self, prompt, system_prompt=None, stream=False, max_tokens=None):
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
 
-    def generate_response(self, prompt, system_prompt=None):
+        if system_prompt:
+            payload["system"] = system_prompt
+        # 限制生成长度（按题型设置，见 core/prompt.py）
+        if max_tokens:
+            payload["options"] = {"num_predict": int(max_tokens)}
+        return payload
+
+    def generate_response(self, prompt, system_prompt=None, max_tokens=None):
         """调用Ollama生成回复。保持原来宽容的解析逻辑以处理不同 Ollama 版本的返回形状。"""
         try:
             url = f"{self.base_url}/api/generate"
+            payload = self._payload(prompt, system_prompt, max_tokens=max_tokens)
 
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-            }
-
-            if system_prompt:
-                payload["system"] = system_prompt
-
-            response = requests.post(url, json=payload, timeout=120)
+            response = self.session.post(url, json=payload, timeout=self.timeout)
 
             if response.status_code != 200:
                 body = response.text
                 return f"Ollama API调用失败: {response.status_code} - {body}"
 
-            result = response.json()
-
-            if isinstance(result, dict):
-                if 'response' in result and isinstance(result['response'], str):
-                    return result['response']
+            return _parse_ollama_result(response.json(), response.text)
 
-                outputs = result.get('outputs') or result.get('result')
-                if isinstance(outputs, list):
-                    parts = []
-                    for out in outputs:
-                        if isinstance(out, dict):
-                            for key in ('content', 'text', 'message'):
-                                if key in out and isinstance(out[key], str):
-                                    parts.append(out[key])
-                                    break
-                        elif isinstance(out, str):
-                            parts.append(out)
-                    if parts:
-                        return '\n'.join(parts)
+        except requests.exceptions.ConnectionError:
+            return "无法连接到Ollama服务，请确保Ollama正在运行"
+        except Exception as e:
+            return f"AI调用错误: {str(e)}"
 
-            return response.text
+    def stream_response(self, prompt, system_prompt=None, max_tokens=None):
+        """流式调用 /api/generate：Ollama 每行返回一个 JSON 对象（NDJSON），逐个产出 response 字段"""
+        try:
+            url = f"{self.base_url}/api/generate"
+            payload = self._payload(prompt, system_prompt, stream=True, max_tokens=max_tokens)
+
+            with self.session.post(url, json=payload, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    yield f"Ollama API调用失败: {response.status_code} - {response.text}"
+                    return
+
+                for line in _iter_stream_lines(response):
+                    text, done, error = _parse_ollama_line(line)
+                    if error:
+                        yield f"Ollama API调用失败: {error}"
+                        return
+                    if text:
+                        yield text
+                    if done:
+                        return
 
         except requests.exceptions.ConnectionError:
+            yield "无法连接到Ollama服务，请确保Ollama正在运行"
+        except Exception as e:
+            yield f"AI调用错误: {str(e)}"
+
+    async def agenerate_response(self, prompt, system_prompt=None, max_tokens=None):
+        if aiohttp is None:
+            return await super().agenerate_response(prompt, system_prompt, max_tokens)
+        try:
+            url = f"{self.base_url}/api/generate"
+            resp = await self._apost(url, json=self._payload(prompt, system_prompt, max_tokens=max_tokens))
+            try:
+                body = await resp.text(encoding='utf-8')
+                if resp.status != 200:
+                    return f"Ollama API调用失败: {resp.status} - {body}"
+                return _parse_ollama_result(json.loads(body), body)
+            finally:
+                resp.release()
+        except aiohttp.ClientConnectionError:
             return "无法连接到Ollama服务，请确保Ollama正在运行"
         except Exception as e:
-            return f"AI调用错误: {str(e)}"
+            return f"AI调用错误: {str(e) or type(e).__name__}"
+
+    async def astream_response(self, prompt, system_prompt=None, max_tokens=None):
+        if aiohttp is None:
+            async for chunk in super().astream_response(prompt, system_prompt, max_tokens):
+                yield chunk
+            return
+        try:
+            url = f"{self.base_url}/api/generate"
+            resp = await self._apost(url, json=self._payload(prompt, system_prompt, stream=True, max_tokens=max_tokens))
+            try:
+                if resp.status != 200:
+                    body = await resp.text(encoding='utf-8')
+                    yield f"Ollama API调用失败: {resp.status} - {body}"
+                    return
+                async for line in _aiter_stream_lines(resp):
+                    text, done, error = _parse_ollama_line(line)
+                    if error:
+                        yield f"Ollama API调用失败: {error}"
+                        return
+                    if text:
+                        yield text
+                    if done:
+                        return
+            finally:
+                # 被取消或提前退出时 release 会关闭连接，服务端随即停止生成
+                resp.release()
+        except aiohttp.ClientConnectionError:
+            yield "无法连接到Ollama服务，请确保Ollama正在运行"
+        except Exception as e:
+            yield f"AI调用错误: {str(e) or type(e).__name__}"
 
 
-class OpenAIClient(BaseAIClient):
+class OpenAIClient(_AsyncHTTPMixin, BaseAIClient):
     """Adapter for OpenAI-compatible Chat completions API (and similar vendors).
 
     Expects a base_url pointing to the provider's REST API root (e.g. https://api.openai.com/v1)
@@ -86,27 +507,44 @@ class OpenAIClient(BaseAIClient):
     message content when available.
     """
 
-    def __init__(self, api_key: Optional[str], base_url: Optional[str] = None, model: Optional[str] = None):
+    provider = 'openai'
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str] = None, model: Optional[str] = None,
+                 provider: Optional[str] = None, session: Optional[requests.Session] = None,
+                 timeout=DEFAULT_TIMEOUT, pool_size=4, max_retries=2, backoff_factor=0.5):
         self.api_key = api_key
         self.base_url = (base_url.rstrip('/') if base_url else None)
         self.model = model
+        if provider:
+            self.provider = provider
+        self.session = session or create_session(pool_size, max_retries, backoff_factor)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+    def preconnect(self):
+        # 任何响应（包括 404）都说明连接已建立并回到了连接池
+        try:
+            self.session.head(self._chat_url(), timeout=self.timeout[0])
+        except Exception:
+            pass
 
-    def generate_response(self, prompt, system_prompt=None):
-        if not self.api_key:
-            return "OpenAI API key 未配置"
+    def _chat_url(self):
         base = self.base_url or 'https://api.openai.com/v1'
         b = base.rstrip('/')
         # If base already contains '/v1' use base+'/chat/completions', otherwise use base+'/v1/chat/completions'
         if b.endswith('/v1') or '/v1/' in b or b.endswith('/v1'):
-            url = f"{b}/chat/completions"
-        else:
-            url = f"{b}/v1/chat/completions"
+            return f"{b}/chat/completions"
+        return f"{b}/v1/chat/completions"
 
-        headers = {
+    def _headers(self):
+        return {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
 
+    def _payload(self, prompt, system_prompt=None, stream=False, max_tokens=None):
         messages = []
         if system_prompt:
             messages.append({'role': 'system', 'content': system_prompt})
@@ -116,58 +554,197 @@ class OpenAIClient(BaseAIClient):
             'model': self.model or 'gpt-3.5-turbo',
             'messages': messages,
             'temperature': 0.7,
-            'max_tokens': 1000,
+            'max_tokens': int(max_tokens) if max_tokens else 1000,
         }
+        if stream:
+            payload['stream'] = True
+        return payload
+
+    def generate_response(self, prompt, system_prompt=None, max_tokens=None):
+        if not self.api_key:
+            return "OpenAI API key 未配置"
+        url = self._chat_url()
+        headers = self._headers()
+        payload = self._payload(prompt, system_prompt, max_tokens=max_tokens)
 
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=120)
+            resp = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
             if resp.status_code != 200:
                 return f"OpenAI API 调用失败: {resp.status_code} - {resp.text}"
 
-            data = resp.json()
-            if isinstance(data, dict):
-                choices = data.get('choices') or []
-                if choices and isinstance(choices, list):
-                    first = choices[0]
-                    if isinstance(first, dict):
-                        message = first.get('message') or first.get('text')
-                        if isinstance(message, dict) and 'content' in message:
-                            return message['content'].strip()
-                        if isinstance(message, str):
-                            return message.strip()
-
-            return resp.text
+            return _parse_chat_result(resp.json(), resp.text)
 
         except requests.exceptions.ConnectionError:
             return "无法连接到 OpenAI 服务"
         except Exception as e:
             return f"OpenAI 调用错误: {str(e)}"
 
+    def stream_response(self, prompt, system_prompt=None, max_tokens=None):
+        """流式调用 /chat/completions：解析 SSE 的 "data: {...}" 行，逐个产出 delta.content"""
+        if not self.api_key:
+            yield "OpenAI API key 未配置"
+            return
+        url = self._chat_url()
+        headers = self._headers()
+        payload = self._payload(prompt, system_prompt, stream=True, max_tokens=max_tokens)
+
+        try:
+            with self.session.post(url, headers=headers, json=payload, timeout=self.timeout, stream=True) as resp:
+                if resp.status_code != 200:
+                    yield f"OpenAI API 调用失败: {resp.status_code} - {resp.text}"
+                    return
+
+                for line in _iter_stream_lines(resp):
+                    text, done = _parse_sse_line(line)
+                    if text:
+                        yield text
+                    if done:
+                        return
+
+        except requests.exceptions.ConnectionError:
+            yield "无法连接到 OpenAI 服务"
+        except Exception as e:
+            yield f"OpenAI 调用错误: {str(e)}"
+
+    async def agenerate_response(self, prompt, system_prompt=None, max_tokens=None):
+        if aiohttp is None:
+            return await super().agenerate_response(prompt, system_prompt, max_tokens)
+        if not self.api_key:
+            return "OpenAI API key 未配置"
+        try:
+            resp = await self._apost(self._chat_url(), headers=self._headers(),
+                                     json=self._payload(prompt, system_prompt, max_tokens=max_tokens))
+            try:
+                body = await resp.text(encoding='utf-8')
+                if resp.status != 200:
+                    return f"OpenAI API 调用失败: {resp.status} - {body}"
+                return _parse_chat_result(json.loads(body), body)
+            finally:
+                resp.release()
+        except aiohttp.ClientConnectionError:
+            return "无法连接到 OpenAI 服务"
+        except Exception as e:
+            return f"OpenAI 调用错误: {str(e) or type(e).__name__}"
+
+    async def astream_response(self, prompt, system_prompt=None, max_tokens=None):
+        if aiohttp is None:
+            async for chunk in super().astream_response(prompt, system_prompt, max_tokens):
+                yield chunk
+            return
+        if not self.api_key:
+            yield "OpenAI API key 未配置"
+            return
+        try:
+            resp = await self._apost(self._chat_url(), headers=self._headers(),
+                                     json=self._payload(prompt, system_prompt, stream=True, max_tokens=max_tokens))
+            try:
+                if resp.status != 200:
+                    body = await resp.text(encoding='utf-8')
+                    yield f"OpenAI API 调用失败: {resp.status} - {body}"
+                    return
+                async for line in _aiter_stream_lines(resp):
+                    text, done = _parse_sse_line(line)
+                    if text:
+                        yield text
+                    if done:
+                        return
+            finally:
+                resp.release()
+        except aiohttp.ClientConnectionError:
+            yield "无法连接到 OpenAI 服务"
+        except Exception as e:
+            yield f"OpenAI 调用错误: {str(e) or type(e).__name__}"
+
 
 def get_ai_client(config) -> BaseAIClient:
     """Factory: return an AI client instance based on `config.AI_PROVIDER`.
 
     Expects config to have attributes used in `config/settings.AppConfig`.
+    A remote provider without an API key falls back to the local Ollama client.
     """
-    provider = getattr(config, 'AI_PROVIDER', 'ollama')
+    provider = getattr(config, 'AI_PROVIDER', 'ollama') or 'ollama'
+    if not _has_api_key(config, provider):
+        print(f"AI 提供方 {provider} 未配置 API key，改用本地 Ollama")
+        provider = 'ollama'
+    client = _create_client(config, provider=provider)
+
+    # 配置了备用提供方时，用对冲客户端同时竞速两个提供方
+    hedge_provider = getattr(config, 'AI_HEDGE_PROVIDER', '')
+    if hedge_provider and not _has_api_key(config, hedge_provider):
+        print(f"备用提供方 {hedge_provider} 未配置 API key，不使用对冲请求")
+        hedge_provider = ''
+    if hedge_provider:
+        from core.ai_hedge import HedgedAIClient
+        secondary = _create_client(config, provider=hedge_provider)
+        client = HedgedAIClient(client, secondary, hedge_delay=getattr(config, 'AI_HEDGE_DELAY', 2.0))
+
+    if getattr(config, 'AI_CACHE_ENABLED', False):
+        from core.ai_cache import AnswerCache, CachedAIClient
+        cache = AnswerCache(
+            db_path=getattr(config, 'AI_CACHE_PATH', None),
+            ttl=getattr(config, 'AI_CACHE_TTL', 12 * 3600),
+            max_entries=getattr(config, 'AI_CACHE_MAX_ENTRIES', 2000)
+        )
+        client = CachedAIClient(client, cache)
+
+    return client
+
+
+# 需要 API key 的提供方（含缩写）对应的配置项
+API_KEY_FIELDS = {
+    'qianwen': 'QIANWEN_API_KEY', 'qw': 'QIANWEN_API_KEY',
+    'openai': 'OPENAI_API_KEY', 'oa': 'OPENAI_API_KEY',
+    'deepseek': 'DEEPSEEK_API_KEY', 'ds': 'DEEPSEEK_API_KEY',
+}
+
+
+def _has_api_key(config, provider):
+    """本地提供方（Ollama）不需要 API key"""
+    field = API_KEY_FIELDS.get((provider or '').lower())
+    return field is None or bool(getattr(config, field, None))
+
+
+def _http_options(config):
+    """每个客户端各自持有一个连接池 Session，超时与重试参数来自配置"""
+    pool_size = getattr(config, 'AI_POOL_SIZE', 4)
+    max_retries = getattr(config, 'AI_MAX_RETRIES', 2)
+    backoff_factor = getattr(config, 'AI_RETRY_BACKOFF', 0.5)
+    timeout = (
+        getattr(config, 'AI_CONNECT_TIMEOUT', DEFAULT_TIMEOUT[0]),
+        getattr(config, 'AI_READ_TIMEOUT', DEFAULT_TIMEOUT[1])
+    )
+    return {
+        'session': create_session(pool_size, max_retries, backoff_factor),
+        'timeout': timeout,
+        'pool_size': pool_size,
+        'max_retries': max_retries,
+        'backoff_factor': backoff_factor,
+    }
+
+
+def _create_client(config, provider=None) -> BaseAIClient:
+    if provider is None:
+        provider = getattr(config, 'AI_PROVIDER', 'ollama')
     provider = (provider or 'ollama').lower()
+    http = _http_options(config)
 
     if provider == 'ollama':
         base = getattr(config, 'OLLAMA_BASE_URL', 'http://localhost:11434')
         model = getattr(config, 'OLLAMA_MODEL', None)
-        return OllamaClient(base_url=base, model=model)
+        return OllamaClient(base_url=base, model=model,
+                            keep_alive=getattr(config, 'OLLAMA_KEEP_ALIVE', None), **http)
 
     if provider in ('qianwen', 'qw'):
         url = getattr(config, 'QIANWEN_API_URL', None)
         key = getattr(config, 'QIANWEN_API_KEY', None)
         model = getattr(config, 'QIANWEN_MODEL', None)
-        return OpenAIClient(api_key=key, base_url=url, model=model)
+        return OpenAIClient(api_key=key, base_url=url, model=model, provider='qianwen', **http)
 
     if provider in ('openai', 'oa'):
         key = getattr(config, 'OPENAI_API_KEY', None)
         base = getattr(config, 'OPENAI_BASE_URL', None)
         model = getattr(config, 'OPENAI_MODEL', None)
-        return OpenAIClient(api_key=key, base_url=base, model=model)
+        return OpenAIClient(api_key=key, base_url=base, model=model, provider='openai', **http)
 
     if provider in ('deepseek', 'ds'):
         # Deepseek is OpenAI-compatible; prefer using the OpenAIClient wrapper so
@@ -175,10 +752,11 @@ def get_ai_client(config) -> BaseAIClient:
         key = getattr(config, 'DEEPSEEK_API_KEY', None)
         base = getattr(config, 'DEEPSEEK_API_URL', None)
         model = getattr(config, 'DEEPSEEK_MODEL', None)
-        return OpenAIClient(api_key=key, base_url=base, model=model)
+        return OpenAIClient(api_key=key, base_url=base, model=model, provider='deepseek', **http)
 
     # Unknown provider: fallback to OllamaClient for compatibility
     base = getattr(config, 'OLLAMA_BASE_URL', 'http://localhost:11434')
     model = getattr(config, 'OLLAMA_MODEL', None)
-    return OllamaClient(base_url=base, model=model)
+    return OllamaClient(base_url=base, model=model,
+                        keep_alive=getattr(config, 'OLLAMA_KEEP_ALIVE', None), **http)
 
@@ -0,0 +1,231 @@
+#  Author: micr0softDrestlife
+"""Hedged AI requests.
+
+HedgedAIClient 先把问题发给主提供方，超过 hedge_delay 秒仍没有可用回答（或主提供方
+直接报错）时，再把同一个问题发给备用提供方。谁先给出非错误的回答就用谁，另一个请求
+会被取消。每个提供方的获胜次数和首个可用回答的延迟都会被记录，用于根据真实数据
+调整 hedge_delay。
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+from core.ai_client import BaseAIClient, is_error_chunk, is_error_response
+from core.event_loop import get_loop_thread
+
+
+def _label(client):
+    return f"{client.provider}:{client.model}"
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class HedgeStats:
+    """按提供方统计获胜次数、错误次数和首个可用回答的延迟"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._window = window
+        self.requests = 0
+        self.hedged = 0
+        self.wins = {}
+        self.errors = {}
+        self.latencies = {}
+
+    def record_request(self, hedged):
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedged += 1
+
+    def record_win(self, label, latency):
+        with self._lock:
+            self.wins[label] = self.wins.get(label, 0) + 1
+            self.latencies.setdefault(label, deque(maxlen=self._window)).append(latency)
+
+    def record_error(self, label):
+        with self._lock:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            providers = {}
+            for label in set(self.wins) | set(self.errors):
+                samples = list(self.latencies.get(label, ()))
+                providers[label] = {
+                    'wins': self.wins.get(label, 0),
+                    'errors': self.errors.get(label, 0),
+                    'p50': _percentile(samples, 50),
+                    'p90': _percentile(samples, 90),
+                }
+            return {'requests': self.requests, 'hedged': self.hedged, 'providers': providers}
+
+
+class HedgedAIClient(BaseAIClient):
+    def __init__(self, primary: BaseAIClient, secondary: BaseAIClient, hedge_delay=2.0, loop_thread=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_delay = float(hedge_delay)
+        self.stats = HedgeStats()
+        self._loop_thread = loop_thread
+
+    @property
+    def provider(self):
+        return f"{self.primary.provider}+{self.secondary.provider}"
+
+    @property
+    def model(self):
+        return f"{self.primary.model}+{self.secondary.model}"
+
+    @property
+    def loop_thread(self):
+        if self._loop_thread is None:
+            self._loop_thread = get_loop_thread()
+        return self._loop_thread
+
+    def hedge_stats(self):
+        return self.stats.snapshot()
+
+    def suggested_delay(self):
+        """建议的对冲延迟：主提供方首个可用回答延迟的 P90（没有数据时沿用当前值）"""
+        p90 = self.stats.snapshot()['providers'].get(_label(self.primary), {}).get('p90')
+        return p90 if p90 is not None else self.hedge_delay
+
+    def preconnect(self):
+        self.primary.preconnect()
+        self.secondary.preconnect()
+
+    def preload(self):
+        # 两个提供方都预热（无论哪个都可能胜出）
+        loaded = [self.primary.preload(), self.secondary.preload()]
+        return any(loaded)
+
+    def model_state(self):
+        state = self.primary.model_state()
+        return state if state is not None else self.secondary.model_state()
+
+    async def aclose(self):
+        await self.primary.aclose()
+        await self.secondary.aclose()
+
+    async def _race(self, start, is_error=is_error_response):
+        """start(client) 返回一个协程；返回 (获胜的 client, 结果, 所有 (client, task))。
+
+        is_error(结果) 为 True 的结果不算可用。没有可用结果时 client 为 None，
+        结果为主提供方（或最后一个）的错误提示。
+        """
+        began = time.monotonic()
+        tasks = {}
+        clients = [self.primary, self.secondary]
+
+        def launch(client):
+            task = asyncio.ensure_future(start(client))
+            tasks[task] = client
+
+        launch(clients.pop(0))
+        pending = set(tasks)
+        errors = []
+        try:
+            while pending or clients:
+                timeout = max(0.0, self.hedge_delay - (time.monotonic() - began)) if clients else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    client = tasks[task]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        result = f"AI调用错误: {e}"
+                    if result is not None and not is_error(result):
+                        self.stats.record_win(_label(client), time.monotonic() - began)
+                        return client, result, tasks
+                    self.stats.record_error(_label(client))
+                    errors.append(result)
+                # 等待超时或者主提供方已经失败：发出对冲请求
+                if clients:
+                    launch(clients.pop(0))
+                    pending |= {t for t in tasks if not t.done()}
+            return None, (errors[0] if errors else None), tasks
+        finally:
+            self.stats.record_request(len(tasks) > 1)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def agenerate_response(self, prompt, system_prompt=None, max_tokens=None):
+        async def start(client):
+            return await client.agenerate_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+
+        _, result, _ = await self._race(start)
+        return result if result is not None else "AI调用错误: 所有提供方均未返回结果"
+
+    async def astream_response(self, prompt, system_prompt=None, max_tokens=None):
+        streams = {}
+
+        async def start(client):
+            # 以第一段输出作为比较对象，获胜后继续读取该提供方剩余的流
+            stream = client.astream_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+            streams[client] = stream
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        # 第一段可能只是换行，只有错误提示才算失败
+        winner, first, tasks = await self._race(start, is_error=is_error_chunk)
+        for task, client in tasks.items():
+            if client is not winner:
+                asyncio.ensure_future(self._discard(task, streams.get(client)))
+
+        if winner is None:
+            yield first if first is not None else "AI调用错误: 所有提供方均未返回结果"
+            return
+
+        stream = streams[winner]
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    async def _discard(task, stream):
+        # 等被取消的 __anext__ 结束后再关闭生成器，释放落败一方的连接
+        await asyncio.wait([task])
+        if stream is None:
+            return
+        try:
+            await stream.aclose()
+        except Exception:
+            pass
+
+    def generate_response(self, prompt, system_prompt=None, max_tokens=None):
+        return self.loop_thread.run(self.agenerate_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens))
+
+    def stream_response(self, prompt, system_prompt=None, max_tokens=None):
+        stream = self.astream_response(prompt, system_prompt=system_prompt, max_tokens=max_tokens)
+        try:
+            while True:
+                try:
+                    yield self.loop_thread.run(_anext(stream))
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.loop_thread.run(_aclose(stream))
+
+
+async def _anext(stream):
+    # run_coroutine_threadsafe 只接受协程对象，不接受 __anext__() 返回的 awaitable
+    return await stream.__anext__()
+
+
+async def _aclose(stream):
+    await stream.aclose()
@@ -0,0 +1,280 @@
+#  Author: micr0softDrestlife
+"""Headless batch mode: images → OCR → AI → JSONL.
+
+    python main.py batch screenshots/ -o answers.jsonl
+    python main.py batch "archive/**/*.png" -o answers.jsonl --resume
+    find archive -name '*.png' | python main.py batch - -o answers.jsonl --unordered
+
+OCR 在进程池中运行（每个工作进程持有自己的 OCREngine 和 tesseract backend，图片在
+工作进程中读取，不经过进程间传输）；AI 请求在事件循环中并发，最多 --max-inflight 个。
+每完成一张就写出一行 JSON 并 flush，--resume 时跳过输出文件中已经成功的图片。
+本模块不导入 tkinter / pystray / pyautogui。
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import ocr_pool
+from core.ai_client import get_ai_client, is_error_response
+from core.metrics import SolveTrace
+from core.ocr_engine import OCREngine
+from core.prompt import build_prompt
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+# 这些状态的记录在 --resume 时视为已完成；error / ai_error 会重试
+DONE_STATUSES = ('ok', 'no_text')
+
+
+def iter_inputs(sources, stdin=None):
+    """依次产出图片路径。source 可以是目录（按文件名排序）、glob 模式，或 '-' 表示从 stdin 逐行读取"""
+    for source in sources:
+        if source == '-':
+            for line in (stdin or sys.stdin):
+                path = line.strip()
+                if path:
+                    yield path
+        elif os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(source, name)
+        elif glob.has_magic(source):
+            for path in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(path):
+                    yield path
+        else:
+            yield source
+
+
+def ocr_file(engine, path):
+    """在当前进程中读取并识别一张图片，返回 (文本, 各阶段耗时秒)"""
+    trace = SolveTrace(trigger='batch')
+    with trace.span('load'):
+        image = ocr_pool.load_image(path)
+    text = engine.extract_text(image, trace=trace, raise_errors=True)
+    return text, dict(trace.spans)
+
+
+def read_done(output_path):
+    """读取已有输出中完成的图片路径（忽略被中断写坏的最后一行）"""
+    done = set()
+    if not output_path or not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') in DONE_STATUSES:
+                done.add(record.get('path'))
+    return done
+
+
+class JsonlWriter:
+    """ordered=True 时按输入顺序写出（先完成的结果在内存中等待前面的）；否则完成即写"""
+
+    def __init__(self, stream, ordered=True):
+        self.stream = stream
+        self.ordered = ordered
+        self._pending = {}
+        self._next = 0
+        self.written = 0
+
+    def _write(self, record):
+        if record is not None:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.stream.flush()
+            self.written += 1
+
+    def emit(self, index, record):
+        """record 为 None 表示该序号被跳过（--resume），只用于推进顺序。返回本次写出（或跳过）的序号"""
+        if not self.ordered:
+            self._write(record)
+            return [index]
+        self._pending[index] = record
+        flushed = []
+        while self._next in self._pending:
+            self._write(self._pending.pop(self._next))
+            flushed.append(self._next)
+            self._next += 1
+        return flushed
+
+
+class BatchRunner:
+    def __init__(self, config, ai_client=None, engine=None, workers=0, max_inflight=4,
+                 system_prompt=None, ordered=True, simplify=False):
+        """workers 为 1 时在当前进程的线程中用 engine 识别（不启动进程池）"""
+        self.config = config
+        self.ai_client = ai_client if ai_client is not None else get_ai_client(config)
+        self.workers = int(workers) or os.cpu_count() or 1
+        self.max_inflight = max(1, int(max_inflight))
+        self.system_prompt = system_prompt
+        self.simplify = simplify
+        self.ordered = ordered
+        self.engine = engine
+        self._pool = None
+        self._executor = None
+        if self.workers == 1:
+            self.engine = engine or OCREngine(getattr(config, 'TESSERACT_PATH', None), config)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='batch-ocr')
+        else:
+            self._pool = ocr_pool.OCRWorkerPool(
+                workers=self.workers,
+                backend_kind=getattr(config, 'OCR_BACKEND', 'auto'),
+                tesseract_path=getattr(config, 'TESSERACT_PATH', None),
+                tessdata_path=getattr(config, 'TESSDATA_PATH', None),
+                lang=getattr(config, 'OCR_LANG', 'chi_sim+eng')
+            )
+            self._worker_config = ocr_pool.worker_config(config)
+        self.counts = {}
+
+    async def _ocr(self, path):
+        loop = asyncio.get_running_loop()
+        if self._pool is not None:
+            return await asyncio.wrap_future(self._pool.submit_engine(self._worker_config, path))
+        return await loop.run_in_executor(self._executor, ocr_file, self.engine, path)
+
+    async def process(self, index, path, ocr_slots, ai_slots):
+        started = time.perf_counter()
+        record = {'index': index, 'path': path}
+        timings = {}
+        try:
+            async with ocr_slots:
+                text, spans = await self._ocr(path)
+            timings.update(spans)
+            record['ocr_text'] = text
+            plan = build_prompt(text, self.config, provider=self.ai_client.provider,
+                                simplify=self.simplify, system_prompt=self.system_prompt)
+            if not plan.prompt:
+                record['status'] = 'no_text'
+            else:
+                plan.record()
+                record['question_type'] = plan.question_type
+                record['prompt_tokens'] = plan.tokens_sent
+                record['prompt_tokens_saved'] = plan.tokens_saved
+                async with ai_slots:
+                    ai_started = time.perf_counter()
+                    answer = await self.ai_client.agenerate_response(
+                        plan.prompt, system_prompt=plan.system_prompt, max_tokens=plan.max_tokens)
+                    timings['ai_total'] = time.perf_counter() - ai_started
+                record['answer'] = answer
+                record['status'] = 'ai_error' if is_error_response(answer) else 'ok'
+        except Exception as e:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"
+        timings['total'] = time.perf_counter() - started
+        record['timings_ms'] = {name: round(s * 1000.0, 1) for name, s in timings.items()}
+        self.counts[record['status']] = self.counts.get(record['status'], 0) + 1
+        return record
+
+    async def run(self, paths, writer, skip=()):
+        """paths 可以是惰性迭代器（例如 stdin），在执行器中逐个取出，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        # OCR 提交数略多于进程数，保证工作进程不空闲；同时在途的任务总数也有上限。
+        # window 的名额在记录真正写出后才归还，按序输出时排在卡住的图片之后的结果不会无限堆积
+        ocr_slots = asyncio.Semaphore(self.workers * 2)
+        ai_slots = asyncio.Semaphore(self.max_inflight)
+        window = asyncio.Semaphore(self.workers * 2 + self.max_inflight * 2)
+        held = set()
+        tasks = set()
+        iterator = iter(paths)
+        index = 0
+
+        def emit(i, record):
+            for written in writer.emit(i, record):
+                if written in held:
+                    held.discard(written)
+                    window.release()
+
+        async def run_one(i, path):
+            emit(i, await self.process(i, path, ocr_slots, ai_slots))
+
+        while True:
+            path = await loop.run_in_executor(None, next, iterator, None)
+            if path is None:
+                break
+            if path in skip:
+                self.counts['skipped'] = self.counts.get('skipped', 0) + 1
+                emit(index, None)
+            else:
+                await window.acquire()
+                held.add(index)
+                task = asyncio.ensure_future(run_one(index, path))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            index += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self.counts
+
+    async def aclose(self):
+        await self.ai_client.aclose()
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+def main(argv=None, config=None):
+    parser = argparse.ArgumentParser(prog='main.py batch', description='批量识别截图并调用AI，结果写成 JSONL')
+    parser.add_argument('inputs', nargs='+', help="目录、glob 模式（需加引号）或 '-'（从 stdin 读取路径）")
+    parser.add_argument('-o', '--output', help='输出文件，默认为 stdout')
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument('--ordered', dest='ordered', action='store_true', default=True, help='按输入顺序输出（默认）')
+    order.add_argument('--unordered', dest='ordered', action='store_false', help='完成即输出')
+    parser.add_argument('--resume', action='store_true', help='跳过输出文件中已经成功的图片，并追加写入')
+    parser.add_argument('--workers', type=int, default=0, help='OCR 进程数，默认为 CPU 核数；1 表示不启动进程池')
+    parser.add_argument('--max-inflight', type=int, default=4, help='同时进行的 AI 请求数上限')
+    parser.add_argument('--simplify', action='store_true', help='要求 AI 只给出简短答案（与界面的简化模式相同）')
+    args = parser.parse_args(argv)
+
+    if config is None:
+        from config.settings import AppConfig
+        config = AppConfig()
+
+    skip = read_done(args.output) if args.resume else set()
+    if args.output:
+        mode = 'a' if args.resume else 'w'
+        if mode == 'a' and os.path.exists(args.output) and os.path.getsize(args.output):
+            # 上次被中断时最后一行可能没写完，先补一个换行
+            with open(args.output, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+            if needs_newline:
+                with open(args.output, 'a', encoding='utf-8') as f:
+                    f.write('\n')
+        stream = open(args.output, mode, encoding='utf-8')
+    else:
+        stream = sys.stdout
+
+    runner = BatchRunner(
+        config, workers=args.workers, max_inflight=args.max_inflight,
+        simplify=args.simplify, ordered=args.ordered
+    )
+    writer = JsonlWriter(stream, ordered=args.ordered)
+
+    async def _run():
+        try:
+            return await runner.run(iter_inputs(args.inputs), writer, skip=skip)
+        finally:
+            await runner.aclose()
+
+    started = time.perf_counter()
+    try:
+        counts = asyncio.run(_run())
+    except KeyboardInterrupt:
+        print("已中断，使用 --resume 继续", file=sys.stderr)
+        return 130
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    summary = ', '.join(f"{k} {v}" for k, v in sorted(counts.items()))
+    print(f"完成: {summary or '没有输入'}，用时 {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 1 if counts.get('error') or counts.get('ai_error') else 0
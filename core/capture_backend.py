@@ -0,0 +1,341 @@
+#  Author: micr0softDrestlife
+"""Screen capture backends.
+
+ScreenshotManager 不直接调用 ImageGrab，而是通过一个 backend 对象截图：
+
+ - ImageGrabBackend: PIL.ImageGrab.grab，Windows / macOS 上的默认方案，每次截图都会新建 PIL 图像。
+ - XShmBackend: Linux X11 下通过 ctypes 调用 MIT-SHM 扩展（XShmGetImage），X 服务器把像素
+   直接写进一块共享内存；共享内存段按选区大小只分配一次，之后每帧都复用，
+   BGRA -> RGB 转换也写入调用方提供的缓冲区。
+ - FrameSourceBackend: 从给定的帧（NumPy 数组）或图片文件中依次取帧，用于测试和基准，
+   也可以用 CAPTURE_SOURCE 指定一个目录 / glob 回放录下的截图。
+
+所有 backend 的 grab(bbox, out=None) 都返回 RGB uint8 数组 (H, W, 3)；传入形状匹配的 out 时
+写入 out 并返回它。Use create_capture_backend(...) to pick one; 'auto' prefers XShm when a
+display is available and falls back to ImageGrab.
+"""
+
+import ctypes
+import ctypes.util
+import glob
+import os
+import sys
+import threading
+
+import numpy as np
+
+
+class CaptureBackendError(RuntimeError):
+    """Raised when a capture backend cannot be initialised."""
+
+
+def _output(out, h, w):
+    """out 形状匹配时复用，否则分配新的 RGB 缓冲区"""
+    if out is not None and out.shape == (h, w, 3) and out.dtype == np.uint8:
+        return out
+    return np.empty((h, w, 3), dtype=np.uint8)
+
+
+class BaseCaptureBackend:
+    """Minimal interface for capture backends."""
+
+    name = 'base'
+
+    def grab(self, bbox, out=None):
+        """截取屏幕坐标 bbox=(x1, y1, x2, y2) 的区域，返回 RGB uint8 数组；失败时抛出异常"""
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class ImageGrabBackend(BaseCaptureBackend):
+    name = 'imagegrab'
+
+    def grab(self, bbox, out=None):
+        from PIL import ImageGrab
+
+        screenshot = ImageGrab.grab(bbox=bbox)# 截取屏幕指定区域
+        if screenshot.mode != 'RGB':
+            screenshot = screenshot.convert('RGB')
+        # asarray 只做一次像素拷贝（PIL -> NumPy），之后的预处理和OCR都沿用这块 uint8 缓冲区
+        arr = np.asarray(screenshot)
+        if out is None:
+            return arr
+        out = _output(out, *arr.shape[:2])
+        out[...] = arr
+        return out
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+class _XImage(ctypes.Structure):
+    # 只声明用到的前几个字段（XImage 之后还有函数指针表，不通过 ctypes 访问）
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+    ]
+
+
+_ZPIXMAP = 2
+_ALL_PLANES = ctypes.c_ulong(-1).value
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+class XShmBackend(BaseCaptureBackend):
+    """X11 MIT-SHM 截图。
+
+    使用独立的 Display 连接；同一个连接不是线程安全的，截图用锁串行化。
+    选区超出屏幕时先裁剪到屏幕范围（XShmGetImage 越界会触发 X 错误，默认的错误处理会退出进程）。
+    """
+
+    name = 'xshm'
+
+    def __init__(self, display=None):
+        if not sys.platform.startswith('linux'):
+            raise CaptureBackendError("XShm 只在 Linux (X11) 下可用")
+        display = display or os.environ.get('DISPLAY')
+        if not display:
+            raise CaptureBackendError("没有 DISPLAY")
+
+        x11_path = ctypes.util.find_library('X11')
+        xext_path = ctypes.util.find_library('Xext')
+        if not x11_path or not xext_path:
+            raise CaptureBackendError("未找到 libX11 / libXext")
+        try:
+            self._x11 = ctypes.CDLL(x11_path)
+            self._xext = ctypes.CDLL(xext_path)
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        except OSError as e:
+            raise CaptureBackendError(f"加载 X11 库失败: {e}")
+        self._declare_api()
+
+        self._display = self._x11.XOpenDisplay(display.encode('utf-8'))
+        if not self._display:
+            raise CaptureBackendError(f"无法连接到 X 服务器 {display}")
+        if not self._xext.XShmQueryExtension(self._display):
+            self._x11.XCloseDisplay(self._display)
+            raise CaptureBackendError("X 服务器不支持 MIT-SHM 扩展")
+
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XDefaultRootWindow(self._display)
+        self._visual = self._x11.XDefaultVisual(self._display, screen)
+        self._depth = self._x11.XDefaultDepth(self._display, screen)
+        self.screen_size = (self._x11.XDisplayWidth(self._display, screen),
+                            self._x11.XDisplayHeight(self._display, screen))
+
+        self._lock = threading.Lock()
+        self._image = None
+        self._shminfo = None
+        self._pixels = None
+
+    def _declare_api(self):
+        x11, xext, libc = self._x11, self._xext, self._libc
+        c_void_p, c_int, c_ulong = ctypes.c_void_p, ctypes.c_int, ctypes.c_ulong
+
+        x11.XOpenDisplay.restype = c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [c_void_p]
+        x11.XDefaultScreen.restype = c_int
+        x11.XDefaultScreen.argtypes = [c_void_p]
+        x11.XDefaultRootWindow.restype = c_ulong
+        x11.XDefaultRootWindow.argtypes = [c_void_p]
+        x11.XDefaultVisual.restype = c_void_p
+        x11.XDefaultVisual.argtypes = [c_void_p, c_int]
+        x11.XDefaultDepth.restype = c_int
+        x11.XDefaultDepth.argtypes = [c_void_p, c_int]
+        x11.XDisplayWidth.restype = c_int
+        x11.XDisplayWidth.argtypes = [c_void_p, c_int]
+        x11.XDisplayHeight.restype = c_int
+        x11.XDisplayHeight.argtypes = [c_void_p, c_int]
+        x11.XSync.argtypes = [c_void_p, c_int]
+        x11.XFree.argtypes = [c_void_p]
+
+        xext.XShmQueryExtension.restype = c_int
+        xext.XShmQueryExtension.argtypes = [c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [c_void_p, c_void_p, ctypes.c_uint, c_int, c_void_p,
+                                         ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.restype = c_int
+        xext.XShmAttach.argtypes = [c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.restype = c_int
+        xext.XShmDetach.argtypes = [c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.restype = c_int
+        xext.XShmGetImage.argtypes = [c_void_p, c_ulong, ctypes.POINTER(_XImage), c_int, c_int, c_ulong]
+
+        libc.shmget.restype = c_int
+        libc.shmget.argtypes = [c_int, ctypes.c_size_t, c_int]
+        libc.shmat.restype = c_void_p
+        libc.shmat.argtypes = [c_int, c_void_p, c_int]
+        libc.shmdt.restype = c_int
+        libc.shmdt.argtypes = [c_void_p]
+        libc.shmctl.restype = c_int
+        libc.shmctl.argtypes = [c_int, c_int, c_void_p]
+
+    def _ensure_image(self, w, h):
+        """按选区大小创建 XImage + 共享内存段；大小不变时直接复用"""
+        if self._image is not None and (self._image.contents.width, self._image.contents.height) == (w, h):
+            return
+        self._release_image()
+
+        shminfo = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(self._display, self._visual, self._depth, _ZPIXMAP, None,
+                                           ctypes.byref(shminfo), w, h)
+        if not image:
+            raise CaptureBackendError("XShmCreateImage 失败")
+        if image.contents.bits_per_pixel != 32:
+            self._x11.XFree(image)
+            raise CaptureBackendError(f"不支持的像素格式: {image.contents.bits_per_pixel} bpp")
+        size = image.contents.bytes_per_line * h
+        shminfo.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if shminfo.shmid < 0:
+            self._x11.XFree(image)
+            raise CaptureBackendError(f"shmget 失败: errno {ctypes.get_errno()}")
+        addr = self._libc.shmat(shminfo.shmid, None, 0)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(shminfo.shmid, _IPC_RMID, None)
+            self._x11.XFree(image)
+            raise CaptureBackendError(f"shmat 失败: errno {ctypes.get_errno()}")
+        shminfo.shmaddr = addr
+        shminfo.readOnly = 0
+        image.contents.data = addr
+        self._xext.XShmAttach(self._display, ctypes.byref(shminfo))
+        self._x11.XSync(self._display, 0)
+        # X 服务器连上之后即可标记删除：两端都 detach（包括进程退出）后系统自动回收
+        self._libc.shmctl(shminfo.shmid, _IPC_RMID, None)
+
+        stride = image.contents.bytes_per_line
+        raw = np.ctypeslib.as_array((ctypes.c_uint8 * size).from_address(addr)).reshape(h, stride)
+        self._pixels = raw[:, :w * 4].reshape(h, w, 4)  # BGRA，共享内存上的视图
+        self._image = image
+        self._shminfo = shminfo
+
+    def _release_image(self):
+        if self._image is None:
+            return
+        self._pixels = None
+        self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+        self._x11.XSync(self._display, 0)
+        # XShmCreateImage 创建的图像只需释放结构体本身，像素在共享内存中
+        self._x11.XFree(self._image)
+        self._libc.shmdt(self._shminfo.shmaddr)
+        self._image = None
+        self._shminfo = None
+
+    def grab(self, bbox, out=None):
+        x1, y1, x2, y2 = bbox
+        sw, sh = self.screen_size
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(sw, int(x2)), min(sh, int(y2))
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"选区不在屏幕范围内: {bbox}")
+        w, h = x2 - x1, y2 - y1
+
+        with self._lock:
+            self._ensure_image(w, h)
+            if not self._xext.XShmGetImage(self._display, self._root, self._image, x1, y1, _ALL_PLANES):
+                raise RuntimeError("XShmGetImage 失败")
+            out = _output(out, h, w)
+            # BGRA -> RGB，直接写入输出缓冲区
+            out[..., 0] = self._pixels[..., 2]
+            out[..., 1] = self._pixels[..., 1]
+            out[..., 2] = self._pixels[..., 0]
+        return out
+
+    def close(self):
+        with self._lock:
+            self._release_image()
+            if self._display:
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+class FrameSourceBackend(BaseCaptureBackend):
+    """依次返回给定的帧（循环）。frames 中的元素可以是 RGB/RGBA/灰度数组或图片路径；
+    帧被视为整个屏幕，grab 时按 bbox 裁剪（超出部分被截掉）"""
+
+    name = 'file'
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        if not self.frames:
+            raise CaptureBackendError("没有可用的帧")
+        self._index = 0
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_source(cls, source):
+        """source 为目录（按文件名排序）、glob 模式或单个图片路径"""
+        if os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source))
+                     if name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
+        elif glob.has_magic(source):
+            paths = sorted(glob.glob(source))
+        else:
+            paths = [source]
+        return cls(paths)
+
+    def _frame(self, item):
+        if isinstance(item, np.ndarray):
+            frame = item
+        else:
+            frame = self._loaded.get(item)
+            if frame is None:
+                from PIL import Image
+                with Image.open(item) as image:
+                    frame = np.asarray(image.convert('RGB'))
+                self._loaded[item] = frame
+        if frame.ndim == 2:
+            frame = np.repeat(frame[:, :, None], 3, axis=2)
+        return frame[:, :, :3]
+
+    def grab(self, bbox, out=None):
+        with self._lock:
+            item = self.frames[self._index % len(self.frames)]
+            self._index += 1
+        frame = self._frame(item)
+        x1, y1, x2, y2 = bbox
+        crop = frame[max(0, int(y1)):max(0, int(y2)), max(0, int(x1)):max(0, int(x2))]
+        if crop.size == 0:
+            raise ValueError(f"选区不在帧范围内: {bbox}")
+        out = _output(out, *crop.shape[:2])
+        out[...] = crop
+        return out
+
+
+def create_capture_backend(kind='auto', source=None):
+    """Factory: return a capture backend for `kind` ('auto' / 'xshm' / 'imagegrab' / 'file')."""
+    kind = (kind or 'auto').lower()
+
+    if kind == 'file':
+        return FrameSourceBackend.from_source(source)
+
+    if kind == 'xshm' or (kind == 'auto' and sys.platform.startswith('linux') and os.environ.get('DISPLAY')):
+        try:
+            return XShmBackend()
+        except Exception as e:
+            if kind == 'xshm':
+                raise
+            print(f"XShm 截图不可用，回退到 ImageGrab: {e}")
+
+    return ImageGrabBackend()
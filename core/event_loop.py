@@ -0,0 +1,51 @@
+#  Author: micr0softDrestlife
+"""Shared asyncio event loop thread.
+
+GUI（Tk 主循环占用主线程）和无界面的运行方式共用同一个事件循环线程：
+所有 AI 请求都作为协程提交到这个循环中并发执行，不再为每次 Solve 新建线程，
+超时和取消也都由 asyncio 统一处理。
+"""
+
+import asyncio
+import threading
+
+
+class AsyncLoopThread:
+    """在一个守护线程中运行 asyncio 事件循环"""
+
+    def __init__(self, name='ai-event-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """从任意线程提交协程，返回 concurrent.futures.Future（可 cancel()）"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """从其他线程阻塞地运行协程并返回结果"""
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_loop_thread() -> AsyncLoopThread:
+    """返回进程内共享的事件循环线程（首次调用时启动）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AsyncLoopThread()
+        return _shared
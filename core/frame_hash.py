@@ -0,0 +1,70 @@
+#  Author: micr0softDrestlife
+"""Cheap downsampled frame signatures.
+
+截图先缩成一张很小的灰度缩略图，再用缩略图判断画面是否变化。
+缩略图和中间缓冲区由 FrameThumbnailer 持有并在每一帧之间复用。
+"""
+
+import hashlib
+
+import cv2
+import numpy as np
+
+# 缩略图尺寸 (宽, 高)。文字变化在 INTER_AREA 缩小后仍会留下明显的灰度差
+THUMB_SIZE = (160, 90)
+
+
+class FrameThumbnailer:
+    """把任意大小的 RGB/灰度帧缩成固定大小的灰度缩略图，复用输出缓冲区。"""
+
+    def __init__(self, size=THUMB_SIZE):
+        self.size = tuple(size)
+        w, h = self.size
+        self._rgb_small = np.empty((h, w, 3), dtype=np.uint8)
+        self._diff = np.empty((h, w), dtype=np.uint8)
+
+    def new_buffer(self):
+        w, h = self.size
+        return np.zeros((h, w), dtype=np.uint8)
+
+    def thumbnail(self, frame, out):
+        """把 frame 缩小并写入 out（HxW uint8），返回 out。"""
+        if frame.ndim == 3:
+            if frame.shape[2] == 4:
+                frame = frame[:, :, :3]
+            cv2.resize(frame, self.size, dst=self._rgb_small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._rgb_small, cv2.COLOR_RGB2GRAY, dst=out)
+        else:
+            cv2.resize(frame, self.size, dst=out, interpolation=cv2.INTER_AREA)
+        return out
+
+    def max_diff(self, a, b):
+        """两张缩略图之间最大的单像素灰度差。"""
+        cv2.absdiff(a, b, dst=self._diff)
+        return int(self._diff.max())
+
+
+# 计算缓存键时使用的缩略图宽度；比 THUMB_SIZE 更精细，避免只差几个字的题目撞键
+DIGEST_WIDTH = 320
+
+
+def frame_digest(frame, width=DIGEST_WIDTH):
+    """返回帧的下采样哈希（十六进制字符串）。
+
+    帧被缩到固定宽度的灰度图并量化到 64 级，截图中细微的抗锯齿/渲染噪声不会改变
+    哈希，而文字内容的变化会。原始尺寸也计入哈希。
+    """
+    h, w = frame.shape[:2]
+    small_w = min(width, w)
+    small_h = max(1, int(round(h * small_w / float(w))))
+    if frame.ndim == 3:
+        small = cv2.resize(frame[:, :, :3], (small_w, small_h), interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    else:
+        small = cv2.resize(frame, (small_w, small_h), interpolation=cv2.INTER_AREA)
+    np.right_shift(small, 2, out=small)
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{w}x{h}:".encode('ascii'))
+    digest.update(small.tobytes())
+    return digest.hexdigest()
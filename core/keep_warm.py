@@ -0,0 +1,85 @@
+#  Author: micr0softDrestlife
+"""Model warm-up and keep-warm pings for local Ollama.
+
+Ollama 在模型空闲超过 keep_alive 后把模型从内存中卸载，之后的第一次 Solve 要先等
+qwen2.5-coder:7b 重新加载，往往要多等好几秒。KeepWarm.ping() 做一次轻量的检查：
+
+    - ai_client.model_state() 查询 /api/ps，看模型是否还在内存中
+    - ai_client.preload()：模型已加载时只刷新卸载时间，已被卸载时重新加载（不生成任何 token）
+
+启动时调用一次 ping() 在后台预加载模型；"开始答题"开关打开期间 start() 在后台线程中
+每隔 interval 秒 ping 一次。每次的状态交给 on_state(state) 显示在状态栏。
+远程提供方的 model_state() 为 None，不需要保活，后台线程随即退出。
+"""
+
+import threading
+
+STATE_TEXT = {
+    'loading': '模型加载中',
+    'loaded': '模型已加载',
+    'unloaded': '模型未加载',
+    'offline': 'Ollama 未连接',
+}
+
+
+def state_text(state):
+    """状态栏用的文字；不适用（远程提供方）时为空字符串"""
+    return STATE_TEXT.get(state, '')
+
+
+class KeepWarm:
+    def __init__(self, ai_client, interval=60.0, on_state=None):
+        """on_state(state) 在调用 ping() 的线程中被调用，界面需要自行切回主线程"""
+        self.ai_client = ai_client
+        self.interval = float(interval or 0)
+        self.on_state = on_state
+        self.state = None
+        self.pings = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """开始周期性保活；interval 为 0 时不启动"""
+        if self.running or self.interval <= 0:
+            return
+        # 每次启动使用新的停止事件，避免旧线程在 stop() 之后被重新唤醒
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name='keep-warm', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def ping(self):
+        """检查一次模型状态，未加载时重新加载；返回最新的状态"""
+        # 启动预加载与周期保活可能同时触发，同一时间只发一组请求
+        with self._lock:
+            state = self.ai_client.model_state()
+            if state is None or state == 'offline':
+                return self._report(state)
+            if state == 'unloaded':
+                self._report('loading')
+            self.ai_client.preload()
+            self.pings += 1
+            return self._report(self.ai_client.model_state())
+
+    def _report(self, state):
+        self.state = state
+        if self.on_state is not None:
+            self.on_state(state)
+        return state
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                if self.ping() is None:
+                    return
+            except Exception as e:
+                print(f"模型保活失败: {e}")
+            stop.wait(self.interval)
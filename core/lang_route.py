@@ -0,0 +1,144 @@
+#  Author: micr0softDrestlife
+"""Per-region OCR language routing.
+
+OCR_LANG 为 'chi_sim+eng' 时，tesseract 对每一行都要跑两个 LSTM 模型。题目通常整段是中文
+或整段是英文，因此先从截图中切出一小条样本（第一个文字块的前几行）用完整的语言组合识别，
+按识别结果中汉字与拉丁字母的字数比例判断主要文字，正式识别只加载需要的模型：
+
+    几乎全是汉字      -> 'chi_sim'（chi_sim 模型本身也能识别数字和选项字母）
+    几乎全是拉丁单词  -> 'eng'
+    混排或样本太少    -> 保持 OCR_LANG
+
+每个选区记住最近一次的判断，之后的截图直接使用；用记住的语言识别出的平均词置信度
+低于 OCR_LANG_RECHECK_CONFIDENCE 时（例如选区里换成了另一种语言的题目）重新判断。
+退回完整语言组合的判断（混排、无法判断或缩小后不可靠）只保留 fallback_frames 次识别，
+之后重新判断，一帧过渡画面不会让选区一直使用慢的完整组合。没有选区信息的调用（批量、
+HTTP 服务）不做判断，直接使用完整的语言组合。
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from core.layout import estimate_char_height, find_text_blocks, text_mask
+
+# 汉字 / 假名 / 韩文
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+_LATIN_WORD_RE = re.compile(r'[A-Za-z\u00c0-\u024f]{2,}')
+_CJK_LANGS = ('chi_sim', 'chi_tra', 'jpn', 'kor')
+
+# 汉字在（汉字 + 拉丁字母）中的占比达到该值视为中文，低于 1 - 该值视为英文
+DOMINANT_RATIO = 0.9
+# 样本中汉字 + 拉丁字母少于该数量时不做判断
+MIN_CHARS = 4
+# 退回完整语言组合的判断保留的识别次数
+FALLBACK_FRAMES = 20
+
+
+def script_counts(text):
+    """返回 (汉字数, 拉丁字母数)；两个字母以上的单词才计入，单个字母（选项 A/B/C）不计入。
+
+    按字母而不是按单词计数：中文题目里夹着的代码片段（print(len(items))）按实际的字数计入，
+    不会被当作几个“单词”而让整段被判断为纯中文。
+    """
+    return len(_CJK_RE.findall(text)), sum(len(word) for word in _LATIN_WORD_RE.findall(text))
+
+
+def is_cjk_lang(lang):
+    return lang.split('_vert')[0] in _CJK_LANGS
+
+
+def choose_lang(text, lang):
+    """根据样本文字从 lang（'chi_sim+eng' 形式）中选出需要的语言；无法判断时返回 None"""
+    parts = lang.split('+')
+    cjk, latin = script_counts(text)
+    if cjk + latin < MIN_CHARS:
+        return None
+    ratio = cjk / float(cjk + latin)
+    if ratio >= DOMINANT_RATIO:
+        chosen = [p for p in parts if is_cjk_lang(p)]
+    elif ratio <= 1.0 - DOMINANT_RATIO:
+        chosen = [p for p in parts if not is_cjk_lang(p)]
+    else:
+        return lang
+    return '+'.join(chosen) if chosen else lang
+
+
+def sample_region(image, max_lines=3):
+    """第一个文字块（阅读顺序）的前 max_lines 行，返回视图；找不到文字时返回整张图"""
+    mask = text_mask(image)
+    boxes = find_text_blocks(image, mask=mask)
+    if not boxes:
+        return image
+    x, y, w, h = boxes[0]
+    # 行距按 1.8 倍字高估算
+    h = min(h, int(estimate_char_height(mask) * 1.8 * max_lines) + 12)
+    return image[y:y + h, x:x + w]
+
+
+class LanguageRouter:
+    """记住每个选区最近一次判断出的语言（最多 max_regions 个选区，LRU）"""
+
+    def __init__(self, lang, recheck_confidence=60.0, max_regions=64, sample_lines=3,
+                 fallback_frames=FALLBACK_FRAMES):
+        self.lang = lang
+        self.recheck_confidence = float(recheck_confidence)
+        self.max_regions = int(max_regions)
+        self.sample_lines = int(sample_lines)
+        self.fallback_frames = max(1, int(fallback_frames))
+        # 选区 -> [语言, 剩余使用次数]；缩小后的语言不过期（剩余次数为 None）
+        self._regions = OrderedDict()
+        self._lock = threading.Lock()
+        # 统计信息
+        self.detections = 0
+        self.reused = 0
+
+    @property
+    def enabled(self):
+        """只有一种语言时无需路由"""
+        return '+' in self.lang
+
+    def remembered(self, region):
+        if region is None:
+            return None
+        with self._lock:
+            entry = self._regions.get(region)
+            if entry is None:
+                return None
+            lang, remaining = entry
+            if remaining is not None:
+                if remaining <= 0:
+                    del self._regions[region]
+                    return None
+                entry[1] = remaining - 1
+            self._regions.move_to_end(region)
+            self.reused += 1
+            return lang
+
+    def remember(self, region, lang):
+        """lang 为 None（无法判断）时记住完整的语言组合；完整组合只使用 fallback_frames 次"""
+        if region is None:
+            return
+        lang = lang or self.lang
+        with self._lock:
+            self._regions[region] = [lang, self.fallback_frames if lang == self.lang else None]
+            self._regions.move_to_end(region)
+            while len(self._regions) > self.max_regions:
+                self._regions.popitem(last=False)
+
+    def forget(self, region):
+        with self._lock:
+            self._regions.pop(region, None)
+
+    def detect(self, backend, image, psm, oem):
+        """用完整的语言组合识别样本条，返回选出的语言；无法判断时返回 None"""
+        self.detections += 1
+        sample = sample_region(image, self.sample_lines)
+        text = backend.recognize(sample, lang=self.lang, psm=psm, oem=oem)
+        return choose_lang(text, self.lang)
+
+    def needs_recheck(self, confidences):
+        """没有置信度信息（backend 不提供）时不重新判断"""
+        if not confidences:
+            return False
+        return sum(confidences) / len(confidences) < self.recheck_confidence
@@ -0,0 +1,177 @@
+#  Author: micr0softDrestlife
+"""Text-block detection before OCR.
+
+大区域里往往只有几段文字，其余都是空白或装饰性的界面。这里先用连通域找出文字块
+（二值化 → 按字高膨胀把字连成行/段 → connectedComponentsWithStats），裁掉空白边距，
+并按阅读顺序（从上到下，同一行内从左到右）排列。
+
+块数少于工作进程数时，再把最高的块在行间空白处切开，使各进程的工作量大致相同。
+
+增量识别（OCR_INCREMENTAL）用 text_bands 把整个区域按行间空白切成横向的文字带，
+每条文字带单独哈希和识别。
+"""
+
+import cv2
+import numpy as np
+
+# 找不到任何字符时假定的字高（像素）
+DEFAULT_CHAR_HEIGHT = 20
+
+
+def _gray(image):
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY)
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def text_mask(image):
+    """文字像素为 255 的二值图。面积占多数的一侧视为背景，深色/浅色主题都适用"""
+    gray = _gray(image)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(mask) > mask.size // 2:
+        cv2.bitwise_not(mask, dst=mask)
+    return mask
+
+
+def estimate_char_height(mask):
+    """用连通域高度的 80 分位数近似字高（忽略噪点；英文小写字母偏矮，不用中位数）"""
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    heights = [stats[i, cv2.CC_STAT_HEIGHT] for i in range(1, n)
+               if stats[i, cv2.CC_STAT_AREA] >= 4 and stats[i, cv2.CC_STAT_HEIGHT] >= 3]
+    if not heights:
+        return DEFAULT_CHAR_HEIGHT
+    return int(np.percentile(heights, 80))
+
+
+def reading_order(boxes):
+    """(x, y, w, h) 按阅读顺序排序：纵向中心落在同一行范围内的块视为同一行"""
+    rows = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        center = box[1] + box[3] / 2.0
+        if rows and rows[-1]['top'] <= center <= rows[-1]['bottom']:
+            rows[-1]['boxes'].append(box)
+            rows[-1]['bottom'] = max(rows[-1]['bottom'], box[1] + box[3])
+        else:
+            rows.append({'top': box[1], 'bottom': box[1] + box[3], 'boxes': [box]})
+    return [box for row in rows for box in sorted(row['boxes'], key=lambda b: b[0])]
+
+
+def find_text_blocks(image, pad=6, mask=None):
+    """返回文字块列表 [(x, y, w, h), ...]（已按阅读顺序排列，带 pad 像素边距）"""
+    if mask is None:
+        mask = text_mask(image)
+    img_h, img_w = mask.shape[:2]
+    char_h = estimate_char_height(mask)
+
+    # 横向约 1.5 个字高把字连成行，纵向约 1 个字高把相邻行连成段
+    kx = max(3, int(char_h * 1.5))
+    ky = max(1, int(char_h))
+    merged = cv2.dilate(mask, np.ones((ky, kx), np.uint8))
+
+    n, _, stats, _ = cv2.connectedComponentsWithStats(merged, connectivity=8)
+    boxes = []
+    for i in range(1, n):
+        x, y, w, h = (int(v) for v in stats[i, :4])
+        # 去掉膨胀带来的外扩，再加上边距
+        x0 = max(0, x + kx // 2 - pad)
+        y0 = max(0, y + ky // 2 - pad)
+        x1 = min(img_w, x + w - kx // 2 + pad)
+        y1 = min(img_h, y + h - ky // 2 + pad)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        # 太矮或文字像素太少的是噪点
+        if y1 - y0 < char_h * 0.5 or cv2.countNonZero(mask[y0:y1, x0:x1]) < char_h:
+            continue
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return reading_order(boxes)
+
+
+def _split_box(mask, box):
+    """在最靠近中间的一段空白行处把块切成上下两块；没有行间空白时返回 None"""
+    x, y, w, h = box
+    has_text = cv2.reduce(mask[y:y + h, x:x + w], 1, cv2.REDUCE_MAX).ravel() > 0
+    text_rows = np.flatnonzero(has_text)
+    if text_rows.size == 0:
+        return None
+    # 只考虑第一行文字和最后一行文字之间的空白行（边距不算）
+    blank = np.flatnonzero(~has_text)
+    inner = blank[(blank > text_rows[0]) & (blank < text_rows[-1])]
+    if inner.size == 0:
+        return None
+    cut = int(inner[np.argmin(np.abs(inner - h / 2.0))])
+    return (x, y, w, cut), (x, y + cut, w, h - cut)
+
+
+def text_bands(image, pad=4, mask=None, min_height=3):
+    """按行间空白把图像切成横向的文字带，返回 [(y0, y1), ...]（从上到下）。
+
+    间隔不超过 1/4 字高的空白（标点、下划线与文字之间）不切开；每条文字带上下各带最多
+    pad 像素的空白边距（不超过与相邻文字带之间空白的一半，文字带之间不重叠）。
+    低于 min_height 像素的文字带视为噪点。
+    """
+    if mask is None:
+        mask = text_mask(image)
+    rows = np.flatnonzero(cv2.reduce(mask, 1, cv2.REDUCE_MAX).ravel() > 0)
+    if rows.size == 0:
+        return []
+    gap = max(2, estimate_char_height(mask) // 4)
+    breaks = np.flatnonzero(np.diff(rows) > gap)
+    starts = [int(rows[0])] + [int(y) for y in rows[breaks + 1]]
+    ends = [int(y) + 1 for y in rows[breaks]] + [int(rows[-1]) + 1]
+
+    height = mask.shape[0]
+    bands = []
+    for i, (y0, y1) in enumerate(zip(starts, ends)):
+        if y1 - y0 < min_height:
+            continue
+        above = min(pad, (y0 - ends[i - 1]) // 2) if i else pad
+        below = min(pad, (starts[i + 1] - y1) // 2) if i + 1 < len(starts) else pad
+        bands.append((max(0, y0 - above), min(height, y1 + below)))
+    return bands
+
+
+def layout_blocks(image, target_blocks=1, pad=6, max_blocks=64):
+    """检测文字块；块数少于 target_blocks 时把最高的块在行间切开，直到数量足够或无法再切"""
+    mask = text_mask(image)
+    boxes = find_text_blocks(image, pad=pad, mask=mask)
+    target = min(int(target_blocks), max_blocks)
+    unsplittable = set()
+    while boxes and len(boxes) < target:
+        candidates = [i for i, b in enumerate(boxes) if b not in unsplittable]
+        if not candidates:
+            break
+        idx = max(candidates, key=lambda i: boxes[i][3])
+        parts = _split_box(mask, boxes[idx])
+        if parts is None:
+            unsplittable.add(boxes[idx])
+            continue
+        # 原位替换，保持阅读顺序
+        boxes[idx:idx + 1] = list(parts)
+    return boxes
+
+
+def group_blocks(boxes, groups):
+    """把按阅读顺序排列的块切成最多 groups 段连续的组，各组面积大致相同。
+
+    每组作为一个任务发给一个工作进程，避免逐行提交带来的往返开销。
+    """
+    if not boxes:
+        return []
+    groups = max(1, min(int(groups), len(boxes)))
+    total = float(sum(w * h for _, _, w, h in boxes))
+    result, current, acc = [], [], 0.0
+    for i, box in enumerate(boxes):
+        current.append(box)
+        acc += box[2] * box[3]
+        remaining_boxes = len(boxes) - i - 1
+        remaining_groups = groups - len(result) - 1
+        # 达到平均面积，或者剩下的块刚好够每组一个时结束当前组
+        if remaining_groups > 0 and (acc >= total * (len(result) + 1) / groups
+                                     or remaining_boxes == remaining_groups):
+            result.append(current)
+            current = []
+    if current:
+        result.append(current)
+    return result
@@ -0,0 +1,221 @@
+#  Author: micr0softDrestlife
+"""Counters, histograms and per-Solve timing spans.
+
+其他模块通过模块级函数使用同一个注册表：
+
+    from core import metrics
+    metrics.counter('ocr.cache_hit').inc()
+    metrics.histogram('solve.ocr_ms').observe(123.4)
+    metrics.snapshot()   # {'counters': {...}, 'histograms': {name: {count, mean, p50, p95, p99, ...}}}
+
+每次 Solve 用一个 SolveTrace 记录各阶段耗时（排队等待、截图、预处理、OCR、首个 token、
+AI 总耗时），结束时写入直方图，并作为一行 JSON 追加到轮转日志（configure_solve_log）。
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# 状态栏中各阶段的显示名称与顺序
+STAGE_LABELS = (
+    ('queue_wait', '排队'),
+    ('capture', '截图'),
+    ('preprocess', '预处理'),
+    ('ocr', 'OCR'),
+    ('ai_first_token', '首字'),
+    ('ai_total', 'AI'),
+)
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Histogram:
+    """保留最近 window 个样本用于计算分位数；count/sum/min/max 为全部样本的累计值"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        value = float(value)
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def snapshot(self):
+        with self._lock:
+            ordered = sorted(self._samples)
+            return {
+                'count': self.count,
+                'sum': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max,
+                'p50': _percentile(ordered, 50),
+                'p95': _percentile(ordered, 95),
+                'p99': _percentile(ordered, 99),
+            }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def counter(self, name) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def histogram(self, name) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram()
+            return self._histograms[name]
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        return {
+            'counters': {name: c.value for name, c in counters.items()},
+            'histograms': {name: h.snapshot() for name, h in histograms.items()},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
+
+
+def counter(name) -> Counter:
+    return registry.counter(name)
+
+
+def histogram(name) -> Histogram:
+    return registry.histogram(name)
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+# Solve 日志：每行一个 JSON 对象，由 configure_solve_log 配置轮转文件
+solve_log = logging.getLogger('ak_subject_one.solve')
+solve_log.propagate = False
+
+
+def configure_solve_log(path, max_bytes=1024 * 1024, backup_count=3):
+    """path 为空时不写日志文件。重复调用会替换之前的文件 handler"""
+    for handler in list(solve_log.handlers):
+        solve_log.removeHandler(handler)
+        handler.close()
+    if not path:
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=int(max_bytes), backupCount=int(backup_count), encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    solve_log.addHandler(handler)
+    solve_log.setLevel(logging.INFO)
+    return handler
+
+
+_solve_ids = itertools.count(1)
+
+
+class SolveTrace:
+    """一次 Solve 的各阶段耗时（秒）。同名阶段多次记录时累加"""
+
+    def __init__(self, trigger='manual'):
+        self.id = next(_solve_ids)
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.spans = {}
+        self.meta = {}
+        self.status = None
+        self.total = None
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def since_start(self):
+        return time.perf_counter() - self.started
+
+    def finish(self, status='ok'):
+        """结束计时：写入直方图与计数器，并追加一行到 Solve 日志。重复调用无效"""
+        if self.total is not None:
+            return self.to_dict()
+        self.total = self.since_start()
+        self.status = status
+        counter('solve.count').inc()
+        counter(f"solve.{status}").inc()
+        for name, seconds in self.spans.items():
+            histogram(f"solve.{name}_ms").observe(seconds * 1000.0)
+        histogram('solve.total_ms').observe(self.total * 1000.0)
+        record = self.to_dict()
+        if solve_log.handlers:
+            solve_log.info(json.dumps(record, ensure_ascii=False))
+        return record
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp)),
+            'trigger': self.trigger,
+            'status': self.status,
+            'total_ms': round(self.total * 1000.0, 1) if self.total is not None else None,
+            'spans_ms': {name: round(s * 1000.0, 1) for name, s in self.spans.items()},
+            'meta': self.meta,
+        }
+
+    def summary_text(self):
+        """状态栏用的简短分解，例如 "截图 8 | 预处理 35 | OCR 420 | 首字 650 | AI 1900 | 共 2410ms" """
+        parts = []
+        for name, label in STAGE_LABELS:
+            if name in self.spans:
+                parts.append(f"{label} {self.spans[name] * 1000.0:.0f}")
+        total = self.total if self.total is not None else self.since_start()
+        parts.append(f"共 {total * 1000.0:.0f}ms")
+        return ' | '.join(parts)
@@ -0,0 +1,310 @@
+#  Author: micr0softDrestlife
+"""OCR backends.
+
+OCREngine 不直接调用 tesseract，而是通过一个 backend 对象完成识别：
+
+ - TessAPIBackend: 通过 ctypes 直接加载 libtesseract（te_exe 里打包了
+   libtesseract-5.dll），模型只在构造时加载一次，之后每次识别都在进程内完成，
+   没有进程启动和模型重新加载的开销。
+ - SubprocessBackend: 每次启动一个 tesseract 子进程，图像经 stdin 传入，作为回退方案。
+
+Use create_backend(...) to pick a backend; 'auto' tries the in-process backend
+first and falls back to the subprocess one when libtesseract cannot be loaded.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import re
+import sys
+import threading
+
+# tesseract 的引擎/分页模式常量（与 --oem 1 --psm 6 对应）
+OEM_LSTM_ONLY = 1
+PSM_SINGLE_BLOCK = 6
+
+DEFAULT_LANG = 'chi_sim+eng'
+
+# 中日韩文字和全角标点：tsv 中相邻的这类词之间不加空格（与 tesseract 文本输出一致）
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+class OCRBackendError(RuntimeError):
+    """Raised when a backend cannot be initialised."""
+
+
+class BaseOCRBackend:
+    """Minimal interface for OCR backends."""
+
+    name = 'base'
+
+    def recognize(self, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY) -> str:
+        """识别 uint8 图像（灰度 HxW 或 RGB HxWx3），返回原始文本。"""
+        raise NotImplementedError()
+
+    def recognize_data(self, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+        """识别并返回 (文本, 每个词的置信度列表[0-100])。默认实现不提供置信度。"""
+        return self.recognize(image, lang=lang, psm=psm, oem=oem), []
+
+    def close(self):
+        pass
+
+
+class SubprocessBackend(BaseOCRBackend):
+    """每次调用都启动一个 tesseract 进程，作为回退方案。
+
+    图像以 PNM 格式经 stdin 传给 tesseract（``tesseract stdin stdout``），
+    PNM 只是一个文本头加原始像素，不需要 PNG 编解码，也不写临时文件。
+    """
+
+    name = 'subprocess'
+
+    def __init__(self, tesseract_path=None):
+        self.tesseract_cmd = tesseract_path or 'tesseract'
+
+    @staticmethod
+    def encode_pnm(image):
+        """把 uint8 灰度/RGB 数组编码成 PGM/PPM 字节串。"""
+        import numpy as np
+
+        arr = np.asarray(image)
+        if arr.ndim == 3 and arr.shape[2] == 4:
+            arr = arr[:, :, :3]
+        if arr.ndim == 2:
+            magic = b'P5'
+        elif arr.ndim == 3 and arr.shape[2] == 3:
+            magic = b'P6'
+        else:
+            raise ValueError(f"不支持的图像形状: {arr.shape}")
+        h, w = arr.shape[:2]
+        header = magic + f"\n{w} {h}\n255\n".encode('ascii')
+        return header + np.ascontiguousarray(arr, dtype=np.uint8).tobytes()
+
+    def _run(self, image, lang, psm, oem, *extra):
+        import subprocess
+
+        cmd = [self.tesseract_cmd, 'stdin', 'stdout', '-l', lang, '--oem', str(oem), '--psm', str(psm)]
+        cmd.extend(extra)
+        kwargs = {}
+        if sys.platform == 'win32':
+            # 避免每次识别都弹出控制台窗口
+            kwargs['creationflags'] = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        proc = subprocess.run(cmd, input=self.encode_pnm(image), capture_output=True, **kwargs)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.decode('utf-8', errors='replace').strip())
+        return proc.stdout.decode('utf-8', errors='replace')
+
+    def recognize(self, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+        return self._run(image, lang, psm, oem)
+
+    def recognize_data(self, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+        """使用 tsv 输出（与 image_to_data 相同）得到每个词的置信度，并按行拼回与 recognize() 相同的文本"""
+        return parse_tsv(self._run(image, lang, psm, oem, 'tsv'))
+
+
+def _join_words(words):
+    """拼接一行中的词：两侧都是中日韩字符时直接相连，否则用空格分隔"""
+    line = words[0]
+    for word in words[1:]:
+        if not (_CJK_RE.match(line[-1]) and _CJK_RE.match(word[0])):
+            line += ' '
+        line += word
+    return line
+
+
+def parse_tsv(tsv):
+    """解析 tesseract 的 TSV 输出，返回 (文本, 词置信度列表)。
+    与 tesseract 的文本输出一致：每行一个换行，段落之间空一行"""
+    lines = {}
+    confidences = []
+    rows = tsv.splitlines()
+    for row in rows[1:]:
+        cols = row.split('\t')
+        if len(cols) < 12 or cols[0] != '5':
+            continue
+        word = cols[11].strip()
+        try:
+            conf = float(cols[10])
+        except ValueError:
+            continue
+        if not word or conf < 0:
+            continue
+        confidences.append(conf)
+        key = (int(cols[2]), int(cols[3]), int(cols[4]))  # block, par, line
+        lines.setdefault(key, []).append(word)
+    parts = []
+    paragraph = None
+    for (block, par, _), words in sorted(lines.items()):
+        if paragraph is not None and (block, par) != paragraph:
+            parts.append('')
+        paragraph = (block, par)
+        parts.append(_join_words(words))
+    text = '\n'.join(parts) + '\n' if parts else ''
+    return text, confidences
+
+
+def _find_libtesseract(tesseract_path=None):
+    """查找 libtesseract 动态库，优先使用 tesseract.exe 同目录下打包的版本。"""
+    if sys.platform == 'win32':
+        names = ('libtesseract-5.dll', 'tesseract50.dll')
+    elif sys.platform == 'darwin':
+        names = ('libtesseract.5.dylib',)
+    else:
+        names = ('libtesseract.so.5',)
+
+    if tesseract_path:
+        exe_dir = os.path.dirname(os.path.abspath(tesseract_path))
+        for name in names:
+            path = os.path.join(exe_dir, name)
+            if os.path.isfile(path):
+                return path
+    return ctypes.util.find_library('tesseract') or ctypes.util.find_library('libtesseract-5')
+
+
+class TessAPIBackend(BaseOCRBackend):
+    """常驻进程内的 tesseract（libtesseract C API）。
+
+    每种语言组合只 Init 一次并缓存 TessBaseAPI 句柄；同一个句柄不是线程安全的，
+    因此识别过程用锁串行化。并行识别请使用多进程，每个进程各自持有一个 backend。
+    """
+
+    name = 'capi'
+
+    def __init__(self, tesseract_path=None, tessdata_path=None, lang=DEFAULT_LANG, oem=OEM_LSTM_ONLY):
+        lib_path = _find_libtesseract(tesseract_path)
+        if not lib_path:
+            raise OCRBackendError("未找到 libtesseract 动态库")
+
+        lib_dir = os.path.dirname(lib_path)
+        if sys.platform == 'win32' and lib_dir and hasattr(os, 'add_dll_directory'):
+            # libtesseract-5.dll 依赖同目录下的 leptonica 等 dll
+            self._dll_dir = os.add_dll_directory(lib_dir)
+
+        try:
+            self._lib = ctypes.CDLL(lib_path)
+        except OSError as e:
+            raise OCRBackendError(f"加载 libtesseract 失败: {e}")
+        self._declare_api(self._lib)
+
+        if tessdata_path is None and tesseract_path:
+            tessdata_path = os.path.join(os.path.dirname(os.path.abspath(tesseract_path)), 'tessdata')
+        self.tessdata_path = tessdata_path
+        self.oem = oem
+        self._handles = {}
+        self._lock = threading.Lock()
+
+        # 构造时加载默认语言模型，后续调用直接复用
+        self._get_handle(lang, oem)
+
+    @staticmethod
+    def _declare_api(lib):
+        c_void_p, c_int, c_char_p = ctypes.c_void_p, ctypes.c_int, ctypes.c_char_p
+
+        lib.TessBaseAPICreate.restype = c_void_p
+        lib.TessBaseAPICreate.argtypes = []
+        lib.TessBaseAPIInit2.restype = c_int
+        lib.TessBaseAPIInit2.argtypes = [c_void_p, c_char_p, c_char_p, c_int]
+        lib.TessBaseAPISetPageSegMode.restype = None
+        lib.TessBaseAPISetPageSegMode.argtypes = [c_void_p, c_int]
+        lib.TessBaseAPISetImage.restype = None
+        lib.TessBaseAPISetImage.argtypes = [c_void_p, c_void_p, c_int, c_int, c_int, c_int]
+        lib.TessBaseAPIGetUTF8Text.restype = c_void_p
+        lib.TessBaseAPIGetUTF8Text.argtypes = [c_void_p]
+        lib.TessDeleteText.restype = None
+        lib.TessDeleteText.argtypes = [c_void_p]
+        lib.TessBaseAPIClear.restype = None
+        lib.TessBaseAPIClear.argtypes = [c_void_p]
+        lib.TessBaseAPIAllWordConfidences.restype = ctypes.POINTER(c_int)
+        lib.TessBaseAPIAllWordConfidences.argtypes = [c_void_p]
+        lib.TessDeleteIntArray.restype = None
+        lib.TessDeleteIntArray.argtypes = [ctypes.POINTER(c_int)]
+        lib.TessBaseAPIEnd.restype = None
+        lib.TessBaseAPIEnd.argtypes = [c_void_p]
+        lib.TessBaseAPIDelete.restype = None
+        lib.TessBaseAPIDelete.argtypes = [c_void_p]
+
+    def _get_handle(self, lang, oem):
+        key = (lang, oem)
+        handle = self._handles.get(key)
+        if handle:
+            return handle
+
+        handle = self._lib.TessBaseAPICreate()
+        datapath = self.tessdata_path.encode('utf-8') if self.tessdata_path else None
+        rc = self._lib.TessBaseAPIInit2(handle, datapath, lang.encode('utf-8'), oem)
+        if rc != 0:
+            self._lib.TessBaseAPIDelete(handle)
+            raise OCRBackendError(f"tesseract 初始化失败 (lang={lang}, datapath={self.tessdata_path})")
+        self._handles[key] = handle
+        return handle
+
+    def recognize(self, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+        return self._recognize(image, lang, psm, oem, with_confidences=False)[0]
+
+    def recognize_data(self, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+        return self._recognize(image, lang, psm, oem, with_confidences=True)
+
+    def _recognize(self, image, lang, psm, oem, with_confidences):
+        import numpy as np
+
+        arr = np.ascontiguousarray(image, dtype=np.uint8)
+        if arr.ndim == 2:
+            bpp = 1
+        elif arr.ndim == 3 and arr.shape[2] in (3, 4):
+            bpp = arr.shape[2]
+        else:
+            raise ValueError(f"不支持的图像形状: {arr.shape}")
+        h, w = arr.shape[:2]
+
+        with self._lock:
+            handle = self._get_handle(lang, oem)
+            self._lib.TessBaseAPISetPageSegMode(handle, psm)
+            self._lib.TessBaseAPISetImage(handle, arr.ctypes.data, w, h, bpp, arr.strides[0])
+            ptr = self._lib.TessBaseAPIGetUTF8Text(handle)
+            confidences = []
+            try:
+                text = ctypes.string_at(ptr).decode('utf-8', errors='replace') if ptr else ''
+                if with_confidences:
+                    confidences = self._word_confidences(handle)
+            finally:
+                if ptr:
+                    self._lib.TessDeleteText(ptr)
+                self._lib.TessBaseAPIClear(handle)
+        return text, confidences
+
+    def _word_confidences(self, handle):
+        # 返回以 -1 结尾的 int 数组，需用 TessDeleteIntArray 释放
+        arr = self._lib.TessBaseAPIAllWordConfidences(handle)
+        if not arr:
+            return []
+        try:
+            confidences = []
+            i = 0
+            while arr[i] != -1:
+                confidences.append(float(arr[i]))
+                i += 1
+            return confidences
+        finally:
+            self._lib.TessDeleteIntArray(arr)
+
+    def close(self):
+        with self._lock:
+            for handle in self._handles.values():
+                self._lib.TessBaseAPIEnd(handle)
+                self._lib.TessBaseAPIDelete(handle)
+            self._handles.clear()
+
+
+def create_backend(kind='auto', tesseract_path=None, tessdata_path=None, lang=DEFAULT_LANG):
+    """Factory: return an OCR backend for `kind` ('auto' / 'capi' / 'subprocess')."""
+    kind = (kind or 'auto').lower()
+
+    if kind in ('auto', 'capi'):
+        try:
+            return TessAPIBackend(tesseract_path=tesseract_path, tessdata_path=tessdata_path, lang=lang)
+        except Exception as e:
+            if kind == 'capi':
+                raise
+            print(f"进程内 tesseract 不可用，回退到子进程模式: {e}")
+
+    return SubprocessBackend(tesseract_path)
@@ -0,0 +1,145 @@
+#  Author: micr0softDrestlife
+"""OCR result cache.
+
+同一道题经常被重复截图（重复点击、窗口重新获得焦点等），OCRCache 用截图的下采样
+哈希加上预处理/tesseract 设置作为键，缓存识别结果，命中时跳过预处理和 tesseract。
+
+内存中是一个按条目数和文本字节数双重限制的 LRU；可选地把结果写入 SQLite 文件，
+重启后仍然可用。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class OCRCache:
+    def __init__(self, max_entries=256, max_bytes=4 * 1024 * 1024, db_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.db_path = db_path or None
+
+        self._entries = OrderedDict()  # key -> text
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            folder = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(folder, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+        except Exception as e:
+            print(f"OCR缓存数据库不可用: {e}")
+            self._db = None
+
+    @staticmethod
+    def _size(text):
+        return len(text.encode('utf-8'))
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+            text = self._db_get(key)
+            if text is not None:
+                self._insert(key, text)
+                self.hits += 1
+                return text
+
+            self.misses += 1
+            return None
+
+    def put(self, key, text):
+        if text is None:
+            return
+        with self._lock:
+            self._insert(key, text)
+            self._db_put(key, text)
+
+    def _insert(self, key, text):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= self._size(old)
+        size = self._size(text)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = text
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._size(evicted)
+
+    def _db_get(self, key):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute("SELECT text FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE ocr_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+        except Exception as e:
+            print(f"读取OCR缓存失败: {e}")
+            return None
+
+    def _db_put(self, key, text):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, text, last_used) VALUES (?, ?, ?)",
+                (key, text, time.time())
+            )
+            # 磁盘上同样只保留最近使用的 max_entries 条
+            self._db.execute(
+                "DELETE FROM ocr_cache WHERE key NOT IN "
+                "(SELECT key FROM ocr_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+        except Exception as e:
+            print(f"写入OCR缓存失败: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM ocr_cache")
+                    self._db.commit()
+                except Exception:
+                    pass
+
+    def stats(self):
+        """命中/未命中等计数，供界面显示"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def stats_text(self):
+        s = self.stats()
+        return f"OCR缓存 命中{s['hits']} 未命中{s['misses']}"
@@ -1,99 +1,475 @@
 #  Author: micr0softDrestlife
-import pytesseract
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from concurrent.futures.process import BrokenProcessPool
+
 from PIL import Image
-import cv2
 import numpy as np
 
+from core.ocr_backend import create_backend, DEFAULT_LANG, OEM_LSTM_ONLY, PSM_SINGLE_BLOCK
+from core.ocr_cache import OCRCache
+from core.frame_hash import frame_digest
+from core.preprocess import PreprocessPipeline, DEFAULT_VARIANTS
+from core.ocr_pool import get_ocr_pool, recognize_variant
+from core.layout import layout_blocks, group_blocks, text_bands
+from core.lang_route import LanguageRouter
+
+
+def as_uint8_array(image):
+    """把 PIL Image / NumPy 数组统一成 uint8 数组。
+
+    已经是 uint8 的 NumPy 数组原样返回（不复制）；PIL 图像只转换一次。
+    """
+    if isinstance(image, Image.Image):
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            image = image.convert('RGB')
+        return np.asarray(image)
+    arr = np.asarray(image)
+    if arr.dtype != np.uint8:
+        arr = arr.astype(np.uint8)
+    return arr
+
 
 class OCREngine:
-    def __init__(self, tesseract_path=None):
-        if tesseract_path:
-            pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    def __init__(self, tesseract_path=None, config=None, backend=None):
+        """backend 可以直接传入一个 backend 实例；否则按 config.OCR_BACKEND 在构造时选择。"""
+        self.lang = getattr(config, 'OCR_LANG', DEFAULT_LANG)
+        if backend is None:
+            backend = create_backend(
+                getattr(config, 'OCR_BACKEND', 'auto'),
+                tesseract_path=tesseract_path,
+                tessdata_path=getattr(config, 'TESSDATA_PATH', None),
+                lang=self.lang
+            )
+        self.backend = backend
+
+        # OCR结果缓存（按截图的下采样哈希 + 识别设置做键）
+        self.cache = None
+        if getattr(config, 'OCR_CACHE_ENABLED', False):
+            self.cache = OCRCache(
+                max_entries=getattr(config, 'OCR_CACHE_MAX_ENTRIES', 256),
+                max_bytes=getattr(config, 'OCR_CACHE_MAX_BYTES', 4 * 1024 * 1024),
+                db_path=getattr(config, 'OCR_CACHE_PATH', None)
+            )
+
+        # 预处理流水线（预设或自定义步骤），各步骤的对象只创建一次
+        self.pipeline = PreprocessPipeline.from_config(config)
+
+        # 多预处理方案并行识别，取词置信度最高的结果
+        self.multi_variant = bool(getattr(config, 'OCR_MULTI_VARIANT', False))
+        self.variants = list(getattr(config, 'OCR_VARIANTS', None) or DEFAULT_VARIANTS)
+        self.confidence_threshold = float(getattr(config, 'OCR_CONFIDENCE_THRESHOLD', 85.0))
+        self._variant_pipelines = {name: PreprocessPipeline.from_profile(name) for name in self.variants}
+        self._use_pool = int(getattr(config, 'OCR_WORKERS', 0)) != 1
+
+        # 大区域先做版面分析，按文字块并行识别
+        self.layout_enabled = bool(getattr(config, 'OCR_LAYOUT_ENABLED', False))
+        self.layout_min_pixels = int(getattr(config, 'OCR_LAYOUT_MIN_PIXELS', 1200 * 600))
+        # 增量识别：按文字带哈希，只识别新出现或变化了的文字带（band_cache 为 文字带哈希 -> 文本）
+        self.band_cache = None
+        if getattr(config, 'OCR_INCREMENTAL', False):
+            self.band_cache = OCRCache(
+                max_entries=getattr(config, 'OCR_BAND_CACHE_ENTRIES', 1024),
+                max_bytes=getattr(config, 'OCR_CACHE_MAX_BYTES', 4 * 1024 * 1024)
+            )
+        # 按选区判断主要文字，只加载需要的语言模型（OCR_LANG 只有一种语言时不启用）
+        self.router = None
+        if getattr(config, 'OCR_LANG_ROUTING', False) and '+' in self.lang:
+            self.router = LanguageRouter(
+                self.lang, recheck_confidence=getattr(config, 'OCR_LANG_RECHECK_CONFIDENCE', 60.0),
+                fallback_frames=getattr(config, 'OCR_LANG_FALLBACK_FRAMES', 20)
+            )
+        self._config = config
+        self._tesseract_path = tesseract_path
+        # 多区域识别时每个区域一个线程（预处理、查缓存，并等待进程池的识别结果）
+        self._region_executor = None
+        self._region_lock = threading.Lock()
+
+    def warm_up(self):
+        """提前加载模型：多方案识别/版面分析使用进程池时启动工作进程；
+        进程内的 backend 也先识别一张空白小图，让第一次 Solve 不必付出加载 traineddata 的开销"""
+        try:
+            self.backend.recognize(np.full((32, 32), 255, np.uint8), lang=self.lang)
+        except Exception as e:
+            print(f"OCR预热失败: {e}")
+        if not ((self.multi_variant or self.layout_enabled) and self._use_pool):
+            return
+        try:
+            get_ocr_pool(self._config, self._tesseract_path).warm_up()
+        except Exception as e:
+            print(f"OCR进程池启动失败: {e}")
 
     def preprocess_image(self, image):
         """图像预处理提高OCR准确率
 
         Expects image as a NumPy array in RGB order (H, W, C) or a single-channel grayscale.
+        Runs the configured PreprocessPipeline (see core/preprocess.py) and returns a
+        single-channel uint8 image; per-stage timings are in self.pipeline.last_timings.
         """
-        # Ensure numpy array
-        img = np.asarray(image)
-
-        # If color image in RGB, convert to gray
-        if img.ndim == 3 and img.shape[2] == 3:
-            # If image came from OpenCV it may be BGR; however we try to detect common cases.
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img
-        # 如果分辨率较小，适当放大以提高识别率（针对长中文，放大有助于LSTM模型）
-        h, w = gray.shape[:2]
-        target_w = 1200
-        if w < target_w:
-            scale = target_w / float(w)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
-            gray = cv2.resize(gray, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-
-        # 降噪（保留边缘）
-        denoised = cv2.bilateralFilter(gray, 9, 75, 75)
-
-        # 对比度受限自适应直方图均衡（CLAHE）提高局部对比度
-        try:
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            denoised = clahe.apply(denoised)
-        except Exception:
-            pass
-
-        # 自适应阈值（对非均匀照明更稳健）
-        try:
-            binary = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 15, 9
-            )
-        except Exception:
-            _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return self.pipeline.run(as_uint8_array(image))
 
-        # 小的形态学操作去除噪点
-        kernel = np.ones((2, 2), np.uint8)
-        opened = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    def settings_key(self, preprocess=True):
+        """影响识别结果的设置，作为缓存键的一部分"""
+        if not preprocess:
+            pre = 'raw'
+        elif self.multi_variant:
+            pre = f"best({','.join(self.variants)})@{self.confidence_threshold:g}"
+        else:
+            pre = self.pipeline.signature()
+        if preprocess and not self.multi_variant:
+            if self.band_cache is not None:
+                pre += "|bands"
+            elif self.layout_enabled:
+                pre += f"|layout{self.layout_min_pixels}"
+        lang = f"{self.lang}>route" if self.router is not None else self.lang
+        return f"{lang}|oem{OEM_LSTM_ONLY}|psm{PSM_SINGLE_BLOCK}|{pre}"
 
-        return opened
+    def cache_key(self, image, preprocess=True):
+        return f"{frame_digest(image)}|{self.settings_key(preprocess)}"
 
-    def extract_text(self, image_array, preprocess=True):
+    def extract_text(self, image_array, preprocess=True, trace=None, raise_errors=False, region=None, in_pool=False,
+                     meta=None):
         """从图像中提取文字
 
-        Accepts a NumPy image (RGB) or a PIL Image. Returns stripped text.
+        Accepts a NumPy image (RGB or grayscale) or a PIL Image. The same buffer is handed
+        from capture through preprocessing to the OCR backend without extra copies or temp
+        files. Returns stripped text. When a core.metrics.SolveTrace is given, the
+        'preprocess' and 'ocr' spans are recorded on it. Errors are printed and give ""
+        unless raise_errors is set (batch mode must not mistake a failure for an empty image).
+        region 为截图选区（可哈希），语言路由按选区记住判断结果；为 None 时每次都判断。
+        in_pool 为 True 时识别交给 OCR 进程池（多个区域同时识别时使用，见 extract_regions）。
+        这一次识别实际使用的语言（ocr_lang）、多方案识别选中的方案（ocr_variant）和增量识别的
+        文字带数（ocr_bands）写入 meta（传入的字典）和 trace.meta；引擎本身不保存每次调用的结果，
+        多个线程同时识别时互不干扰。
         """
+        span = trace.span if trace is not None else (lambda name: nullcontext())
+        meta = {} if meta is None else meta
         try:
-            # If PIL Image, convert to numpy array
-            if isinstance(image_array, Image.Image):
-                arr = np.array(image_array)
-            else:
-                arr = np.asarray(image_array)
-
-            # If image is in BGR (common from cv2), convert to RGB before PIL
-            if arr.ndim == 3 and arr.shape[2] == 3:
-                # Heuristic: many cv2 images are uint8; assume RGB order is desired by PIL. If colors look inverted, swap.
-                # Convert array to uint8 explicitly
-                arr = arr.astype('uint8')
-                pil_image = Image.fromarray(arr)
+            arr = as_uint8_array(image_array)
+
+            key = None
+            if self.cache is not None:
+                with span('ocr_cache'):
+                    key = self.cache_key(arr, preprocess)
+                    cached = self.cache.get(key)
+                if trace is not None:
+                    trace.meta['ocr_cache'] = 'hit' if cached is not None else 'miss'
+                if cached is not None:
+                    return cached
+
+            if preprocess and self.multi_variant:
+                # 多方案识别时预处理在工作进程中完成，整体计入 ocr
+                with span('ocr'):
+                    text = self._routed(
+                        arr, region, trace, meta,
+                        lambda image, lang, with_confidences: self._run_best(image, lang, meta)
+                    )
+            elif self.band_cache is not None:
+                # 增量识别：预处理在各文字带上分别进行，只处理需要重新识别的文字带
+                text = self._routed(
+                    arr, region, trace, meta,
+                    lambda image, lang, with_confidences: self._recognize_bands(
+                        image, preprocess, lang, with_confidences, trace, in_pool, meta)
+                )
             else:
-                pil_image = Image.fromarray(arr)
+                if preprocess:
+                    with span('preprocess'):
+                        arr = self.preprocess_image(arr)
+                    if trace is not None:
+                        trace.meta['preprocess_ms'] = {
+                            name: round(seconds * 1000.0, 1) for name, seconds in self.pipeline.last_timings.items()
+                        }
 
-            # Optionally preprocess via OpenCV (PIL -> numpy)
-            if preprocess:
-                proc = np.array(pil_image)
-                proc = self.preprocess_image(proc)
-                pil_image = Image.fromarray(proc)
-
-            # OCR识别，针对长中文文本使用合适的psm/oem
-            tesseract_config = '--oem 1 --psm 6'
-            text = pytesseract.image_to_string(
-                pil_image,
-                lang='chi_sim+eng',
-                config=tesseract_config
-            )
+                with span('ocr'):
+                    text = self._routed(
+                        arr, region, trace, meta,
+                        lambda image, lang, with_confidences: self._recognize(
+                            image, preprocess, lang, with_confidences, in_pool)
+                    )
 
-            return text.strip()
+            if trace is not None:
+                trace.meta.update(meta)
+            # 只缓存识别出文字的结果，空结果可能只是截到了过渡画面
+            if key is not None and text:
+                self.cache.put(key, text)
+
+            return text
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"OCR识别错误: {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+    def extract_regions(self, images, trace=None, raise_errors=False, regions=None):
+        """同时识别多个区域，返回 {名称: 文本}（顺序与 images 相同）。
+
+        images 为 {名称: 图像}（通常是 ScreenshotManager.capture_regions 返回的视图），
+        regions 为 {名称: 区域坐标}，语言路由按区域分别记住判断结果。每个区域在自己的线程中
+        查缓存和预处理，识别在 OCR 进程池中并行（进程池不可用时由进程内 backend 依次识别）。
+        多个区域时整体耗时计入 trace 的 'ocr' 阶段，各区域的识别信息（见 extract_text 的 meta）
+        记在 trace.meta['ocr_by_region'][名称] 中。
+        """
+        regions = regions or {}
+        names = list(images)
+        if len(names) <= 1:
+            return OrderedDict(
+                (name, self.extract_text(images[name], trace=trace, raise_errors=raise_errors,
+                                         region=regions.get(name)))
+                for name in names
+            )
+
+        with self._region_lock:
+            if self._region_executor is None:
+                self._region_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ocr-region')
+        span = trace.span if trace is not None else (lambda name: nullcontext())
+        metas = OrderedDict((name, {}) for name in names)
+        with span('ocr'):
+            futures = [
+                self._region_executor.submit(
+                    self.extract_text, images[name], True, None, raise_errors, regions.get(name), True, metas[name]
+                )
+                for name in names
+            ]
+            results = OrderedDict((name, future.result()) for name, future in zip(names, futures))
+        if trace is not None:
+            trace.meta['ocr_regions'] = len(names)
+            trace.meta['ocr_by_region'] = dict(metas)
+        return results
+
+    def _routed(self, arr, region, trace, meta, run):
+        """选出语言后调用 run(arr, lang, with_confidences) -> (文本, 词置信度列表)，返回文本。
+        实际使用的语言记在 meta['ocr_lang']。
+
+        用缩小后的语言识别出的置信度过低时：记住的语言重新判断一次，语言变了就重新识别；
+        刚判断出的语言（或重新判断后仍是同一语言）不可靠，改用完整的语言组合重新识别并记住。
+        没有选区信息（批量、HTTP 服务）时判断结果无法复用，直接使用完整的语言组合。
+        """
+        if self.router is None or region is None:
+            meta['ocr_lang'] = self.lang
+            return run(arr, self.lang, False)[0]
+
+        lang = self.router.remembered(region)
+        remembered = lang is not None
+        if not remembered:
+            lang = self._detect_lang(arr, region, trace)
+        # 用缩小过的语言识别时都需要置信度来确认（样本条可能不代表整个选区）
+        check = lang != self.lang
+        text, confidences = run(arr, lang, check)
+        if check and self.router.needs_recheck(confidences):
+            self.router.forget(region)
+            detected = self._detect_lang(arr, region, trace) if remembered else lang
+            if detected == lang:
+                detected = self.lang
+                self.router.remember(region, detected)
+            if detected != lang:
+                lang = detected
+                text, _ = run(arr, lang, False)
+
+        meta['ocr_lang'] = lang
+        return text
+
+    def _detect_lang(self, arr, region, trace):
+        span = trace.span if trace is not None else (lambda name: nullcontext())
+        with span('lang_detect'):
+            lang = self.router.detect(self.backend, arr, PSM_SINGLE_BLOCK, OEM_LSTM_ONLY)
+        self.router.remember(region, lang)
+        return lang or self.lang
+
+    def _recognize(self, arr, preprocess, lang=None, with_confidences=False, in_pool=False):
+        """返回 (文本, 词置信度列表)；with_confidences 为 False 时置信度列表为空"""
+        lang = lang or self.lang
+        if preprocess and self.layout_enabled and arr.shape[0] * arr.shape[1] >= self.layout_min_pixels:
+            return self._recognize_blocks(arr, lang, with_confidences)
+        if in_pool and self._use_pool:
+            try:
+                pool = get_ocr_pool(self._config, self._tesseract_path)
+                result = pool.submit_batch(
+                    [arr], lang, PSM_SINGLE_BLOCK, OEM_LSTM_ONLY, with_confidences=with_confidences
+                ).result()[0]
+                return result if with_confidences else (result, [])
+            except BrokenProcessPool as e:
+                print(f"OCR进程池不可用，改为单进程识别: {e}")
+                self._use_pool = False
+        # OCR识别，针对长中文文本使用合适的psm/oem
+        if with_confidences:
+            text, confidences = self.backend.recognize_data(arr, lang=lang, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY)
+            return text.strip(), confidences
+        return self.backend.recognize(
+            arr,
+            lang=lang,
+            psm=PSM_SINGLE_BLOCK,
+            oem=OEM_LSTM_ONLY
+        ).strip(), []
+
+    def _recognize_bands(self, arr, preprocess, lang, with_confidences=False, trace=None, in_pool=False, meta=None):
+        """增量识别：按行间空白切成文字带并逐条哈希，命中 band_cache 的直接使用，
+        其余预处理后一起识别，按从上到下的顺序拼接。返回 (文本, 新识别的文字带的词置信度列表)。
+        文字带数与实际识别的文字带数记在 meta['ocr_bands']。
+
+        只有一条文字带需要识别时在当前进程中识别（in_pool 时仍交给进程池，见 extract_regions）。
+        """
+        span = trace.span if trace is not None else (lambda name: nullcontext())
+        with span('ocr_bands'):
+            # 找不到行间空白时整个区域作为一条文字带
+            bands = text_bands(arr) or [(0, arr.shape[0])]
+            settings = f"{self.settings_key(preprocess)}|{lang}"
+            keys = [f"{frame_digest(arr[y0:y1], width=arr.shape[1])}|{settings}" for y0, y1 in bands]
+            texts = [self.band_cache.get(key) for key in keys]
+        missing = [i for i, text in enumerate(texts) if text is None]
+
+        confidences = []
+        if missing:
+            images = [arr[bands[i][0]:bands[i][1]] for i in missing]
+            if preprocess:
+                with span('preprocess'):
+                    images = [self.preprocess_image(image) for image in images]
+            with span('ocr'):
+                # 连续的文字带分成与工作进程数相同的几组，每组交给一个进程
+                groups = self._group_images(images)
+                results = self._recognize_groups(groups, lang, with_confidences,
+                                                 use_pool=in_pool or len(images) > 1)
+            for i, text in zip(missing, results):
+                if with_confidences:
+                    text, band_confidences = text
+                    confidences.extend(band_confidences)
+                texts[i] = text
+                # 空结果也缓存：分隔线、图标等没有文字的文字带不必每次重新识别
+                self.band_cache.put(keys[i], text)
+
+        if meta is not None:
+            meta['ocr_bands'] = {'total': len(bands), 'recognized': len(missing)}
+        return '\n'.join(text for text in texts if text), confidences
+
+    def _group_images(self, images):
+        """按面积把图像列表切成最多 工作进程数 组（保持顺序）"""
+        workers = 1
+        if self._use_pool and len(images) > 1:
+            workers = get_ocr_pool(self._config, self._tesseract_path).workers
+        boxes = [(0, i, image.shape[1], image.shape[0]) for i, image in enumerate(images)]
+        return [[images[box[1]] for box in group] for group in group_blocks(boxes, workers)]
+
+    def _recognize_groups(self, groups, lang, with_confidences=False, use_pool=True):
+        """识别分好组的已预处理图像：use_pool 时每组交给一个工作进程，进程池不可用时在当前进程中逐个识别。
+
+        按顺序返回文本列表；with_confidences 为 True 时为 (文本, 词置信度列表) 的列表。
+        """
+        results = None
+        if use_pool and self._use_pool:
+            try:
+                pool = get_ocr_pool(self._config, self._tesseract_path)
+                futures = [
+                    pool.submit_batch(group, lang, PSM_SINGLE_BLOCK, OEM_LSTM_ONLY, with_confidences=with_confidences)
+                    for group in groups
+                ]
+                results = [item for future in futures for item in future.result()]
+            except BrokenProcessPool as e:
+                print(f"OCR进程池不可用，改为单进程识别: {e}")
+                self._use_pool = False
+        if results is None:
+            if with_confidences:
+                results = [
+                    self.backend.recognize_data(image, lang=lang, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY)
+                    for group in groups for image in group
+                ]
+            else:
+                results = [
+                    self.backend.recognize(image, lang=lang, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY)
+                    for group in groups for image in group
+                ]
+        if with_confidences:
+            return [(text.strip(), confidences) for text, confidences in results]
+        return [text.strip() for text in results]
+
+    def _run_best(self, image, lang, meta):
+        text, variant = self._best_variant(image, lang)
+        meta['ocr_variant'] = variant['variant']
+        return text, ([variant['confidence']] if text else [])
+
+    def extract_text_best(self, image, lang=None):
+        """用 self.variants 中的每种预处理方案识别，返回平均词置信度最高的文本（见 _best_variant）"""
+        return self._best_variant(image, lang)[0]
+
+    def _best_variant(self, image, lang=None):
+        """用 self.variants 中的每种预处理方案识别，返回 (平均词置信度最高的文本,
+        {'variant': 选中的方案, 'confidence': 其置信度, 'scores': 各方案的置信度})。
+
+        各方案在进程池中并行执行；任何一个方案完成且置信度达到
+        confidence_threshold 时直接采用，不再等待其余方案（尚未开始的会被取消）。
+        进程池不可用（或 OCR_WORKERS 为 1）时在当前进程中依次执行，同样提前退出。
+        """
+        lang = lang or self.lang
+        results = None
+        if self._use_pool:
+            try:
+                results = self._variants_in_pool(image, lang)
+            except BrokenProcessPool as e:
+                print(f"OCR进程池不可用，改为单进程识别: {e}")
+                self._use_pool = False
+        if results is None:
+            results = self._variants_inline(image, lang)
+
+        best_name, best_text, best_conf = None, '', -1.0
+        for name, (text, conf) in results.items():
+            if text and conf > best_conf:
+                best_name, best_text, best_conf = name, text, conf
+        return best_text, {
+            'variant': best_name,
+            'confidence': best_conf if best_name else 0.0,
+            'scores': {name: conf for name, (_, conf) in results.items()},
+        }
+
+    def extract_text_blocks(self, image, lang=None):
+        """版面分析后逐块识别（image 应为已预处理的图像），按阅读顺序用换行拼接。
+
+        文字块按阅读顺序分成与工作进程数相同的几组，每组在一个进程中识别；
+        块数不够时最高的块会在行间被切开。进程池不可用时在当前进程中逐块识别。
+        """
+        return self._recognize_blocks(image, lang or self.lang)[0]
+
+    def _recognize_blocks(self, image, lang, with_confidences=False):
+        workers = 1
+        if self._use_pool:
+            workers = get_ocr_pool(self._config, self._tesseract_path).workers
+
+        boxes = layout_blocks(image, target_blocks=workers)
+        if not boxes:
+            return '', []
+        # 裁剪只是视图，提交给进程池时才会被序列化
+        crops = [[image[y:y + h, x:x + w] for x, y, w, h in group] for group in group_blocks(boxes, workers)]
+
+        results = self._recognize_groups(crops, lang, with_confidences)
+        if not with_confidences:
+            return '\n'.join(text for text in results if text), []
+        text = '\n'.join(text for text, _ in results if text)
+        return text, [conf for _, confidences in results for conf in confidences]
+
+    def _variants_in_pool(self, image, lang):
+        pool = get_ocr_pool(self._config, self._tesseract_path)
+        futures = [
+            pool.submit_variant(name, image, lang, PSM_SINGLE_BLOCK, OEM_LSTM_ONLY)
+            for name in self.variants
+        ]
+        results = {}
+        try:
+            for future in as_completed(futures):
+                name, text, conf, _ = future.result()
+                results[name] = (text, conf)
+                if text and conf >= self.confidence_threshold:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+        return results
+
+    def _variants_inline(self, image, lang):
+        results = {}
+        for name in self.variants:
+            text, conf, _ = recognize_variant(
+                self.backend, self._variant_pipelines[name], image, lang, PSM_SINGLE_BLOCK, OEM_LSTM_ONLY
+            )
+            results[name] = (text, conf)
+            if text and conf >= self.confidence_threshold:
+                break
+        return results
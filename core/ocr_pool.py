@@ -0,0 +1,171 @@
+#  Author: micr0softDrestlife
+"""Process pool for CPU-bound OCR work.
+
+预处理和 tesseract 识别都是 CPU 密集型操作，受 GIL 限制无法靠线程并行。OCRWorkerPool
+用 spawn 方式启动若干工作进程，每个进程在初始化时创建一次自己的 OCR backend
+（TessAPI 句柄只加载一次模型），之后的任务只需传入图像数组。
+
+多方案识别（OCR_MULTI_VARIANT）把同一张截图的几种预处理方案分发给不同进程，
+用每个词的置信度给结果打分；大区域的版面分析（core/layout.py）则把切出的文字块
+分组后分给各进程同时识别。
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core.ocr_backend import create_backend, DEFAULT_LANG, OEM_LSTM_ONLY, PSM_SINGLE_BLOCK
+from core.preprocess import PreprocessPipeline
+
+# 工作进程内的状态（由 _init_worker 设置；_worker_engine 在第一次 _engine_task 时创建）
+_worker_backend = None
+_worker_pipelines = {}
+_worker_engine = None
+
+
+def _init_worker(kind, tesseract_path, tessdata_path, lang):
+    global _worker_backend
+    _worker_backend = create_backend(kind, tesseract_path=tesseract_path, tessdata_path=tessdata_path, lang=lang)
+
+
+def _noop():
+    return os.getpid()
+
+
+def mean_confidence(confidences) -> float:
+    """词置信度的平均值（0-100）；没有识别出任何词时为 0"""
+    if not confidences:
+        return 0.0
+    return sum(confidences) / len(confidences)
+
+
+def recognize_variant(backend, pipeline, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+    """对 image 执行一种预处理方案并识别，返回 (文本, 平均置信度, 耗时秒)"""
+    started = time.perf_counter()
+    text, confidences = backend.recognize_data(pipeline.run(image), lang=lang, psm=psm, oem=oem)
+    return text.strip(), mean_confidence(confidences), time.perf_counter() - started
+
+
+def _variant_task(profile, image, lang, psm, oem):
+    pipeline = _worker_pipelines.get(profile)
+    if pipeline is None:
+        pipeline = _worker_pipelines[profile] = PreprocessPipeline.from_profile(profile)
+    return (profile,) + recognize_variant(_worker_backend, pipeline, image, lang, psm, oem)
+
+
+def _recognize_batch_task(images, lang, psm, oem, with_confidences=False):
+    if with_confidences:
+        results = [_worker_backend.recognize_data(image, lang=lang, psm=psm, oem=oem) for image in images]
+        return [(text.strip(), confidences) for text, confidences in results]
+    return [_worker_backend.recognize(image, lang=lang, psm=psm, oem=oem).strip() for image in images]
+
+
+def load_image(source):
+    """把图片文件路径或编码后的图片字节（PNG/JPEG 等）读取为 RGB（或灰度）uint8 数组"""
+    import io
+    import numpy as np
+    from PIL import Image
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        return np.asarray(image)
+
+
+def _engine_task(config, image):
+    """在工作进程中用完整的 OCREngine 识别。
+
+    image 可以是数组、图片路径或编码后的图片字节；后两者在工作进程中解码，
+    进程间只传输路径或压缩后的字节。
+    """
+    global _worker_engine
+    # 延迟导入：ocr_engine 本身依赖本模块
+    from core.metrics import SolveTrace
+    from core.ocr_engine import OCREngine
+
+    if _worker_engine is None:
+        _worker_engine = OCREngine(config=config, backend=_worker_backend)
+    trace = SolveTrace(trigger='worker')
+    if isinstance(image, (str, bytes, bytearray)):
+        with trace.span('load'):
+            image = load_image(image)
+    text = _worker_engine.extract_text(image, trace=trace, raise_errors=True)
+    return text, dict(trace.spans)
+
+
+def worker_config(config):
+    """工作进程内的 OCREngine 不再嵌套进程池，也不共用 SQLite 缓存文件"""
+    import dataclasses
+
+    return dataclasses.replace(config, OCR_WORKERS=1, OCR_CACHE_PATH='')
+
+
+class OCRWorkerPool:
+    def __init__(self, workers=0, backend_kind='auto', tesseract_path=None, tessdata_path=None, lang=DEFAULT_LANG):
+        """workers 为 0 时使用 CPU 核数"""
+        self.workers = int(workers) or os.cpu_count() or 1
+        # 统一使用 spawn：GUI 进程里有 Tk 和事件循环线程，fork 不安全；Windows 上本来也只能 spawn
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(backend_kind, tesseract_path, tessdata_path, lang)
+        )
+
+    def submit(self, fn, *args):
+        """fn 必须是模块级函数（需要能被 pickle）；工作进程中可通过 _worker_backend 使用 backend"""
+        return self._executor.submit(fn, *args)
+
+    def submit_variant(self, profile, image, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY):
+        """返回的 Future 结果为 (预设名, 文本, 平均置信度, 耗时秒)"""
+        return self._executor.submit(_variant_task, profile, image, lang, psm, oem)
+
+    def submit_batch(self, images, lang=DEFAULT_LANG, psm=PSM_SINGLE_BLOCK, oem=OEM_LSTM_ONLY,
+                     with_confidences=False):
+        """在同一个工作进程中依次识别 images（已预处理），Future 结果为文本列表；
+        with_confidences 为 True 时为 (文本, 词置信度列表) 的列表"""
+        return self._executor.submit(_recognize_batch_task, list(images), lang, psm, oem, with_confidences)
+
+    def submit_engine(self, config, image):
+        """用工作进程里的 OCREngine（按 worker_config(config) 创建）识别，Future 结果为 (文本, 各阶段耗时秒)"""
+        return self._executor.submit(_engine_task, config, image)
+
+    def warm_up(self):
+        """提前启动所有工作进程（并加载 OCR 模型），避免第一次识别时等待"""
+        futures = [self._executor.submit(_noop) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_ocr_pool(config=None, tesseract_path=None) -> OCRWorkerPool:
+    """返回进程内共享的 OCR 进程池（首次调用时按 config 创建）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = OCRWorkerPool(
+                workers=getattr(config, 'OCR_WORKERS', 0),
+                backend_kind=getattr(config, 'OCR_BACKEND', 'auto'),
+                tesseract_path=tesseract_path or getattr(config, 'TESSERACT_PATH', None),
+                tessdata_path=getattr(config, 'TESSDATA_PATH', None),
+                lang=getattr(config, 'OCR_LANG', DEFAULT_LANG)
+            )
+        return _shared
+
+
+def shutdown_ocr_pool():
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.shutdown()
+            _shared = None
@@ -0,0 +1,276 @@
+#  Author: micr0softDrestlife
+"""Configurable OCR preprocessing pipeline.
+
+预处理由一串命名的步骤组成，可以直接使用预设（PROFILES），也可以在 AppConfig 中
+逐项列出步骤及参数：
+
+    OCR_PREPROCESS_PROFILE = 'fast'
+    OCR_PREPROCESS_STAGES = ['grayscale', ('upscale', {'target_width': 1600}), 'otsu']
+
+每个步骤每次调用的耗时都会被记录（PreprocessPipeline.last_timings / stats()）。
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class Stage:
+    """预处理步骤。inplace 为 True 的步骤会直接改写输入缓冲区。"""
+
+    name = 'stage'
+    inplace = False
+
+    def __init__(self, **params):
+        self.params = params
+
+    def __call__(self, img):
+        raise NotImplementedError()
+
+    def signature(self):
+        if not self.params:
+            return self.name
+        args = ','.join(f"{k}={v}" for k, v in sorted(self.params.items()))
+        return f"{self.name}({args})"
+
+
+class Grayscale(Stage):
+    name = 'grayscale'
+
+    def __call__(self, img):
+        if img.ndim == 3 and img.shape[2] == 3:
+            return cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        if img.ndim == 3 and img.shape[2] == 4:
+            return cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+        return img
+
+
+class Upscale(Stage):
+    """分辨率较小时放大到 target_width（针对长中文，放大有助于LSTM模型）"""
+
+    name = 'upscale'
+
+    def __init__(self, target_width=1200, interpolation='cubic'):
+        super().__init__(target_width=target_width, interpolation=interpolation)
+        self.target_width = int(target_width)
+        self.interpolation = cv2.INTER_LINEAR if interpolation == 'linear' else cv2.INTER_CUBIC
+
+    def __call__(self, img):
+        h, w = img.shape[:2]
+        if w >= self.target_width:
+            return img
+        scale = self.target_width / float(w)
+        return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=self.interpolation)
+
+
+class Bilateral(Stage):
+    """保边降噪。大区域上开销很大，'fast' 预设中不使用"""
+
+    name = 'bilateral'
+
+    def __init__(self, d=9, sigma_color=75, sigma_space=75):
+        super().__init__(d=d, sigma_color=sigma_color, sigma_space=sigma_space)
+        self.d, self.sigma_color, self.sigma_space = int(d), sigma_color, sigma_space
+
+    def __call__(self, img):
+        return cv2.bilateralFilter(img, self.d, self.sigma_color, self.sigma_space)
+
+
+class Median(Stage):
+    name = 'median'
+
+    def __init__(self, ksize=3):
+        super().__init__(ksize=ksize)
+        self.ksize = int(ksize)
+
+    def __call__(self, img):
+        return cv2.medianBlur(img, self.ksize)
+
+
+class Clahe(Stage):
+    """对比度受限自适应直方图均衡（CLAHE）提高局部对比度"""
+
+    name = 'clahe'
+    inplace = True
+
+    def __init__(self, clip_limit=2.0, tile_grid=8):
+        super().__init__(clip_limit=clip_limit, tile_grid=tile_grid)
+        self.clip_limit, self.tile_grid = clip_limit, int(tile_grid)
+        # cv2.CLAHE 对象带有内部缓冲区，不能被多个线程同时使用（多区域/推测识别会并行预处理），每个线程各建一个
+        self._local = threading.local()
+
+    def __call__(self, img):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = self._local.clahe = cv2.createCLAHE(
+                clipLimit=self.clip_limit, tileGridSize=(self.tile_grid, self.tile_grid))
+        clahe.apply(img, img)
+        return img
+
+
+class AdaptiveThreshold(Stage):
+    """自适应阈值（对非均匀照明更稳健）"""
+
+    name = 'adaptive_threshold'
+    inplace = True
+
+    def __init__(self, block_size=15, c=9):
+        super().__init__(block_size=block_size, c=c)
+        self.block_size, self.c = int(block_size), c
+
+    def __call__(self, img):
+        cv2.adaptiveThreshold(
+            img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, self.block_size, self.c, dst=img
+        )
+        return img
+
+
+class Otsu(Stage):
+    """全局 Otsu 阈值，比自适应阈值便宜得多"""
+
+    name = 'otsu'
+    inplace = True
+
+    def __call__(self, img):
+        cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=img)
+        return img
+
+
+class Invert(Stage):
+    """反色（深色主题下的浅色文字）"""
+
+    name = 'invert'
+    inplace = True
+
+    def __call__(self, img):
+        cv2.bitwise_not(img, dst=img)
+        return img
+
+
+class MorphOpen(Stage):
+    """小的形态学开运算去除噪点"""
+
+    name = 'morph_open'
+    inplace = True
+
+    def __init__(self, kernel=2):
+        super().__init__(kernel=kernel)
+        self._kernel = np.ones((int(kernel), int(kernel)), np.uint8)
+
+    def __call__(self, img):
+        cv2.morphologyEx(img, cv2.MORPH_OPEN, self._kernel, dst=img)
+        return img
+
+
+STAGES = {cls.name: cls for cls in (
+    Grayscale, Upscale, Bilateral, Median, Clahe, AdaptiveThreshold, Otsu, Invert, MorphOpen
+)}
+
+PROFILES = {
+    # 与最初固定的预处理流程一致
+    'default': ['grayscale', 'upscale', 'bilateral', 'clahe', 'adaptive_threshold', 'morph_open'],
+    # 去掉双边滤波，使用全局阈值
+    'fast': ['grayscale', ('upscale', {'interpolation': 'linear'}), 'otsu'],
+    # 放大得更多，对小字号更友好
+    'accurate': ['grayscale', ('upscale', {'target_width': 1600}), 'bilateral', 'clahe',
+                 'adaptive_threshold', 'morph_open'],
+    # 不做预处理（只转灰度）
+    'none': ['grayscale'],
+    # 以下几种作为多方案识别（OCR_MULTI_VARIANT）的候选
+    'gray': ['grayscale', 'upscale'],
+    'otsu': ['grayscale', 'upscale', 'otsu'],
+    # 深色主题：反色后再做全局阈值
+    'inverted': ['grayscale', 'upscale', 'invert', 'otsu'],
+}
+
+# 多方案识别默认依次提交的预设（'default' 即自适应阈值）
+DEFAULT_VARIANTS = ['default', 'gray', 'otsu', 'inverted']
+
+
+def build_stage(spec):
+    """spec 为步骤名，或 (步骤名, 参数字典)"""
+    if isinstance(spec, Stage):
+        return spec
+    if isinstance(spec, str):
+        name, params = spec, {}
+    else:
+        name, params = spec[0], dict(spec[1] or {})
+    try:
+        cls = STAGES[name]
+    except KeyError:
+        raise ValueError(f"未知的预处理步骤: {name}（可选: {', '.join(STAGES)}）")
+    return cls(**params)
+
+
+class PreprocessPipeline:
+    def __init__(self, stages):
+        self.stages = [build_stage(spec) for spec in stages]
+        # 同一流水线可能被多个线程同时使用，last_timings 按线程分别记录
+        self._local = threading.local()
+        self._totals = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_profile(cls, profile='default'):
+        try:
+            return cls(PROFILES[profile])
+        except KeyError:
+            raise ValueError(f"未知的预处理预设: {profile}（可选: {', '.join(PROFILES)}）")
+
+    @classmethod
+    def from_config(cls, config):
+        stages = getattr(config, 'OCR_PREPROCESS_STAGES', None)
+        if stages:
+            return cls(stages)
+        return cls.from_profile(getattr(config, 'OCR_PREPROCESS_PROFILE', 'default') or 'default')
+
+    @property
+    def last_timings(self):
+        """当前线程最近一次 run 的各步骤耗时（秒）"""
+        return getattr(self._local, 'timings', {})
+
+    def signature(self):
+        """步骤及参数的字符串表示，作为 OCR 缓存键的一部分"""
+        return '>'.join(stage.signature() for stage in self.stages)
+
+    def run(self, img):
+        """依次执行各步骤并记录每一步的耗时（秒）。
+
+        原地步骤只会改写流水线自己产生的缓冲区；输入图像本身不会被修改。
+        """
+        owned = False
+        timings = {}
+        for stage in self.stages:
+            started = time.perf_counter()
+            if stage.inplace and not owned:
+                img = img.copy()
+                owned = True
+            out = stage(img)
+            if out is not img:
+                owned = True
+            img = out
+            timings[stage.name] = timings.get(stage.name, 0.0) + time.perf_counter() - started
+
+        self._local.timings = timings
+        with self._lock:
+            self._calls += 1
+            for name, elapsed in timings.items():
+                self._totals[name] = self._totals.get(name, 0.0) + elapsed
+        return img
+
+    __call__ = run
+
+    def stats(self):
+        """每个步骤的累计/平均耗时（毫秒）"""
+        with self._lock:
+            calls = max(1, self._calls)
+            return {
+                'calls': self._calls,
+                'stages': {
+                    name: {'total_ms': total * 1000.0, 'mean_ms': total * 1000.0 / calls}
+                    for name, total in self._totals.items()
+                },
+            }
@@ -0,0 +1,228 @@
+#  Author: micr0softDrestlife
+"""Build the prompt sent to the model from raw OCR text.
+
+tesseract 的原始输出里有很多对模型没有用、却要计费和增加延迟的内容：汉字之间被插入的
+空格、连续空白、边框识别出的 '|' '_' 等杂散符号、只有符号的垃圾行，以及考试界面上的
+"上一题 / 下一题 / 剩余时间 05:12" 之类按钮和提示。build_prompt 依次：
+
+    1. 规范化：全角字母数字转半角，去掉汉字之间的空格，合并空白，去掉行首行尾的杂散符号
+    2. 去噪：删除只有符号的行和匹配界面文字（UI_BOILERPLATE + PROMPT_BOILERPLATE）的行
+    3. 识别选择题：找到 A/B/C/D 选项后按 "题干 + 每行一个选项" 的紧凑格式重排
+    4. 按题型（choice / multi / judge / open）决定回答的 max_tokens（Ollama 为 num_predict）
+
+并按提供方估算整理前后的 token 数，节省量写入 Solve 日志（trace.meta）和 prompt.* 计数器。
+"""
+
+import re
+
+from core import metrics
+
+SIMPLIFY_PROMPT = "快速回答下面问题，不需要任何解释"
+# 简化模式下按题型使用更具体的要求，回答越短生成越快
+SIMPLIFY_PROMPTS = {
+    'choice': "只回答正确选项的字母，不需要任何解释",
+    'multi': "只回答所有正确选项的字母，不需要任何解释",
+    'judge': "只回答“对”或“错”，不需要任何解释",
+}
+
+# 各题型回答的 token 上限；PROMPT_MAX_TOKENS / PROMPT_MAX_TOKENS_SIMPLIFY 中的同名项覆盖这里的值
+DEFAULT_MAX_TOKENS = {'choice': 512, 'multi': 512, 'judge': 256, 'open': 1024}
+DEFAULT_MAX_TOKENS_SIMPLIFY = {'choice': 8, 'multi': 16, 'judge': 8, 'open': 256}
+
+# 整行匹配时删除的界面文字（考试/刷题页面常见的按钮、进度和计时）
+UI_BOILERPLATE = (
+    r'(上一题|下一题|上一页|下一页|提交|提交答案|交卷|确定|取消|返回|标记|收藏|答题卡|查看解析|重做|跳过)',
+    r'(剩余|考试|答题)?(时间|用时)[:：]?\s*\d{1,2}[:：]\d{2}([:：]\d{2})?',
+    r'第\s*\d+\s*题\s*[/／]?\s*(共\s*\d+\s*题)?',
+    r'\d+\s*[/／]\s*\d+',
+    r'(prev(ious)?|next|submit|back|skip|finish|mark for review)',
+)
+
+# 与 core/lang_route.py 相同的汉字 / 假名 / 韩文范围（不从那里导入：lang_route 会加载 cv2，界面启动时不应加载）
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+# 汉字及中文标点（两侧的空格是 tesseract 在 chi_sim 下插入的，应当去掉）
+_CJK_PUNCT = '，。、；：？！“”‘’（）《》【】…—'
+_CJK_SPACE_RE = re.compile(
+    r'(?<=[\u3400-\u4dbf\u4e00-\u9fff%s])[ \t\u3000]+(?=[\u3400-\u4dbf\u4e00-\u9fff%s])' % (_CJK_PUNCT, _CJK_PUNCT)
+)
+_SPACES_RE = re.compile(r'[ \t\u3000\u00a0]+')
+_EDGE_JUNK_RE = re.compile(r'^[\s|¦_~`^•·#*=]+|[\s|¦_~`^•·#*=]+$')
+_MEANINGFUL_RE = re.compile(r'[0-9A-Za-z\u3400-\u4dbf\u4e00-\u9fff]')
+# 选项标记：行首或空白之后的 "A." "B、" "(C)" "D：" 等
+_CHOICE_RE = re.compile(r'(?:^|(?<=\s))[(（]?([A-H])\s?[.．、:：)）]\s*', re.M)
+_MULTI_RE = re.compile(r'多选|多项选择|不定项|select all|choose (two|all)', re.I)
+_JUDGE_RE = re.compile(r'判断题|判断正误|是否正确|对还是错|对错|true or false|true/false', re.I)
+
+# 每个提供方的估算系数：(每个汉字的 token 数, 每个其他非空白字符的 token 数)
+## OpenAI 的 cl100k 对汉字几乎一字一 token；千问 / DeepSeek 的词表对中文更紧凑
+TOKEN_RATES = {
+    'openai': (1.0, 0.25),
+    'qianwen': (0.7, 0.25),
+    'deepseek': (0.6, 0.25),
+    'ollama': (0.7, 0.25),
+}
+
+
+def _fullwidth_to_ascii(text):
+    """全角字母、数字和空格转为半角（中文标点保持不变）"""
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if 0xFF10 <= code <= 0xFF19 or 0xFF21 <= code <= 0xFF3A or 0xFF41 <= code <= 0xFF5A:
+            out.append(chr(code - 0xFEE0))
+        elif code == 0x3000:
+            out.append(' ')
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+
+def _compile_boilerplate(extra=None):
+    patterns = list(UI_BOILERPLATE) + list(extra or ())
+    return [re.compile(r'^(?:%s)$' % p, re.I) for p in patterns]
+
+
+_DEFAULT_BOILERPLATE = _compile_boilerplate()
+
+
+def is_junk_line(line):
+    """只有符号，或者字母/数字/汉字不到四分之一的行（边框、图标被识别成的乱码；"1+1=?" 不算）"""
+    meaningful = len(_MEANINGFUL_RE.findall(line))
+    return meaningful == 0 or meaningful * 4 < len(line)
+
+
+def join_region_texts(texts):
+    """多个区域（{名称: 文本}）的识别结果按区域顺序拼成一个问题，区域之间空一行"""
+    return '\n\n'.join(text for text in texts.values() if text)
+
+
+def normalize_ocr_text(text, boilerplate=None):
+    """规范化并去噪，返回整理后的多行文本；boilerplate 为编译好的整行正则列表"""
+    if not text:
+        return ''
+    boilerplate = _DEFAULT_BOILERPLATE if boilerplate is None else boilerplate
+    text = _fullwidth_to_ascii(text.replace('\r\n', '\n').replace('\r', '\n'))
+    lines = []
+    for line in text.split('\n'):
+        line = _SPACES_RE.sub(' ', _CJK_SPACE_RE.sub('', line))
+        line = _EDGE_JUNK_RE.sub('', line)
+        if not line or is_junk_line(line):
+            continue
+        if any(p.match(line) for p in boilerplate):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def detect_choices(text):
+    """找出从 A 开始连续的选项，返回 (题干, [(字母, 选项文字), ...])；不是选择题时返回 None"""
+    markers = []
+    expected = 'A'
+    for m in _CHOICE_RE.finditer(text):
+        letter = m.group(1)
+        if letter == expected:
+            markers.append(m)
+            expected = chr(ord(expected) + 1)
+        elif letter == 'A' and len(markers) < 2:
+            # 题干里出现的 "A." 之类，从新的 A 重新开始
+            markers = [m]
+            expected = 'B'
+    if len(markers) < 2:
+        return None
+    stem = text[:markers[0].start()].strip()
+    choices = []
+    for i, m in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        choices.append((m.group(1), ' '.join(text[m.end():end].split())))
+    if not stem or not all(body for _, body in choices):
+        return None
+    return stem, choices
+
+
+def question_type(stem, choices=None):
+    if choices:
+        return 'multi' if _MULTI_RE.search(stem) else 'choice'
+    if _JUDGE_RE.search(stem):
+        return 'judge'
+    return 'open'
+
+
+def _provider_key(provider):
+    """对冲客户端的 provider 形如 'ollama+deepseek'，按主提供方估算"""
+    return (provider or '').split('+', 1)[0].lower()
+
+
+def count_tokens(text, provider=''):
+    """按提供方估算 token 数（不加载分词器，误差在一两成以内，足够比较整理前后的差别）"""
+    if not text:
+        return 0
+    cjk_rate, other_rate = TOKEN_RATES.get(_provider_key(provider), TOKEN_RATES['openai'])
+    cjk = len(_CJK_RE.findall(text))
+    other = len(re.sub(r'\s+', '', text)) - cjk
+    return max(1, int(round(cjk * cjk_rate + other * other_rate)))
+
+
+class PromptPlan:
+    def __init__(self, raw, prompt, kind='open', choices=None, system_prompt=None, max_tokens=None,
+                 provider=''):
+        self.raw = raw
+        self.prompt = prompt
+        self.question_type = kind
+        self.choices = choices or []
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.tokens_raw = count_tokens(raw, provider)
+        self.tokens_sent = count_tokens(prompt, provider)
+
+    @property
+    def tokens_saved(self):
+        return max(0, self.tokens_raw - self.tokens_sent)
+
+    def record(self, trace=None):
+        """把 token 统计写入计数器和 trace.meta（随 Solve 日志一起输出）"""
+        metrics.counter('prompt.tokens_raw').inc(self.tokens_raw)
+        metrics.counter('prompt.tokens_sent').inc(self.tokens_sent)
+        metrics.counter('prompt.tokens_saved').inc(self.tokens_saved)
+        metrics.counter(f"prompt.type_{self.question_type}").inc()
+        if trace is not None:
+            trace.meta['question_type'] = self.question_type
+            trace.meta['prompt_tokens'] = self.tokens_sent
+            trace.meta['prompt_tokens_saved'] = self.tokens_saved
+            trace.meta['max_tokens'] = self.max_tokens
+        return self
+
+
+def _max_tokens(config, kind, simplify):
+    if simplify:
+        table = dict(DEFAULT_MAX_TOKENS_SIMPLIFY, **(getattr(config, 'PROMPT_MAX_TOKENS_SIMPLIFY', None) or {}))
+    else:
+        table = dict(DEFAULT_MAX_TOKENS, **(getattr(config, 'PROMPT_MAX_TOKENS', None) or {}))
+    return table.get(kind)
+
+
+def build_prompt(text, config=None, provider='', simplify=False, system_prompt=None):
+    """整理 OCR 文本并返回 PromptPlan。
+
+    system_prompt 非空时原样使用；否则简化模式下按题型选择 SIMPLIFY_PROMPTS。
+    PROMPT_COMPACT 关闭时不改动文本，只估算 token 数（max_tokens 仍按题型设置）。
+    """
+    raw = text or ''
+    if getattr(config, 'PROMPT_COMPACT', True):
+        extra = getattr(config, 'PROMPT_BOILERPLATE', None)
+        cleaned = normalize_ocr_text(raw, _compile_boilerplate(extra) if extra else None)
+    else:
+        cleaned = raw.strip()
+
+    parsed = detect_choices(cleaned)
+    if parsed is not None:
+        stem, choices = parsed
+        kind = question_type(stem, choices)
+        if getattr(config, 'PROMPT_COMPACT', True):
+            cleaned = '\n'.join([stem] + [f"{letter}. {body}" for letter, body in choices])
+    else:
+        choices = None
+        kind = question_type(cleaned)
+
+    if system_prompt is None and simplify:
+        system_prompt = SIMPLIFY_PROMPTS.get(kind, SIMPLIFY_PROMPT)
+    return PromptPlan(raw, cleaned, kind, choices, system_prompt, _max_tokens(config, kind, simplify), provider)
@@ -0,0 +1,90 @@
+#  Author: micr0softDrestlife
+"""Latest-wins Solve scheduler.
+
+快速连点 Solve（或自动模式连续触发、确认模式点 OK）时，旧的 Solve 已经没有意义，但它的
+OCR 和 AI 请求仍会继续执行，回答还会和新的回答交错写进结果区。SolveScheduler 保证：
+
+    - 同一时间只有一个 Solve 在运行：提交新的 Solve 时取消正在运行的协程。AI 的流式请求
+      在取消时释放连接，服务端随即停止生成；等待 OCR 执行器的任务会从执行器队列中撤下
+    - 排队合并：等待旧 Solve 退出期间又有更新的 Solve 提交时，中间的 Solve 直接跳过
+    - 每个 Solve 有递增的 request_id，只有 is_current(request_id) 为真时结果才写回界面，
+      已被取代的 Solve 的迟到结果被丢弃
+
+截图 / OCR 等阻塞调用在 executor（有界线程池，默认单线程）中运行。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics
+from core.event_loop import get_loop_thread
+
+
+class SolveScheduler:
+    def __init__(self, loop_thread=None, workers=1):
+        self.loop_thread = loop_thread or get_loop_thread()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='ocr')
+        self._lock = threading.Lock()
+        self._latest = 0
+        # 以下只在事件循环线程中访问
+        self._tasks = set()
+
+    @property
+    def latest(self):
+        return self._latest
+
+    def is_current(self, request_id):
+        """request_id 是否为最近一次提交的 Solve（可在任意线程调用）"""
+        return request_id == self._latest
+
+    def submit(self, factory, on_skip=None):
+        """提交一次 Solve：factory(request_id) 返回协程。
+
+        返回 (request_id, concurrent.futures.Future)；被取代前没有开始运行的 Solve 会调用
+        on_skip(request_id)（在事件循环线程中）。
+        """
+        with self._lock:
+            self._latest += 1
+            request_id = self._latest
+        metrics.counter('scheduler.submitted').inc()
+        return request_id, self.loop_thread.submit(self._run(request_id, factory, on_skip))
+
+    def cancel(self):
+        """取消正在运行的 Solve（例如关闭总开关时），之后迟到的结果都会被丢弃"""
+        with self._lock:
+            self._latest += 1
+        self.loop_thread.call_soon(self._cancel_running)
+
+    def _cancel_running(self, keep=None):
+        running = [task for task in self._tasks if task is not keep and not task.done()]
+        for task in running:
+            task.cancel()
+        if running:
+            metrics.counter('scheduler.cancelled').inc(len(running))
+        return running
+
+    async def _run(self, request_id, factory, on_skip):
+        task = asyncio.current_task()
+        # 取消旧的 Solve 并等它退出（释放连接、写完 trace），保证同一时间只有一个在运行
+        running = self._cancel_running(keep=task)
+        self._tasks.add(task)
+        started = False
+        try:
+            if running:
+                await asyncio.wait(running)
+            # 等待期间又提交了更新的 Solve（本任务也已被取消或即将被取消）
+            if not self.is_current(request_id):
+                return None
+            started = True
+            return await factory(request_id)
+        finally:
+            self._tasks.discard(task)
+            if not started:
+                metrics.counter('scheduler.coalesced').inc()
+                if on_skip is not None:
+                    on_skip(request_id)
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
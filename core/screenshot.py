@@ -1,42 +1,140 @@
 #  Author: micr0softDrestlife
-import pyautogui
-import numpy as np
-from PIL import ImageGrab
+import time
+from collections import OrderedDict
+
+from core import metrics
+from core.capture_backend import create_capture_backend
+
+
+def normalize_region(region):
+    """(x1, y1, x2, y2) 规范化为整数且 x1 <= x2、y1 <= y2（反向拖动也一样）"""
+    x1, y1, x2, y2 = region
+    return int(min(x1, x2)), int(min(y1, y2)), int(max(x1, x2)), int(max(y1, y2))
+
+
+def bounding_box(regions):
+    """多个区域的外接矩形；没有区域时返回 None"""
+    regions = list(regions)
+    if not regions:
+        return None
+    return (min(r[0] for r in regions), min(r[1] for r in regions),
+            max(r[2] for r in regions), max(r[3] for r in regions))
 
 
 class ScreenshotManager:
-    def __init__(self):
-        # selected_region stored as absolute screen coordinates (x1, y1, x2, y2)
-        self.selected_region = None  # (x1, y1, x2, y2)
+    def __init__(self, config=None, backend=None):
+        """backend 可以直接传入一个截图 backend 实例；否则按 config.CAPTURE_BACKEND 选择（见 core/capture_backend.py）"""
+        # 命名的识别区域（屏幕绝对坐标 (x1, y1, x2, y2)），按添加顺序排列；
+        ## 多个区域时一次截取它们的外接矩形（selected_region），再按区域切成视图
+        self.regions = OrderedDict()
+        self.selected_region = None  # (x1, y1, x2, y2)，所有区域的外接矩形
+        self._region_seq = 0
+        if backend is None:
+            backend = create_capture_backend(
+                getattr(config, 'CAPTURE_BACKEND', 'auto'),
+                source=getattr(config, 'CAPTURE_SOURCE', '')
+            )
+        self.backend = backend
+        # 连续截图（自动模式）复用的输出缓冲区
+        self._buffer = None
+
+        # 统计信息，供状态栏显示：实际截图频率（指数平滑）和单次截图耗时
+        self.frames = 0
+        self.fps = 0.0
+        self.grab_ms = 0.0
+        self._last_capture = None
 
     def set_region(self, region):
-        """设置截图区域。region can be (x1,y1,x2,y2) in selector window coords; we normalize to absolute screen coords."""
-        if not region:
-            self.selected_region = None
-            return
+        """设置唯一的截图区域（替换已有的所有区域）。region can be (x1,y1,x2,y2) in selector window coords;
+        we normalize to absolute screen coords."""
+        self.set_regions([region] if region else [])
+
+    def set_regions(self, regions):
+        """替换全部区域；regions 为区域列表（自动命名）或 {名称: 区域}"""
+        self.regions.clear()
+        self._region_seq = 0
+        items = regions.items() if isinstance(regions, dict) else ((None, r) for r in regions)
+        for name, region in items:
+            self.add_region(region, name)
+        self._update_bbox()
+
+    def add_region(self, region, name=None):
+        """添加一个区域，返回它的名称（未指定时依次为 region1、region2 ...）"""
+        if name is None:
+            self._region_seq += 1
+            name = f"region{self._region_seq}"
+            while name in self.regions:
+                self._region_seq += 1
+                name = f"region{self._region_seq}"
+        self.regions[name] = normalize_region(region)
+        self._update_bbox()
+        return name
+
+    def remove_region(self, name):
+        self.regions.pop(name, None)
+        self._update_bbox()
 
-        x1, y1, x2, y2 = region
-        # Ensure integers and proper ordering，区域规范化
-        x1, x2 = int(min(x1, x2)), int(max(x1, x2))
-        y1, y2 = int(min(y1, y2)), int(max(y1, y2))
+    def _update_bbox(self):
+        self.selected_region = bounding_box(self.regions.values())
+        if not self.regions:
+            self._region_seq = 0
 
-        # If coordinates were relative to a window, they should still match screen coordinates in our selector.
-        self.selected_region = (x1, y1, x2, y2)
+    def split_regions(self, frame):
+        """把外接矩形的截图按区域切开，返回 {名称: 视图}（不复制像素）。
 
-    def capture_region(self):
-        """捕获选定区域的截图并返回 RGB numpy 数组"""
+        frame 的尺寸与当前外接矩形不一致时（例如截图之后区域又变了）整帧作为唯一的区域返回。
+        """
+        bbox = self.selected_region
+        if frame is None or bbox is None:
+            return {}
+        bx, by = bbox[0], bbox[1]
+        if len(self.regions) < 2 or frame.shape[:2] != (bbox[3] - by, bbox[2] - bx):
+            return {next(iter(self.regions), 'region1'): frame}
+        return OrderedDict(
+            (name, frame[y1 - by:y2 - by, x1 - bx:x2 - bx]) for name, (x1, y1, x2, y2) in self.regions.items()
+        )
+
+    def capture_regions(self, reuse=False):
+        """一次截取所有区域的外接矩形，返回 {名称: 视图}；未选择区域或截图失败时返回 {}"""
+        return self.split_regions(self.capture_region(reuse=reuse))
+
+    def capture_region(self, reuse=False):
+        """捕获选定区域（多个区域时为它们的外接矩形）的截图并返回 RGB numpy 数组
+
+        reuse=True 时写入复用的缓冲区并返回它（下一次 reuse 截图会覆盖内容），
+        用于监视线程的连续截图；需要保留的帧由调用方自行 copy()。
+        """
         if not self.selected_region:
             return None
 
-        x1, y1, x2, y2 = self.selected_region
-
         try:
-            screenshot = ImageGrab.grab(bbox=(x1, y1, x2, y2))# 截取屏幕指定区域
-            arr = np.array(screenshot)
-            # PIL ImageGrab returns RGB by default; ensure dtype uint8
-            if arr.dtype != np.uint8:
-                arr = arr.astype('uint8')
-            return arr
+            started = time.perf_counter()
+            frame = self.backend.grab(self.selected_region, out=self._buffer if reuse else None)
+            if reuse:
+                self._buffer = frame
+            self._record(started)
+            return frame
         except Exception as e:
             print(f"截图失败: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def _record(self, started):
+        now = time.perf_counter()
+        elapsed = now - started
+        self.grab_ms = elapsed * 1000.0 if not self.frames else 0.8 * self.grab_ms + 0.2 * elapsed * 1000.0
+        if self._last_capture is not None and now - self._last_capture < 2.0:
+            # 间隔超过 2 秒视为单次截图，不计入频率
+            hz = 1.0 / max(now - self._last_capture, 1e-6)
+            self.fps = hz if not self.fps else 0.8 * self.fps + 0.2 * hz
+        self._last_capture = now
+        self.frames += 1
+        metrics.histogram('capture.grab_ms').observe(elapsed * 1000.0)
+
+    def stats_text(self):
+        """状态栏用，例如 "截图 xshm 4.0fps 3.2ms" """
+        if not self.frames:
+            return f"截图 {self.backend.name}"
+        return f"截图 {self.backend.name} {self.fps:.1f}fps {self.grab_ms:.1f}ms"
+
+    def close(self):
+        self.backend.close()
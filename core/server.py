@@ -0,0 +1,423 @@
+#  Author: micr0softDrestlife
+"""Local HTTP service exposing the OCR + AI pipeline.
+
+    python main.py serve --port 8765
+
+接口：
+    POST /solve     请求体为图片（image/png、image/jpeg 等原始字节），或 JSON：
+                    {"text": "..."} / {"image_base64": "..."}，可选 "simplify": true / "system_prompt"
+                    也接受 text/plain 的原始文本
+    GET  /health    队列长度、容量、工作进程数等
+    GET  /metrics   core.metrics.snapshot()
+
+请求先进入有界队列（满时立即返回 429），再由 OCR 工作线程取出：图片交给 OCR
+进程池识别，文字交给事件循环线程中的 AI 客户端（连接池复用），OCR 线程不等待 AI。
+一个请求从被接受到 AI 回答结束一直占用一个名额：系统中的请求数超过
+队列长度 + OCR 工作线程数 + AI 并发数时同样返回 429，AI 变慢时不会无限堆积。
+超时（504）的请求会被取消：还在排队的不再识别，进行中的 AI 请求被中断。
+上传的图片以压缩后的字节传给工作进程，在那里解码。
+发给 AI 之前用 core/prompt.py 整理 OCR 文本并按题型限制回答长度。
+返回结果中带有各阶段耗时（queue_wait / load / preprocess / ocr / ai_total）。
+出错时的状态码：400 请求无效，411 缺少 Content-Length，413 请求体过大，429 繁忙，
+500 服务内部错误，502 AI 提供方出错，504 超时。
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from core import metrics, ocr_pool
+from core.ai_client import get_ai_client, is_error_response
+from core.event_loop import get_loop_thread
+from core.metrics import SolveTrace
+from core.ocr_engine import OCREngine
+from core.prompt import build_prompt
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, image=None, text=None, system_prompt=None, simplify=False):
+        self.image = image
+        self.text = text
+        self.system_prompt = system_prompt
+        self.simplify = simplify
+        self.trace = SolveTrace(trigger='server')
+        self.enqueued = time.perf_counter()
+        self.result = None
+        self.done = threading.Event()
+        # 超时后由 SolveService.cancel 设置；future 为事件循环中 AI 请求的 Future
+        self.cancelled = False
+        self.future = None
+        # finish 时调用一次（SolveService 用来归还名额）
+        self.on_finish = None
+        self._lock = threading.Lock()
+
+    def finish(self, status, **fields):
+        """记录结果；只有第一次调用有效（超时取消与正常结束可能同时发生）"""
+        with self._lock:
+            if self.done.is_set():
+                return
+            record = self.trace.finish(status)
+            self.result = dict(fields, id=record['id'], status=status,
+                               timings_ms=dict(record['spans_ms'], total=record['total_ms']))
+            self.done.set()
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+
+class SolveService:
+    """有界队列 + OCR 工作线程 + 共享事件循环中的 AI 请求"""
+
+    def __init__(self, config, ai_client=None, engine=None, workers=0, queue_size=16, max_inflight=None):
+        """workers 为 1 时在当前进程中用 engine 识别（不启动进程池）"""
+        self.config = config
+        self.ai_client = ai_client if ai_client is not None else get_ai_client(config)
+        self.workers = int(workers) or os.cpu_count() or 1
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.max_inflight = int(max_inflight or getattr(config, 'AI_POOL_SIZE', 4))
+        self.loop_thread = get_loop_thread()
+        self._ai_slots = None
+        self._inflight = 0
+        # 已接受但尚未结束（排队、OCR 或 AI 中）的请求数及其上限
+        self._pending = 0
+        self.max_pending = self.queue.maxsize + self.workers + self.max_inflight
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.engine = None
+        self.pool = None
+        if self.workers == 1:
+            self.engine = engine or OCREngine(getattr(config, 'TESSERACT_PATH', None), config)
+        else:
+            self.pool = ocr_pool.OCRWorkerPool(
+                workers=self.workers,
+                backend_kind=getattr(config, 'OCR_BACKEND', 'auto'),
+                tesseract_path=getattr(config, 'TESSERACT_PATH', None),
+                tessdata_path=getattr(config, 'TESSDATA_PATH', None),
+                lang=getattr(config, 'OCR_LANG', 'chi_sim+eng')
+            )
+            self._worker_config = ocr_pool.worker_config(config)
+
+        # 每个工作进程对应一个 OCR 线程（线程只负责提交任务并等待结果）
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'solve-worker-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job):
+        with self._lock:
+            full = self._pending >= self.max_pending
+            if not full:
+                try:
+                    self.queue.put_nowait(job)
+                except queue.Full:
+                    full = True
+            if not full:
+                self._pending += 1
+                job.on_finish = self._release
+        if full:
+            metrics.counter('server.rejected').inc()
+            raise QueueFull()
+        metrics.counter('server.accepted').inc()
+        return job
+
+    def _release(self, job):
+        with self._lock:
+            self._pending -= 1
+
+    def cancel(self, job):
+        """请求超时：还没识别的不再识别，进行中的 AI 请求被取消（连接释放后服务端停止生成）"""
+        job.cancelled = True
+        if job.future is not None:
+            job.future.cancel()
+        metrics.counter('server.timeout').inc()
+        job.finish('timeout', error='timeout')
+
+    def health(self):
+        with self._lock:
+            inflight = self._inflight
+            pending = self._pending
+        return {
+            'status': 'ok',
+            'queue': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'workers': self.workers,
+            'ai_inflight': inflight,
+            'ai_provider': self.ai_client.provider,
+            'ocr_backend': 'process-pool' if self.pool is not None else getattr(self.engine.backend, 'name', ''),
+        }
+
+    def _ocr(self, image, trace):
+        if self.pool is not None:
+            text, spans = self.pool.submit_engine(self._worker_config, image).result()
+            for name, seconds in spans.items():
+                trace.add(name, seconds)
+            return text
+        with trace.span('load'):
+            image = ocr_pool.load_image(image)
+        return self.engine.extract_text(image, trace=trace, raise_errors=True)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            job.trace.add('queue_wait', time.perf_counter() - job.enqueued)
+            try:
+                # 排队期间已经超时的请求不再识别
+                if job.cancelled:
+                    continue
+                text = job.text
+                if job.image is not None:
+                    text = self._ocr(job.image, job.trace)
+                    job.image = None
+                if job.cancelled:
+                    continue
+                plan = build_prompt(text, self.config, provider=self.ai_client.provider,
+                                    simplify=job.simplify, system_prompt=job.system_prompt)
+                if not plan.prompt:
+                    job.finish('no_text', ocr_text=text or '')
+                    continue
+                job.future = self.loop_thread.submit(self._answer(job, text, plan.record(job.trace)))
+                # 提交期间刚好超时：cancel 可能没看到 future
+                if job.cancelled:
+                    job.future.cancel()
+            except Exception as e:
+                job.finish('error', error=f"{type(e).__name__}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _answer(self, job, text, plan):
+        if self._ai_slots is None:
+            self._ai_slots = asyncio.Semaphore(self.max_inflight)
+        try:
+            async with self._ai_slots:
+                with self._lock:
+                    self._inflight += 1
+                try:
+                    with job.trace.span('ai_total'):
+                        answer = await self.ai_client.agenerate_response(
+                            plan.prompt, system_prompt=plan.system_prompt, max_tokens=plan.max_tokens)
+                finally:
+                    with self._lock:
+                        self._inflight -= 1
+            status = 'ai_error' if is_error_response(answer) else 'ok'
+            job.finish(status, ocr_text=text, answer=answer, question_type=plan.question_type)
+        except asyncio.CancelledError:
+            job.finish('timeout', ocr_text=text, error='timeout')
+            raise
+        except Exception as e:
+            job.finish('error', ocr_text=text, error=f"{type(e).__name__}: {e}")
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        try:
+            self.loop_thread.run(self.ai_client.aclose(), timeout=5)
+        except Exception:
+            pass
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def check_image(data):
+    """只读取图片头（不解码像素），格式不对时抛出 ValueError；返回原始字节"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.size
+    except Exception as e:
+        raise ValueError(f"无法解析图片: {e}")
+    return bytes(data)
+
+
+# 结果状态对应的 HTTP 状态码：AI 提供方出错（上游错误）为 502，服务自身出错为 500，其余为 200
+RESULT_STATUS = {'error': 500, 'ai_error': 502}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AKSubjectOne/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def service(self) -> SolveService:
+        return self.server.service
+
+    def _send_json(self, obj, status=200, headers=None):
+        data = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/health':
+            self._send_json(self.service.health())
+        elif path == '/metrics':
+            self._send_json(metrics.snapshot())
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        if self.path.split('?', 1)[0].rstrip('/') != '/solve':
+            self._send_json({'error': 'not found'}, status=404)
+            return
+        # 请求体没有读取就返回错误时，连接上剩下的数据无法解析，回复后关闭连接
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self._reject(411, 'Content-Length required')
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reject(400, 'invalid Content-Length')
+            return
+        if length > self.server.max_body:
+            self._reject(413, 'request body too large')
+            return
+        body = self.rfile.read(length)
+
+        try:
+            job = self._parse_job(body)
+        except ValueError as e:
+            self._send_json({'error': str(e)}, status=400)
+            return
+
+        try:
+            self.service.submit(job)
+        except QueueFull:
+            self._send_json({'error': 'queue full', 'queue': self.service.queue.qsize()}, status=429,
+                            headers={'Retry-After': '1'})
+            return
+
+        if not job.done.wait(self.server.request_timeout):
+            self.service.cancel(job)
+            self._send_json({'error': 'timeout', 'id': job.trace.id}, status=504)
+            return
+        self._send_json(job.result, status=RESULT_STATUS.get(job.result['status'], 200))
+
+    def _reject(self, status, error):
+        self._send_json({'error': error}, status=status, headers={'Connection': 'close'})
+        self.close_connection = True
+
+    def _parse_job(self, body):
+        content_type = (self.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
+        simplify = 'simplify=1' in self.path or 'simplify=true' in self.path
+        if content_type.startswith('image/') or content_type == 'application/octet-stream':
+            return Job(image=check_image(body), simplify=simplify)
+        if content_type == 'application/json':
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise ValueError('invalid json')
+            if not isinstance(payload, dict):
+                raise ValueError('json body must be an object')
+            system_prompt = payload.get('system_prompt')
+            simplify = bool(payload.get('simplify') or simplify)
+            if payload.get('text'):
+                if not isinstance(payload['text'], str):
+                    raise ValueError('text must be a string')
+                return Job(text=payload['text'], system_prompt=system_prompt, simplify=simplify)
+            if payload.get('image_base64'):
+                try:
+                    data = base64.b64decode(payload['image_base64'])
+                except ValueError:
+                    raise ValueError('invalid base64')
+                return Job(image=check_image(data), system_prompt=system_prompt, simplify=simplify)
+            raise ValueError('需要 text 或 image_base64')
+        text = body.decode('utf-8', errors='replace').strip()
+        if not text:
+            raise ValueError('empty body')
+        return Job(text=text, simplify=simplify)
+
+
+class SolveServer:
+    def __init__(self, service, host='127.0.0.1', port=8765, request_timeout=180.0, max_body=16 * 1024 * 1024):
+        self.service = service
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.service = service
+        self._httpd.request_timeout = float(request_timeout)
+        self._httpd.max_body = int(max_body)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='solve-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self.service.close()
+
+
+def main(argv=None, config=None):
+    if config is None:
+        from config.settings import AppConfig
+        config = AppConfig()
+
+    parser = argparse.ArgumentParser(prog='main.py serve', description='以本地 HTTP 服务的方式提供 OCR + AI')
+    parser.add_argument('--host', default=getattr(config, 'SERVER_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=getattr(config, 'SERVER_PORT', 8765))
+    parser.add_argument('--workers', type=int, default=getattr(config, 'SERVER_WORKERS', 0),
+                        help='OCR 工作进程数，默认为 CPU 核数；1 表示在服务进程内识别')
+    parser.add_argument('--queue-size', type=int, default=getattr(config, 'SERVER_QUEUE_SIZE', 16))
+    args = parser.parse_args(argv)
+
+    metrics.configure_solve_log(
+        getattr(config, 'METRICS_LOG_PATH', ''),
+        max_bytes=getattr(config, 'METRICS_LOG_MAX_BYTES', 1024 * 1024),
+        backup_count=getattr(config, 'METRICS_LOG_BACKUPS', 3)
+    )
+    service = SolveService(config, workers=args.workers, queue_size=args.queue_size)
+    threading.Thread(target=service.ai_client.preconnect, daemon=True).start()
+    if getattr(config, 'OLLAMA_PRELOAD', True):
+        threading.Thread(target=service.ai_client.preload, daemon=True).start()
+    if service.pool is not None:
+        threading.Thread(target=service.pool.warm_up, daemon=True).start()
+
+    server = SolveServer(service, args.host, args.port,
+                         request_timeout=getattr(config, 'SERVER_REQUEST_TIMEOUT', 180.0))
+    print(f"服务已启动: {server.url}  (POST /solve, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
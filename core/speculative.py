@@ -0,0 +1,94 @@
+#  Author: micr0softDrestlife
+"""Speculative background OCR.
+
+选好区域之后到点击 Solve 之间通常有几秒空闲，SpeculativeOCR 利用这段时间提前识别：
+
+    - 选区变化后（界面先截一帧做预览）以及自动模式检测到画面变化但暂时不 Solve 时，
+      schedule(frame) 在后台单线程执行器中识别这一帧
+    - 识别结果和这一帧的下采样哈希（frame_digest）、当时的区域一起保存
+    - Solve 截图后用 lookup(frame) 查询：哈希和区域都相同（画面没有变化）时直接拿到
+      识别结果（或等待还在进行的推测识别），跳过预处理和 tesseract，直接调用 AI
+
+只保留最近一次推测：新的 schedule 会把还在排队的旧推测撤下（已经开始的识别无法中断，
+它的结果仍会写入 OCR 缓存）。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics
+from core.frame_hash import frame_digest
+from core.prompt import join_region_texts
+
+
+class SpeculativeOCR:
+    def __init__(self, ocr_engine, screenshot_manager, executor=None):
+        self.ocr_engine = ocr_engine
+        self.screenshot_manager = screenshot_manager
+        # 与 Solve 的执行器分开，Solve 截图不必排在推测识别后面
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='ocr-speculative')
+        self._lock = threading.Lock()
+        self._key = None
+        self._future = None
+
+        # 统计信息
+        self.runs = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _key_for(self, frame):
+        return frame_digest(frame), tuple(self.screenshot_manager.regions.items())
+
+    def schedule(self, frame):
+        """在后台识别 frame（外接矩形的整帧，调用方不能再修改它），返回 concurrent.futures.Future。
+
+        与最近一次推测是同一画面且区域没有变化时不重复识别。
+        """
+        if frame is None or not self.screenshot_manager.regions:
+            return None
+        key = self._key_for(frame)
+        with self._lock:
+            if self._key == key and self._usable(self._future):
+                return self._future
+            if self._future is not None:
+                self._future.cancel()
+            regions = dict(self.screenshot_manager.regions)
+            images = self.screenshot_manager.split_regions(frame)
+            self._key = key
+            self._future = self.executor.submit(self._recognize, images, regions)
+            self.runs += 1
+        metrics.counter('ocr.speculative_runs').inc()
+        return self._future
+
+    def _recognize(self, images, regions):
+        return join_region_texts(self.ocr_engine.extract_regions(images, regions=regions, raise_errors=True))
+
+    @staticmethod
+    def _usable(future):
+        if future is None or future.cancelled():
+            return False
+        return not future.done() or future.exception() is None
+
+    def lookup(self, frame):
+        """Solve 用：frame 与最近一次推测是同一画面时返回它的 Future（可能尚未完成），否则返回 None"""
+        key = self._key_for(frame)
+        with self._lock:
+            future = self._future if self._key == key and self._usable(self._future) else None
+            if future is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.counter('ocr.speculative_hit' if future is not None else 'ocr.speculative_miss').inc()
+        return future
+
+    def invalidate(self):
+        """清除选区等情况下丢弃推测结果"""
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+            self._key = None
+            self._future = None
+
+    def shutdown(self):
+        self.invalidate()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,113 @@
+#  Author: micr0softDrestlife
+"""Startup milestones and background loading of the heavy components.
+
+图形界面启动时先创建主窗口，OCR 引擎（cv2 / numpy / tesseract）、AI 客户端
+（requests / aiohttp）和截图模块在后台线程中加载并预热，完成后再交给主窗口：
+
+    clock.mark('window')        主窗口第一次进入事件循环
+    clock.mark('components')    OCREngine / AI 客户端 / 截图模块创建完成
+    clock.mark('solve_ready')   tesseract 与 AI 连接预热完成，可以 Solve
+
+各里程碑记录的是从进程启动（本模块被导入）开始的毫秒数，同时写入
+startup.<name>_ms 直方图。python -m benchmarks.startup 会测量这些时间。
+"""
+
+import threading
+import time
+
+from core import metrics
+
+# 导入 main.py 时不应加载的模块（由 test_startup.py 检查）
+HEAVY_MODULES = ('cv2', 'numpy', 'PIL', 'requests', 'aiohttp', 'pytesseract',
+                 'pyautogui', 'pystray', 'tkinter')
+
+
+class StartupClock:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.milestones = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """记录里程碑（只记录第一次），返回从启动开始的毫秒数"""
+        elapsed = (time.perf_counter() - self.started) * 1000.0
+        with self._lock:
+            if name in self.milestones:
+                return self.milestones[name]
+            self.milestones[name] = round(elapsed, 1)
+        metrics.histogram(f"startup.{name}_ms").observe(elapsed)
+        return self.milestones[name]
+
+    def summary_text(self):
+        """状态栏用，例如 "启动: 窗口 180 | 可Solve 1450ms" """
+        labels = (('window', '窗口'), ('solve_ready', '可Solve'))
+        parts = [f"{label} {self.milestones[name]:.0f}" for name, label in labels if name in self.milestones]
+        return f"启动: {' | '.join(parts)}ms" if parts else ''
+
+
+clock = StartupClock()
+
+
+def load_components(config):
+    """创建 OCR 引擎、AI 客户端和截图模块（在这里才导入 cv2 / numpy / requests 等）"""
+    from core.ocr_engine import OCREngine
+    from core.ai_client import get_ai_client
+    from core.screenshot import ScreenshotManager
+
+    # 初始化OCR引擎，传入tesseract路径，并在此时选择OCR后端
+    ocr_engine = OCREngine(getattr(config, 'TESSERACT_PATH', None), config)
+    # 按 AI_PROVIDER 创建客户端（开启 AI_CACHE_ENABLED 时带回答缓存）
+    ai_client = get_ai_client(config)
+    screenshot_manager = ScreenshotManager(config)
+    clock.mark('components')
+    return ocr_engine, ai_client, screenshot_manager
+
+
+def warm_up(ocr_engine, ai_client):
+    """并行预热 tesseract（或 OCR 进程池）和到 AI 服务的连接，都完成后返回"""
+    threads = [
+        threading.Thread(target=ai_client.preconnect, name='warm-ai', daemon=True),
+        threading.Thread(target=ocr_engine.warm_up, name='warm-ocr', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    clock.mark('solve_ready')
+
+
+class BackgroundLoader:
+    """在后台线程中依次执行 load_components 和 warm_up。
+
+    on_loaded(ocr_engine, ai_client, screenshot_manager) 在组件创建后立即调用（预热之前），
+    on_ready() 在预热完成后调用，on_error(exception) 在加载失败时调用；
+    这些回调都在后台线程中执行，界面需要自行切回主线程（root.after）。
+    """
+
+    def __init__(self, config, on_loaded, on_ready=None, on_error=None):
+        self.config = config
+        self.on_loaded = on_loaded
+        self.on_ready = on_ready
+        self.on_error = on_error
+        self.components = None
+        self.ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='startup-loader', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.components = load_components(self.config)
+            self.on_loaded(*self.components)
+            warm_up(self.components[0], self.components[1])
+        except Exception as e:
+            print(f"组件加载失败: {e}")
+            if self.on_error is not None:
+                self.on_error(e)
+            self.ready.set()
+            return
+        if self.on_ready is not None:
+            self.on_ready()
+        self.ready.set()
@@ -0,0 +1,143 @@
+#  Author: micr0softDrestlife
+"""Auto-solve watcher.
+
+RegionWatcher 在后台线程中按固定频率轮询 ScreenshotManager.capture_region，
+用缩略图判断画面是否变化；画面变化后并连续稳定 N 帧，才触发一次 Solve。
+同一时间最多只有一个待处理的 Solve：on_change 中读取 pending（这次触发的编号），
+这次触发的 Solve 处理完后调用 mark_done(编号)；手动 Solve 等其他请求结束不会清除它。
+"""
+
+import threading
+import time
+
+from core.frame_hash import FrameThumbnailer
+
+
+class RegionWatcher:
+    def __init__(self, screenshot_manager, on_change, poll_hz=4.0, stable_frames=3, diff_threshold=8):
+        """on_change(frame) 在监视线程中被调用，frame 为触发时的整帧截图。"""
+        self.screenshot_manager = screenshot_manager
+        self.on_change = on_change
+        self.poll_hz = max(0.1, float(poll_hz))
+        self.stable_frames = max(1, int(stable_frames))
+        self.diff_threshold = int(diff_threshold)
+
+        self._thumbnailer = FrameThumbnailer()
+        self._current = self._thumbnailer.new_buffer()
+        self._previous = self._thumbnailer.new_buffer()
+        self._solved = self._thumbnailer.new_buffer()
+        self._has_previous = False
+        self._has_solved = False
+        self._stable_count = 0
+
+        # 等待处理的触发编号；没有待处理的 Solve 时为 None
+        self._pending = None
+        self._triggers = 0
+        self._lock = threading.Lock()
+        # 同一时间只有一个轮询循环访问上面的缩略图状态
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # 统计信息，供状态栏显示
+        self.frames = 0
+        self.skipped_frames = 0
+        self.solves = 0
+        self.measured_hz = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        # 每次启动使用新的停止事件，避免旧线程在 stop() 之后被重新唤醒
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        # 等旧线程退出，紧接着的 start() 不会与它同时轮询
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+
+    def reset(self):
+        """选区变化后调用：忘记之前的画面，下一次稳定的画面会重新触发 Solve。"""
+        self._has_previous = False
+        self._has_solved = False
+        self._stable_count = 0
+
+    @property
+    def pending(self):
+        """等待处理的触发编号（在 on_change 中读取即为这次触发的编号）"""
+        return self._pending
+
+    def mark_done(self, trigger):
+        """trigger 对应的 Solve 结束（无论成功与否），允许触发下一次；其他编号被忽略。"""
+        with self._lock:
+            if trigger is not None and trigger == self._pending:
+                self._pending = None
+
+    def stats_text(self):
+        return f"监视 {self.measured_hz:.1f}Hz | 跳过 {self.skipped_frames} 帧 | 触发 {self.solves} 次"
+
+    def poll_once(self):
+        """处理一帧，返回是否触发了 Solve。"""
+        # 轮询帧写入截图模块复用的缓冲区，只有触发 Solve 的那一帧才复制一份
+        frame = self.screenshot_manager.capture_region(reuse=True)
+        if frame is None:
+            return False
+        self.frames += 1
+
+        current = self._thumbnailer.thumbnail(frame, self._current)
+
+        if self._has_previous and self._thumbnailer.max_diff(current, self._previous) <= self.diff_threshold:
+            self._stable_count += 1
+        else:
+            self._stable_count = 1
+        # 交换缓冲区，而不是分配新的缩略图
+        self._current, self._previous = self._previous, self._current
+        self._has_previous = True
+        current = self._previous
+
+        changed = not self._has_solved or self._thumbnailer.max_diff(current, self._solved) > self.diff_threshold
+        if not changed or self._stable_count < self.stable_frames or self._pending is not None:
+            self.skipped_frames += 1
+            return False
+
+        self._solved[...] = current
+        self._has_solved = True
+        with self._lock:
+            self._triggers += 1
+            self._pending = self._triggers
+        self.solves += 1
+        try:
+            self.on_change(frame.copy())
+        except Exception as e:
+            print(f"自动识别触发失败: {e}")
+            self.mark_done(self._triggers)
+        return True
+
+    def _run(self, stop):
+        interval = 1.0 / self.poll_hz
+        last = None
+        while not stop.is_set():
+            started = time.monotonic()
+            if last is not None:
+                elapsed = started - last
+                if elapsed > 0:
+                    # 指数平滑后的实际轮询频率
+                    hz = 1.0 / elapsed
+                    self.measured_hz = hz if not self.measured_hz else 0.8 * self.measured_hz + 0.2 * hz
+            last = started
+            try:
+                with self._poll_lock:
+                    if stop.is_set():
+                        break
+                    self.poll_once()
+            except Exception as e:
+                print(f"监视截图失败: {e}")
+            stop.wait(max(0.0, interval - (time.monotonic() - started)))
@@ -1,12 +1,20 @@
 #  Author: micr0softDrestlife
 import tkinter as tk
 from tkinter import ttk, scrolledtext
+import asyncio
 import threading
-from PIL import Image, ImageTk
-import io
+import time
+
+from core import metrics, startup
+from core.event_loop import get_loop_thread
+from core.keep_warm import KeepWarm, state_text
+from core.metrics import SolveTrace
+from core.prompt import build_prompt, join_region_texts
+from core.scheduler import SolveScheduler
 
 class MainWindow:
     def __init__(self, ocr_engine, ai_client, screenshot_manager, config):
+        """ocr_engine / ai_client / screenshot_manager 可以先传 None，窗口显示后再由 attach_components 传入"""
         self.ocr_engine = ocr_engine
         self.ai_client = ai_client
         self.screenshot_manager = screenshot_manager
@@ -19,7 +27,67 @@ class MainWindow:
         # keep a reference to the preview image to avoid GC
         self._preview_photo = None
 
+        # 所有AI请求都在共享的事件循环线程中以协程运行；截图/OCR是CPU密集的阻塞调用，放到调度器的单线程执行器中
+        ## 同一时间只运行一个Solve：新的Solve（包括确认模式的OK）会取消旧的，旧Solve迟到的结果不再写回界面
+        self.loop_thread = get_loop_thread()
+        self.scheduler = SolveScheduler(self.loop_thread)
+
+        # 自动模式：监视选区变化并自动Solve（截图模块加载后创建）
+        self.watcher = None
+        # 推测识别：选区变化后提前在后台OCR，Solve 时画面没变就直接用结果（组件加载后创建）
+        self.speculative = None
+        # 本地模型保活：开关打开期间定时刷新 Ollama 的模型常驻时间（AI 客户端加载后创建）
+        self.keep_warm = None
+
         self.create_window()
+        if screenshot_manager is not None:
+            self.attach_components(ocr_engine, ai_client, screenshot_manager)
+        else:
+            self.region_btn.config(state='disabled')
+            self.add_region_btn.config(state='disabled')
+            self.status_var.set("正在加载 OCR / AI 组件...")
+
+    def attach_components(self, ocr_engine, ai_client, screenshot_manager):
+        """（主线程）传入后台加载完成的组件，启用区域选择"""
+        from core.speculative import SpeculativeOCR
+        from core.watcher import RegionWatcher
+
+        self.ocr_engine = ocr_engine
+        self.ai_client = ai_client
+        self.screenshot_manager = screenshot_manager
+        self.watcher = RegionWatcher(
+            self.screenshot_manager,
+            self._on_watch_change,
+            poll_hz=getattr(self.config, 'WATCH_POLL_HZ', 4.0),
+            stable_frames=getattr(self.config, 'WATCH_STABLE_FRAMES', 3),
+            diff_threshold=getattr(self.config, 'WATCH_DIFF_THRESHOLD', 8)
+        )
+        if getattr(self.config, 'OCR_SPECULATIVE', True):
+            self.speculative = SpeculativeOCR(self.ocr_engine, self.screenshot_manager)
+        self.keep_warm = KeepWarm(
+            self.ai_client,
+            interval=getattr(self.config, 'OLLAMA_KEEP_WARM_INTERVAL', 60.0),
+            on_state=self._on_model_state
+        )
+        # 与 OCR / 连接预热同时在后台把模型加载到内存，第一次 Solve 不必等模型加载
+        if getattr(self.config, 'OLLAMA_PRELOAD', True):
+            threading.Thread(target=self.keep_warm.ping, name='preload-model', daemon=True).start()
+        if self.switch_state:
+            self.keep_warm.start()
+        self.region_btn.config(state='normal')
+        self.add_region_btn.config(state='normal')
+        # 右侧状态栏显示使用的截图 backend
+        self.watch_status_var.set(self.screenshot_manager.stats_text())
+        if not startup.clock.milestones.get('solve_ready'):
+            self.status_var.set("正在预热 OCR / AI...")
+
+    def on_components_ready(self):
+        """（主线程）tesseract 与 AI 连接预热完成"""
+        self.status_var.set(self._ready_status())
+
+    def on_components_error(self, error):
+        """（主线程）组件加载失败"""
+        self.status_var.set(f"组件加载失败: {error}")
     
     def create_window(self):
         """创建主窗口"""
@@ -64,6 +132,14 @@ class MainWindow:
         )
         self.region_btn.pack(side=tk.LEFT)
 
+        # 在已有区域的基础上添加/删除区域（题目和选项分在不同窗格时一次Solve识别多个区域）
+        self.add_region_btn = ttk.Button(
+            region_frame,
+            text="添加区域",
+            command=lambda: self.select_region(add=True)
+        )
+        self.add_region_btn.pack(side=tk.LEFT, padx=(6, 0))
+
         # 关闭选区边框的按钮，初始禁用
         self.close_region_btn = ttk.Button(
             region_frame,
@@ -82,6 +158,9 @@ class MainWindow:
         # 创建手动确认开关（开启后OCR结果需在界面内确认/修改再发送）
         self.create_confirm_switch(parent=self.controls_body)
 
+        # 创建自动模式开关（开启后监视选区，内容变化并稳定后自动Solve）
+        self.create_watch_switch(parent=self.controls_body)
+
         # 显示选定区域
         self.region_label = tk.Label(self.controls_body, text="未选择区域", wraplength=360)
         self.region_label.pack(pady=5, anchor='w', padx=6)
@@ -106,10 +185,19 @@ class MainWindow:
         )
         self.solve_btn.pack(pady=10)
         
-        # 状态栏
+        # 状态栏（左侧为处理状态，右侧为自动模式的轮询统计）
+        status_frame = tk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         self.status_var = tk.StringVar(value="就绪")
-        status_bar = tk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_bar = tk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor='w')
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.watch_status_var = tk.StringVar(value="")
+        watch_status = tk.Label(status_frame, textvariable=self.watch_status_var, relief=tk.SUNKEN)
+        watch_status.pack(side=tk.RIGHT)
+        # 本地模型是否已加载到内存（远程提供方时为空）
+        self.model_status_var = tk.StringVar(value="")
+        model_status = tk.Label(status_frame, textvariable=self.model_status_var, relief=tk.SUNKEN)
+        model_status.pack(side=tk.RIGHT)
     
     def create_switch(self, parent=None):
         """创建滑动开关。可指定父容器 parent（默认为 root）。"""
@@ -186,6 +274,79 @@ class MainWindow:
         # 保存 frame
         self._confirm_frame = frame
 
+    def create_watch_switch(self, parent=None):
+        """创建用于控制自动模式（监视选区变化自动Solve）的滑动开关。"""
+        if parent is None:
+            parent = self.root
+        frame = tk.Frame(parent)
+        frame.pack(pady=6, anchor='w', padx=6)
+
+        self.watch_state = False
+        self.watch_var = tk.StringVar(value="Off")
+
+        # 开关画布
+        self.watch_canvas = tk.Canvas(frame, width=60, height=30, bg='white')
+        self.watch_canvas.pack(side=tk.LEFT)
+        # 初始绘制
+        self.draw_watch()
+        self.watch_canvas.bind('<Button-1>', self.toggle_watch)
+
+        # 标签
+        self.watch_label = tk.Label(frame, textvariable=self.watch_var)
+        self.watch_label.pack(side=tk.LEFT, padx=6)
+
+        # 保存 frame
+        self._watch_frame = frame
+
+    def draw_watch(self):
+        """绘制自动模式开关状态"""
+        try:
+            self.watch_canvas.delete('all')
+        except Exception:
+            return
+
+        self.watch_var.set('自动模式')
+
+        if self.watch_state:
+            self.watch_canvas.create_rectangle(0, 0, 60, 30, fill='green', outline='black')
+            self.watch_canvas.create_oval(30, 0, 60, 30, fill='white', outline='black')
+        else:
+            self.watch_canvas.create_rectangle(0, 0, 60, 30, fill='gray', outline='black')
+            self.watch_canvas.create_oval(0, 0, 30, 30, fill='white', outline='black')
+
+    def toggle_watch(self, event):
+        """切换自动模式开关：开启时启动监视线程，关闭时停止"""
+        if self.watcher is None:
+            return
+        self.watch_state = not getattr(self, 'watch_state', False)
+        self.draw_watch()
+        if self.watch_state:
+            self.watcher.reset()
+            self.watcher.start()
+            self._update_watch_status()
+        else:
+            self.watcher.stop()
+            self.watch_status_var.set(self.screenshot_manager.stats_text())
+
+    def _update_watch_status(self):
+        """定时刷新状态栏中的轮询频率、跳过帧数，以及截图 backend 和实际截图帧率"""
+        if not getattr(self, 'watch_state', False):
+            return
+        self.watch_status_var.set(f"{self.watcher.stats_text()} | {self.screenshot_manager.stats_text()}")
+        self.root.after(500, self._update_watch_status)
+
+    def _on_watch_change(self, frame):
+        """监视线程回调：选区内容变化并稳定后触发一次Solve（同一时间最多一个）"""
+        watch_trigger = self.watcher.pending
+        if not self.switch_state or getattr(self, 'waiting_for_confirm', False):
+            # 暂时不 Solve，先在后台识别新画面，之后点击 Solve 时可以直接使用
+            self._speculate(frame)
+            self.watcher.mark_done(watch_trigger)
+            return
+        # 从检测到变化开始计时，Tk 调度的延迟也计入排队时间
+        trace = SolveTrace(trigger='watch')
+        self.root.after(0, lambda: self._start_solve(frame, trace, watch_trigger))
+
     def draw_confirm(self):
         """绘制手动确认开关状态"""
         try:
@@ -268,6 +429,18 @@ class MainWindow:
         """切换开关状态"""
         self.switch_state = not self.switch_state
         self.draw_switch()
+        # 开关打开期间保持本地模型常驻；关闭总开关时取消正在进行的Solve（包括进行中的AI请求）
+        if self.switch_state:
+            if self.keep_warm is not None:
+                self.keep_warm.start()
+        else:
+            self.scheduler.cancel()
+            if self.keep_warm is not None:
+                self.keep_warm.stop()
+
+    def _on_model_state(self, state):
+        """保活线程回调：在状态栏显示模型的加载状态"""
+        self.root.after(0, lambda: self.model_status_var.set(state_text(state)))
 
     def _toggle_controls(self):
         """折叠/展开控件面板主体"""
@@ -304,27 +477,18 @@ class MainWindow:
         except Exception:
             pass
     
-    def select_region(self):
-        """选择识别区域"""
+    def select_region(self, add=False):
+        """选择识别区域；add 为 True 时显示已有区域，可以继续添加或右键删除"""
         from gui.region_selector import RegionSelector
         
-        def on_region_selected(region):
-            if region:
-                self.screenshot_manager.set_region(region)
-                self.region_label.config(text=f"已选择区域: {region}")
-                # 尝试捕获并显示选区预览
-                img = self.screenshot_manager.capture_region()
-                if img is not None:
-                    self.update_preview(img)
-                # enable solve when region selected
-                self.solve_btn.config(state='normal' if self.switch_state else 'disabled')
-                # 显示屏幕上的选区边框以便观察
-                try:
-                    self._create_region_overlay(region)
-                    # 启用关闭按钮
-                    self.close_region_btn.config(state='normal')
-                except Exception:
-                    pass
+        def on_region_selected(result):
+            if result is None:
+                return
+            if add:
+                self.screenshot_manager.set_regions(result)
+            else:
+                self.screenshot_manager.set_region(result)
+            self._on_regions_changed()
 
         # 最小化主窗口临时（使用 iconify 而不是 withdraw 防止任务栏图标消失）
         try:
@@ -336,7 +500,8 @@ class MainWindow:
             except Exception:
                 pass
 
-        selector = RegionSelector(on_region_selected)
+        existing = list(self.screenshot_manager.regions.values()) if add else None
+        selector = RegionSelector(on_region_selected, regions=existing, multi=add)
         selector.start_selection()
 
         # 重新显示主窗口并置顶
@@ -347,6 +512,46 @@ class MainWindow:
         except Exception:
             pass
     
+    def _on_regions_changed(self):
+        """区域增删之后：更新标签、预览和屏幕上的边框"""
+        regions = self.screenshot_manager.regions
+        if not regions:
+            self.close_region()
+            return
+        self.watcher.reset()
+        if len(regions) == 1:
+            self.region_label.config(text=f"已选择区域: {next(iter(regions.values()))}")
+        else:
+            self.region_label.config(text=f"已选择 {len(regions)} 个区域（一次截取，分别识别）")
+        # 尝试捕获并显示选区预览（多个区域时为外接矩形）
+        img = self.screenshot_manager.capture_region()
+        if img is not None:
+            self.update_preview(img)
+            self._speculate(img)
+        # enable solve when region selected
+        self.solve_btn.config(state='normal' if self.switch_state else 'disabled')
+        # 显示屏幕上的选区边框以便观察
+        try:
+            self._create_region_overlay(regions)
+            # 启用关闭按钮
+            self.close_region_btn.config(state='normal')
+        except Exception:
+            pass
+
+    def _speculate(self, frame):
+        """在后台提前识别 frame（选区的整帧截图）"""
+        if self.speculative is None or frame is None:
+            return
+        try:
+            self.speculative.schedule(frame)
+        except Exception as e:
+            print(f"推测识别失败: {e}")
+
+    def _remove_region(self, name):
+        """右键点击屏幕上的区域边框时删除该区域"""
+        self.screenshot_manager.remove_region(name)
+        self._on_regions_changed()
+
     def create_result_area(self):
         """创建结果显示区域"""
         result_frame = tk.LabelFrame(self.root, text="AI回复")
@@ -369,47 +574,113 @@ class MainWindow:
     
     def solve(self):
         """执行OCR和AI处理"""
-        if not self.switch_state:
+        if not self.switch_state or self.ocr_engine is None:
             return
+        self._start_solve()
+
+    def _start_solve(self, screenshot=None, trace=None, watch_trigger=None):
+        """清空结果区并提交一次Solve到事件循环；screenshot 为自动模式已截取的帧，
+        watch_trigger 为触发它的监视编号，这次 Solve 结束时交还给 watcher"""
+        if trace is None:
+            trace = SolveTrace(trigger='manual')
         # 每次solve前清空结果区域以保持简洁（若result_text不存在则忽略）
         try:
             self.result_text.delete('1.0', tk.END)
         except Exception:
             pass
 
-        # 在新线程中执行，避免界面冻结
-        thread = threading.Thread(target=self._solve_thread)
-        thread.daemon = True
-        thread.start()
+        # 在事件循环线程中执行，避免界面冻结；提交后正在进行的Solve会被取消
+        _, future = self.scheduler.submit(
+            lambda request_id: self._solve_async(screenshot, trace, request_id, watch_trigger),
+            on_skip=lambda request_id: self._on_solve_skipped(trace, watch_trigger)
+        )
+        return future
+
+    def _on_solve_skipped(self, trace, watch_trigger=None):
+        """（事件循环中）Solve 还没开始就被更新的 Solve 取代"""
+        trace.finish('superseded')
+        if self.watcher is not None:
+            self.watcher.mark_done(watch_trigger)
+
+    def _ui(self, request_id, fn):
+        """在界面线程中执行 fn；request_id 对应的Solve已被取代时丢弃（不再写回界面）"""
+        def run():
+            if request_id is not None and not self.scheduler.is_current(request_id):
+                metrics.counter('scheduler.stale_dropped').inc()
+                return
+            fn()
+        self.root.after(0, run)
+
+    async def _run_timed(self, trace, name, fn, *args):
+        """在OCR执行器中运行 fn：等待执行器空闲的时间计入 queue_wait，执行时间计入 name（为空则不记录）"""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            trace.add('queue_wait', started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                if name:
+                    trace.add(name, time.perf_counter() - started)
+
+        return await loop.run_in_executor(self.scheduler.executor, job)
     
-    def _solve_thread(self):
-        """处理线程"""
-        self.status_var.set("正在处理...")
+    async def _solve_async(self, screenshot=None, trace=None, request_id=None, watch_trigger=None):
+        """Solve 协程：截图/OCR 在执行器中运行，AI 调用在事件循环中流式进行
+
+        request_id 来自 SolveScheduler，写回界面的内容都带上它，被取代后的结果会被丢弃。
+        watch_trigger 为自动模式的触发编号，结束时只清除它对应的待处理状态。
+        """
+        if trace is None:
+            trace = SolveTrace()
+        # 从点击（或检测到变化）到协程真正开始执行的时间（包括等待被取代的Solve退出）
+        trace.add('queue_wait', trace.since_start())
+        trace.meta['request_id'] = request_id
+        status = 'ok'
+        self._ui(request_id, lambda: self.status_var.set("正在处理..."))
         
         try:
-            # 截图
-            screenshot = self.screenshot_manager.capture_region()
+            # 截图（自动模式下直接使用监视线程截取的帧）
+            if screenshot is None:
+                screenshot = await self._run_timed(trace, 'capture', self.screenshot_manager.capture_region)
             if screenshot is None:
-                self.result_text.insert(tk.END, "错误: 未选择区域\n")
+                status = 'no_region'
+                self._ui(request_id, lambda: self.result_text.insert(tk.END, "错误: 未选择区域\n"))
                 return
             
-            # OCR识别
-            ocr_text = self.ocr_engine.extract_text(screenshot)
+            # 画面与推测识别时相同：直接使用（或等待）后台的识别结果，跳过预处理和 tesseract
+            ocr_text = await self._speculative_text(screenshot, trace)
+            if ocr_text is None:
+                # OCR识别（预处理/识别的耗时由 OCREngine 记录到 trace 中）；按选区记住识别语言
+                ## 多个区域时截图按区域切成视图，各区域并行识别后按区域顺序拼成一个问题
+                images = self.screenshot_manager.split_regions(screenshot)
+                regions = dict(self.screenshot_manager.regions)
+                texts = await self._run_timed(
+                    trace, None, lambda: self.ocr_engine.extract_regions(images, trace=trace, regions=regions)
+                )
+                ocr_text = join_region_texts(texts)
             if not ocr_text:
-                self.root.after(0, lambda: self.result_text.insert(tk.END, "OCR未识别到文字\n"))
+                status = 'no_text'
+                self._ui(request_id, lambda: self.result_text.insert(tk.END, "OCR未识别到文字\n"))
                 return
 
-            # 若开启debug则输出OCR原文，默认不打印到结果区域
+            # 整理OCR文本（去噪、去掉界面文字、重排选项），并按题型限制回答长度
+            plan = self._build_prompt(ocr_text)
+            ocr_text = plan.prompt
+            if not ocr_text:
+                status = 'no_text'
+                self._ui(request_id, lambda: self.result_text.insert(tk.END, "OCR未识别到有效文字\n"))
+                return
+
+            # 若开启debug则输出整理后的OCR文字，默认不打印到结果区域
             if self.debug:
-                self.root.after(0, lambda: self.result_text.insert(tk.END, f"识别文字: {ocr_text}\n\n正在调用AI...\n"))
+                self._ui(request_id, lambda: self.result_text.insert(tk.END, f"识别文字: {ocr_text}\n\n正在调用AI...\n"))
             else:
                 # 仍在结果区显示正在调用AI的状态行
-                self.root.after(0, lambda: self.result_text.insert(tk.END, "正在调用AI...\n"))
+                self._ui(request_id, lambda: self.result_text.insert(tk.END, "正在调用AI...\n"))
 
-            # 如果简化模式开启，传入重要的 system prompt 指示 AI 只返回简短答案
-            system_prompt = None
-            if getattr(self, 'simplify_state', False):
-                system_prompt = "快速回答下面问题，不需要任何解释"
             # 如果手动确认模式开启，则将OCR结果放入可编辑的结果框并显示OK按钮，等待用户确认后再发送
             if getattr(self, 'confirm_state', False):
                 def prepare_for_confirm():
@@ -427,22 +698,92 @@ class MainWindow:
                     self.waiting_for_confirm = True
                     self.status_var.set("等待确认并点击 OK 发送")
 
-                self.root.after(0, prepare_for_confirm)
+                status = 'confirm'
+                self._ui(request_id, prepare_for_confirm)
                 return
 
-            ai_response = self.ai_client.generate_response(ocr_text, system_prompt=system_prompt)
-
-            # 更新界面
-            self.root.after(0, lambda: self.display_result(ocr_text, ai_response))
+            # 流式调用AI，收到的token逐段追加到结果区
+            plan.record(trace)
+            await self._stream_ai_response(plan.prompt, plan.system_prompt, trace, plan.max_tokens, request_id)
             
+        except asyncio.CancelledError:
+            # 被更新的Solve取代或总开关被关闭：AI 流式请求在取消时已释放连接
+            status = 'cancelled'
+            raise
         except Exception as e:
-            self.root.after(0, lambda: self.result_text.insert(tk.END, f"处理错误: {str(e)}\n"))
+            status = 'error'
+            message = f"处理错误: {e}\n"
+            self._ui(request_id, lambda: self.result_text.insert(tk.END, message))
         finally:
-            self.root.after(0, lambda: self.status_var.set("就绪"))
+            trace.finish(status)
+            self._ui(request_id, lambda: self.status_var.set(self._ready_status(trace)))
+            self.watcher.mark_done(watch_trigger)
     
-    def display_result(self, ocr_text, ai_response):
-        """显示结果"""
-        self.result_text.insert(tk.END, f"\n\nAI回复:\n{ai_response}\n{'='*50}\n")
+    async def _speculative_text(self, screenshot, trace):
+        """画面与最近一次推测识别相同时返回其结果（还在识别时等它完成），否则返回 None"""
+        if self.speculative is None:
+            return None
+        future = await self._run_timed(trace, 'ocr_speculative', self.speculative.lookup, screenshot)
+        if future is None:
+            trace.meta['ocr_speculative'] = 'miss'
+            return None
+        trace.meta['ocr_speculative'] = 'hit' if future.done() else 'wait'
+        try:
+            with trace.span('ocr'):
+                # shield：Solve 被取消时不撤下推测识别，下一次 Solve 仍可使用
+                return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            # 推测识别被更新的推测撤下时改为自己识别；Solve 本身被取消时照常退出
+            if future.cancelled():
+                return None
+            raise
+        except Exception as e:
+            print(f"推测识别失败，重新识别: {e}")
+            return None
+
+    def _build_prompt(self, text):
+        """按当前的简化模式和 AI 提供方整理文本，返回 core.prompt.PromptPlan"""
+        return build_prompt(text, self.config, provider=self.ai_client.provider,
+                            simplify=getattr(self, 'simplify_state', False))
+
+    def _ready_status(self, trace=None):
+        """空闲时的状态栏文字：上一次Solve各阶段的耗时，以及OCR缓存的命中/未命中计数"""
+        parts = ["就绪"]
+        if trace is not None:
+            parts.append(trace.summary_text())
+        elif startup.clock.milestones:
+            parts.append(startup.clock.summary_text())
+        cache = getattr(self.ocr_engine, 'cache', None)
+        if cache is not None:
+            parts.append(cache.stats_text())
+        return " | ".join(parts)
+
+    async def _stream_ai_response(self, prompt, system_prompt=None, trace=None, max_tokens=None, request_id=None):
+        """（事件循环中）流式调用AI，并把每段token追加到结果区；返回完整回复
+
+        传入 trace 时记录 ai_first_token（发出请求到收到第一段）和 ai_total。
+        """
+        self._ui(request_id, lambda: self._append_result("\n\nAI回复:\n"))
+        parts = []
+        started = time.perf_counter()
+        try:
+            async for chunk in self.ai_client.astream_response(prompt, system_prompt=system_prompt,
+                                                             max_tokens=max_tokens):
+                if not parts and trace is not None:
+                    trace.add('ai_first_token', time.perf_counter() - started)
+                parts.append(chunk)
+                self._ui(request_id, lambda c=chunk: self._append_result(c))
+        finally:
+            if trace is not None:
+                trace.add('ai_total', time.perf_counter() - started)
+                trace.meta['ai_provider'] = self.ai_client.provider
+                trace.meta['ai_chars'] = sum(len(p) for p in parts)
+        self._ui(request_id, lambda: self._append_result(f"\n{'='*50}\n"))
+        return ''.join(parts)
+
+    def _append_result(self, text):
+        """在结果区末尾追加文字并滚动到底部"""
+        self.result_text.insert(tk.END, text)
         self.result_text.see(tk.END)
 
     def _on_confirm_send(self):
@@ -471,31 +812,42 @@ class MainWindow:
             pass
         self.waiting_for_confirm = False
 
-        # start thread to call AI so UI doesn't block
-        thread = threading.Thread(target=self._confirm_send_thread, args=(prompt,))
-        thread.daemon = True
-        thread.start()
-
-    def _confirm_send_thread(self, prompt):
-        """线程：调用AI并将结果回填界面"""
+        # submit to the shared event loop so UI doesn't block; 与Solve共用调度器，只保留最新的一次
+        trace = SolveTrace(trigger='confirm')
+        _, future = self.scheduler.submit(
+            lambda request_id: self._confirm_send_async(prompt, trace, request_id),
+            on_skip=lambda request_id: trace.finish('superseded')
+        )
+        return future
+
+    async def _confirm_send_async(self, prompt, trace=None, request_id=None):
+        """协程：调用AI并将结果回填界面"""
+        if trace is None:
+            trace = SolveTrace(trigger='confirm')
+        trace.meta['request_id'] = request_id
+        status = 'ok'
         try:
-            self.status_var.set("正在调用AI...")
-            system_prompt = None
-            if getattr(self, 'simplify_state', False):
-                system_prompt = "快速回答下面问题，不需要任何解释"
-
-            ai_response = self.ai_client.generate_response(prompt, system_prompt=system_prompt)
-            self.root.after(0, lambda: self.display_result(prompt, ai_response))
+            self._ui(request_id, lambda: self.status_var.set("正在调用AI..."))
+            # 用户编辑过的文本再整理一次（已整理过的文本不会变化），同时确定题型和回答长度
+            plan = self._build_prompt(prompt).record(trace)
+            await self._stream_ai_response(plan.prompt, plan.system_prompt, trace, plan.max_tokens, request_id)
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
         except Exception as e:
-            self.root.after(0, lambda: self.result_text.insert(tk.END, f"处理错误: {str(e)}\n"))
+            status = 'error'
+            message = f"处理错误: {e}\n"
+            self._ui(request_id, lambda: self.result_text.insert(tk.END, message))
         finally:
-            self.root.after(0, lambda: self.status_var.set("就绪"))
+            trace.finish(status)
+            self._ui(request_id, lambda: self.status_var.set(self._ready_status(trace)))
 
     def update_preview(self, image_array):
         """在preview_canvas中显示所选区域的缩略图，并绘制边框以便观察"""
         try:
             if not hasattr(image_array, 'shape'):
                 return
+            from PIL import Image, ImageTk
             # 转为PIL Image
             pil = Image.fromarray(image_array)
             # 缩放以适配canvas
@@ -510,22 +862,25 @@ class MainWindow:
         except Exception as e:
             print('update_preview 错误:', e)
     
-    def _create_region_overlay(self, region):
-        """在屏幕上创建一个无窗口装饰的透明覆盖，仅显示选区边框，直到用户点击关闭。"""
+    def _create_region_overlay(self, regions):
+        """为每个区域在屏幕上创建一个无窗口装饰的透明覆盖，仅显示选区边框，直到用户点击关闭。
+
+        regions 为 {名称: (x1, y1, x2, y2)}；右键点击某个边框会删除该区域。
+        """
         # 清除已有覆盖
-        try:
-            if hasattr(self, 'region_overlay') and self.region_overlay:
-                try:
-                    self.region_overlay.destroy()
-                except Exception:
-                    pass
-                self.region_overlay = None
-        except Exception:
-            self.region_overlay = None
+        self._destroy_region_overlays()
+        for name, region in (regions or {}).items():
+            self.region_overlays[name] = self._make_overlay(name, region)
 
-        if not region:
-            return
+    def _destroy_region_overlays(self):
+        for overlay in list(getattr(self, 'region_overlays', {}).values()):
+            try:
+                overlay.destroy()
+            except Exception:
+                pass
+        self.region_overlays = {}
 
+    def _make_overlay(self, name, region):
         x1, y1, x2, y2 = region
         x1, x2 = int(min(x1, x2)), int(max(x1, x2))
         y1, y2 = int(min(y1, y2)), int(max(y1, y2))
@@ -556,25 +911,22 @@ class MainWindow:
         canvas.pack(fill=tk.BOTH, expand=True)
         # Draw a red border inside the overlay
         canvas.create_rectangle(1, 1, w-2, h-2, outline='red', width=3)
-
-        # keep reference
-        self.region_overlay = overlay
+        if len(self.screenshot_manager.regions) > 1:
+            canvas.create_text(6, 4, text=name, anchor='nw', fill='red')
+        # 右键点击边框删除该区域
+        canvas.bind('<Button-3>', lambda event: self._remove_region(name))
+        return overlay
 
     def close_region(self):
-        """关闭用于观察的选区边框并清除选区，要求重新选择才能再次OCR"""
-        try:
-            if hasattr(self, 'region_overlay') and self.region_overlay:
-                try:
-                    self.region_overlay.destroy()
-                except Exception:
-                    pass
-                self.region_overlay = None
-        except Exception:
-            pass
+        """关闭用于观察的选区边框并清除所有选区，要求重新选择才能再次OCR"""
+        self._destroy_region_overlays()
 
         # 清除选区
         try:
             self.screenshot_manager.set_region(None)
+            if self.speculative is not None:
+                self.speculative.invalidate()
+            self.watcher.reset()
         except Exception:
             pass
 
@@ -589,4 +941,6 @@ class MainWindow:
     
     def run(self):
         """运行主循环"""
+        # 主循环开始处理事件时窗口已经显示，记录启动到窗口出现的时间
+        self.root.after_idle(lambda: startup.clock.mark('window'))
         self.root.mainloop()
\ No newline at end of file
@@ -1,15 +1,26 @@
 #  Author: micr0softDrestlife
 import tkinter as tk
 from tkinter import ttk
-import pyautogui
+
+# 拖动距离小于该像素数视为误点，不添加区域
+MIN_REGION_SIZE = 5
+
 
 class RegionSelector:
-    def __init__(self, on_region_selected):
+    def __init__(self, on_region_selected, regions=None, multi=False):
+        """multi 为 False 时拖出一个区域后立即回调 on_region_selected(region)；
+        multi 为 True 时先显示已有的 regions，可以拖动添加多个区域、右键点击删除区域，
+        按 Enter 完成并回调 on_region_selected([region, ...])。按 ESC 取消时回调参数为 None。"""
         self.on_region_selected = on_region_selected
+        self.multi = multi
         self.start_x = None
         self.start_y = None
         self.selector_window = None
-        
+        self.rect = None
+        # 多区域模式下已画出的区域：canvas 矩形 id -> (x1, y1, x2, y2)
+        self.rects = {}
+        self._initial = list(regions or [])
+
     def start_selection(self):
         """开始区域选择"""
         # 创建全屏透明窗口用于区域选择
@@ -17,26 +28,41 @@ class RegionSelector:
         self.selector_window.attributes('-fullscreen', True)
         self.selector_window.attributes('-alpha', 0.3)
         self.selector_window.configure(bg='gray')
-        
+
         # 绑定鼠标事件
         self.selector_window.bind('<Button-1>', self.on_mouse_down)
         self.selector_window.bind('<B1-Motion>', self.on_mouse_drag)
         self.selector_window.bind('<ButtonRelease-1>', self.on_mouse_up)
         self.selector_window.bind('<Escape>', self.cancel_selection)
-        
+        if self.multi:
+            self.selector_window.bind('<Button-3>', self.on_right_click)
+            self.selector_window.bind('<Return>', self.finish_selection)
+
         # 显示提示
         self.canvas = tk.Canvas(self.selector_window, highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
+        # 屏幕尺寸直接从 Tk 读取，不需要为此导入 pyautogui
+        hint = "拖动添加区域，右键点击删除，Enter完成，按ESC取消" if self.multi else "拖动选择区域，按ESC取消"
         self.canvas.create_text(
-            pyautogui.size().width // 2, 
-            pyautogui.size().height // 2,
-            text="拖动选择区域，按ESC取消",
+            self.selector_window.winfo_screenwidth() // 2,
+            self.selector_window.winfo_screenheight() // 2,
+            text=hint,
             fill="white",
             font=("Arial", 16)
         )
-        
+        for region in self._initial:
+            self._add_rect(*region)
+
         self.selector_window.mainloop()
-    
+
+    def _add_rect(self, x1, y1, x2, y2, item=None):
+        region = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        if item is None:
+            item = self.canvas.create_rectangle(*region, outline='red', width=2)
+        else:
+            self.canvas.coords(item, *region)
+        self.rects[item] = region
+
     def on_mouse_down(self, event):
         self.start_x = event.x
         self.start_y = event.y
@@ -44,16 +70,37 @@ class RegionSelector:
             self.start_x, self.start_y, self.start_x, self.start_y,
             outline='red', width=2
         )
-    
+
     def on_mouse_drag(self, event):
         self.canvas.coords(self.rect, self.start_x, self.start_y, event.x, event.y)
-    
+
     def on_mouse_up(self, event):
         end_x, end_y = event.x, event.y
         region = (self.start_x, self.start_y, end_x, end_y)
+        if not self.multi:
+            self.selector_window.destroy()
+            self.on_region_selected(region)
+            return
+        if abs(end_x - self.start_x) < MIN_REGION_SIZE or abs(end_y - self.start_y) < MIN_REGION_SIZE:
+            self.canvas.delete(self.rect)
+        else:
+            self._add_rect(*region, item=self.rect)
+        self.rect = None
+
+    def on_right_click(self, event):
+        """删除包含点击位置的区域（重叠时删除最后添加的）"""
+        for item in reversed(list(self.rects)):
+            x1, y1, x2, y2 = self.rects[item]
+            if x1 <= event.x <= x2 and y1 <= event.y <= y2:
+                self.canvas.delete(item)
+                del self.rects[item]
+                return
+
+    def finish_selection(self, event=None):
+        regions = list(self.rects.values())
         self.selector_window.destroy()
-        self.on_region_selected(region)
-    
+        self.on_region_selected(regions)
+
     def cancel_selection(self, event):
         self.selector_window.destroy()
-        self.on_region_selected(None)
\ No newline at end of file
+        self.on_region_selected(None)
@@ -1,6 +1,4 @@
 #  Author: micr0softDrestlife
-import pystray
-from PIL import Image, ImageDraw
 import threading
 
 class TrayIcon:
@@ -10,6 +8,7 @@ class TrayIcon:
         
     def create_image(self):
         """创建托盘图标"""
+        from PIL import Image, ImageDraw
         image = Image.new('RGB', (64, 64), color='white')
         dc = ImageDraw.Draw(image)
         dc.rectangle([16, 16, 48, 48], fill='blue')
@@ -26,7 +25,8 @@ class TrayIcon:
         icon.stop()
     
     def setup_tray(self):
-        """设置系统托盘"""
+        """设置系统托盘（pystray 在这里才导入，可以放在后台线程中执行）"""
+        import pystray
         image = self.create_image()
         menu = pystray.Menu(
             pystray.MenuItem("显示窗口", self.show_window),
@@ -1,39 +1,74 @@
 import sys
 import os
+import json
+import multiprocessing
+import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from gui.main_window import MainWindow
-from gui.tray_icon import TrayIcon
-from core.ocr_engine import OCREngine
-from core.ai_client import OllamaClient
-from core.screenshot import ScreenshotManager
+# 启动计时从这里开始；main.py 顶层只导入轻量模块，cv2 / numpy / requests / pystray 等
+## 都在窗口出现之后由后台线程加载（OCR 进程池的 spawn 子进程也会重新导入本文件）
+from core import startup
+from core.metrics import configure_solve_log
 from config.settings import AppConfig
 
 class OCRAIApplication:
-    def __init__(self):
+    def __init__(self, startup_probe=False):
+        """startup_probe 为 True 时，可以 Solve 后输出启动各阶段耗时（JSON）并退出，供 benchmarks.startup 使用"""
         self.config = AppConfig()
+        self.startup_probe = startup_probe
+        self.ocr_engine = None
+        self.ai_client = None
+        self.screenshot_manager = None
         self.setup_components()
     
     def setup_components(self):
-        """初始化各个组件"""
-        # 初始化核心组件
-        self.ocr_engine = OCREngine(self.config.TESSERACT_PATH)# 初始化OCR引擎，传入tesseract路径
-        self.ai_client = OllamaClient(
-            self.config.OLLAMA_BASE_URL,
-            self.config.OLLAMA_MODEL
+        """初始化各个组件：先创建主窗口，OCR引擎 / AI客户端 / 截图模块在后台线程中加载并预热"""
+        from gui.main_window import MainWindow
+        from gui.tray_icon import TrayIcon
+
+        # 每次Solve的分阶段耗时写入轮转的 JSONL 日志
+        configure_solve_log(
+            self.config.METRICS_LOG_PATH,
+            max_bytes=self.config.METRICS_LOG_MAX_BYTES,
+            backup_count=self.config.METRICS_LOG_BACKUPS
         )
-        self.screenshot_manager = ScreenshotManager()
-        
-        # 初始化GUI, 传入配置以便MainWindow可以根据DEBUG等选项调整行为
-        self.main_window = MainWindow(
-            self.ocr_engine,
-            self.ai_client,
-            self.screenshot_manager,
-            self.config
+
+        # 初始化GUI, 传入配置以便MainWindow可以根据DEBUG等选项调整行为；组件加载完成前区域选择和Solve不可用
+        self.main_window = MainWindow(None, None, None, self.config)
+
+        # 后台加载：创建组件后交给主窗口，再预热 tesseract 和到AI服务的连接，第一次Solve不必再等待
+        self.loader = startup.BackgroundLoader(
+            self.config,
+            on_loaded=self._on_components_loaded,
+            on_ready=lambda: self.main_window.root.after(0, self._on_components_ready),
+            on_error=lambda e: self.main_window.root.after(0, lambda: self.main_window.on_components_error(e))
         )
-        
+
         # 初始化托盘图标
         self.tray_icon = TrayIcon(self)
+
+    def _on_components_loaded(self, ocr_engine, ai_client, screenshot_manager):
+        """（后台线程）组件创建完成，切回主线程交给主窗口"""
+        self.ocr_engine = ocr_engine
+        self.ai_client = ai_client
+        self.screenshot_manager = screenshot_manager
+        self.main_window.root.after(
+            0, lambda: self.main_window.attach_components(ocr_engine, ai_client, screenshot_manager)
+        )
+
+    def _on_components_ready(self):
+        self.main_window.on_components_ready()
+        if self.startup_probe:
+            print(json.dumps(startup.clock.milestones), flush=True)
+            self.quit()
+
+    def _start_tray(self):
+        """托盘图标在后台线程中创建（导入 pystray / PIL），不推迟窗口出现"""
+        try:
+            self.tray_icon.setup_tray()
+            self.tray_icon.run()
+        except Exception as e:
+            print(f"托盘图标启动失败: {e}")
     
     def show(self):
         """显示主窗口"""
@@ -48,9 +83,10 @@ class OCRAIApplication:
     
     def run(self):
         """运行应用"""
-        # 启动托盘图标
-        self.tray_icon.setup_tray()
-        self.tray_icon.run()
+        # 窗口进入主循环后再开始加载组件和托盘图标
+        self.main_window.root.after_idle(self.loader.start)
+        if not self.startup_probe:
+            self.main_window.root.after_idle(lambda: threading.Thread(target=self._start_tray, daemon=True).start())
         
         # 启动主窗口（可选隐藏启动）
         # self.main_window.root.withdraw()  # 隐藏启动
@@ -58,6 +94,21 @@ class OCRAIApplication:
         # 运行主循环
         self.main_window.run()
 
+def main(argv=None):
+    """不带参数时启动图形界面；python main.py batch ... 为批量模式，python main.py serve 为本地 HTTP 服务"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'batch':
+        from core.batch import main as batch_main
+        return batch_main(argv[1:])
+    if argv and argv[0] == 'serve':
+        from core.server import main as serve_main
+        return serve_main(argv[1:])
+
+    app = OCRAIApplication(startup_probe='--startup-probe' in argv)
+    app.run()
+    return 0
+
 if __name__ == "__main__":
-    app = OCRAIApplication()
-    app.run()
\ No newline at end of file
+    # OCR 进程池使用 spawn 启动工作进程，打包成 exe 后需要这一行
+    multiprocessing.freeze_support()
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+无界面批量模式的测试：输入展开、按序/乱序输出、断点续跑
+"""
+
+import asyncio
+import dataclasses
+import io
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.stub_server import StubAIServer
+from config.settings import AppConfig
+from core.batch import BatchRunner, JsonlWriter, iter_inputs, read_done
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+
+
+class PixelBackend(BaseOCRBackend):
+    """把图片左上角的灰度值当作识别结果，便于核对每张图片对应的输出"""
+    name = 'pixel'
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        value = int(image[0, 0])
+        return '' if value == 255 else f"题目{value}"
+
+
+def _images(tmp_path, values):
+    paths = []
+    for i, value in enumerate(values):
+        path = tmp_path / f"q{i:03d}.png"
+        Image.fromarray(np.full((20, 20), value, np.uint8)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _run(server, paths, ordered=True, skip=()):
+    config = dataclasses.replace(
+        AppConfig(), AI_PROVIDER='ollama', OLLAMA_BASE_URL=server.url,
+        AI_CACHE_ENABLED=False, AI_HEDGE_PROVIDER='', OCR_CACHE_ENABLED=False
+    )
+    engine = OCREngine(config=dataclasses.replace(config, OCR_PREPROCESS_PROFILE='none'), backend=PixelBackend())
+    runner = BatchRunner(config, engine=engine, workers=1, max_inflight=3, ordered=ordered)
+    out = io.StringIO()
+
+    async def go():
+        try:
+            return await runner.run(paths, JsonlWriter(out, ordered=ordered), skip=set(skip))
+        finally:
+            await runner.aclose()
+
+    counts = asyncio.run(go())
+    return counts, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_iter_inputs_directory_glob_and_stdin(tmp_path):
+    paths = _images(tmp_path, [0, 10])
+    (tmp_path / 'notes.txt').write_text('x')
+    assert list(iter_inputs([str(tmp_path)])) == paths
+    assert list(iter_inputs([str(tmp_path / '*.png')])) == paths
+    assert list(iter_inputs(['-'], stdin=io.StringIO(paths[1] + '\n\n'))) == [paths[1]]
+
+
+def test_ordered_output_and_statuses(tmp_path):
+    paths = _images(tmp_path, [0, 10, 255, 30])
+    with StubAIServer(answer='B') as server:
+        counts, records = _run(server, paths)
+    assert [r['path'] for r in records] == paths
+    assert [r['status'] for r in records] == ['ok', 'ok', 'no_text', 'ok']
+    assert records[1]['ocr_text'] == '题目10' and records[1]['answer'] == 'B'
+    assert 'ocr' in records[0]['timings_ms'] and 'ai_total' in records[0]['timings_ms']
+    assert counts == {'ok': 3, 'no_text': 1}
+
+
+def test_resume_skips_completed(tmp_path):
+    paths = _images(tmp_path, [0, 10, 20])
+    output = tmp_path / 'out.jsonl'
+    output.write_text(json.dumps({'path': paths[0], 'status': 'ok'}) + '\n'
+                      + json.dumps({'path': paths[1], 'status': 'error'}) + '\n'
+                      + '{"path": "trunc', encoding='utf-8')
+    done = read_done(str(output))
+    assert done == {paths[0]}
+    with StubAIServer(answer='B') as server:
+        counts, records = _run(server, paths, ordered=False, skip=done)
+    assert sorted(r['path'] for r in records) == paths[1:]
+    assert counts['skipped'] == 1
+
+
+class StuckHeadRunner(BatchRunner):
+    """第一张图片一直不完成，其余立即完成；记录开始处理的图片数"""
+
+    def __init__(self, config, **kwargs):
+        super().__init__(config, **kwargs)
+        self.started = 0
+        self.release_head = None
+
+    async def process(self, index, path, ocr_slots, ai_slots):
+        self.started += 1
+        if index == 0:
+            await self.release_head.wait()
+        return {'index': index, 'path': path, 'status': 'ok'}
+
+
+def test_ordered_window_bounds_reorder_buffer():
+    config = dataclasses.replace(AppConfig(), AI_PROVIDER='ollama', AI_CACHE_ENABLED=False, AI_HEDGE_PROVIDER='')
+    engine = OCREngine(config=config, backend=PixelBackend())
+    runner = StuckHeadRunner(config, engine=engine, workers=1, max_inflight=1)
+    out = io.StringIO()
+    writer = JsonlWriter(out)
+    paths = [f"q{i}.png" for i in range(50)]
+
+    async def go():
+        runner.release_head = asyncio.Event()
+        job = asyncio.ensure_future(runner.run(paths, writer))
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+        # window = workers * 2 + max_inflight * 2 = 4：卡住的第一张加上 3 条等待写出的记录
+        started, buffered = runner.started, len(writer._pending)
+        runner.release_head.set()
+        await job
+        await runner.aclose()
+        return started, buffered
+
+    started, buffered = asyncio.run(go())
+    assert started == 4 and buffered == 3
+    assert [json.loads(line)['index'] for line in out.getvalue().splitlines()] == list(range(50))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+基准测试套件的冒烟测试：语料渲染、统计与回归判断，以及跑通一轮完整流程
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from benchmarks.corpus import load_corpus
+from benchmarks.fake_capture import FakeScreenshotManager
+from benchmarks.run import char_accuracy, compare, format_report, run_benchmark, summarize
+
+
+def test_corpus_renders_english_at_every_resolution():
+    samples, _ = load_corpus(langs=['eng'])
+    assert {s.resolution for s in samples} == {'small', 'medium', 'large'}
+    for sample in samples:
+        assert sample.image.dtype == np.uint8 and sample.image.ndim == 3
+        # 有文字（不是纯背景）
+        assert sample.image.min() < 100
+
+
+def test_fake_capture_cycles_frames():
+    frames = [np.zeros((2, 2, 3), np.uint8), np.ones((2, 2, 3), np.uint8)]
+    capture = FakeScreenshotManager(frames)
+    assert [capture.capture_region() is f for f in frames * 2] == [True] * 4
+
+
+def test_char_accuracy_ignores_whitespace():
+    assert char_accuracy("题 目 A", "题目\nA") == 1.0
+    assert char_accuracy("", "abcd") == 0.0
+    assert abs(char_accuracy("abcx", "abcd") - 0.75) < 1e-9
+
+
+def test_compare_flags_regressions():
+    baseline = {'stages': {'ocr': summarize([0.100] * 10)}, 'accuracy': {'mean': 0.95}}
+    same = {'stages': {'ocr': summarize([0.105] * 10)}, 'accuracy': {'mean': 0.95}}
+    slower = {'stages': {'ocr': summarize([0.200] * 10)}, 'accuracy': {'mean': 0.80}}
+    assert compare(same, baseline) == []
+    regressions = compare(slower, baseline)
+    assert len(regressions) == 3  # p50、p95、准确率
+    assert '回归' in format_report(slower, regressions)
+
+
+def test_end_to_end_smoke():
+    report = run_benchmark(rounds=1, first_token_delay=0.0, token_delay=0.0,
+                           langs=['eng'], resolutions=['small'], log=lambda *_: None)
+    assert report['meta']['samples'] == 3
+    for stage in ('capture', 'preprocess', 'ai_first_token', 'ai_total', 'end_to_end'):
+        assert report['stages'][stage]['n'] == 3
+    if report['meta']['ocr_available']:
+        assert report['accuracy']['mean'] is not None
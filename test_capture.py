@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+截图 backend 的测试：帧源裁剪与回放、复用缓冲区、帧率统计、多区域一次截取，以及 XShm（需要 X11 显示）
+"""
+
+import dataclasses
+import hashlib
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from config.settings import AppConfig
+from core.capture_backend import FrameSourceBackend, XShmBackend, create_capture_backend
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+from core.preprocess import Grayscale, Invert, PreprocessPipeline
+from core.prompt import join_region_texts
+from core.screenshot import ScreenshotManager
+from core.watcher import RegionWatcher
+
+
+def _frames(n=2, w=64, h=48):
+    return [np.full((h, w, 3), 40 * (i + 1), np.uint8) for i in range(n)]
+
+
+def test_frame_source_crops_bbox_and_reuses_buffer():
+    manager = ScreenshotManager(backend=FrameSourceBackend(_frames()))
+    manager.set_region((60, 40, 10, 0))  # 反向拖动也会被规范化
+
+    first = manager.capture_region(reuse=True)
+    assert first.shape == (40, 50, 3) and first[0, 0, 0] == 40
+    second = manager.capture_region(reuse=True)
+    # 同一块缓冲区被新帧覆盖
+    assert second is first and first[0, 0, 0] == 80
+    # 不复用时每次返回新的数组
+    assert manager.capture_region() is not first
+    assert manager.frames == 3 and manager.stats_text().startswith('截图 file')
+
+
+def test_file_source_from_directory(tmp_path):
+    for i, frame in enumerate(_frames(3)):
+        Image.fromarray(frame).save(tmp_path / f"f{i}.png")
+    backend = create_capture_backend('file', source=str(tmp_path))
+    values = [backend.grab((0, 0, 8, 8))[0, 0, 0] for _ in range(4)]
+    assert values == [40, 80, 120, 40]
+
+
+def test_watcher_keeps_a_copy_of_the_trigger_frame():
+    manager = ScreenshotManager(backend=FrameSourceBackend(_frames(1)))
+    manager.set_region((0, 0, 64, 48))
+    triggered = []
+    watcher = RegionWatcher(manager, triggered.append, stable_frames=1)
+    assert watcher.poll_once()
+    assert not np.shares_memory(triggered[0], manager._buffer)
+
+
+def test_watcher_pending_cleared_only_by_its_trigger():
+    manager = ScreenshotManager(backend=FrameSourceBackend(_frames(3)))
+    manager.set_region((0, 0, 64, 48))
+    watcher = RegionWatcher(manager, lambda frame: None, stable_frames=1)
+    assert watcher.poll_once()
+    trigger = watcher.pending
+    # 手动 Solve（没有编号）或更早的触发结束，不会放行新的触发
+    watcher.mark_done(None)
+    watcher.mark_done(trigger - 1)
+    assert not watcher.poll_once() and watcher.pending == trigger
+    watcher.mark_done(trigger)
+    assert watcher.poll_once() and watcher.pending == trigger + 1
+
+
+def test_watcher_stop_waits_for_the_poll_thread():
+    manager = ScreenshotManager(backend=FrameSourceBackend(_frames(3)))
+    manager.set_region((0, 0, 64, 48))
+    watcher = RegionWatcher(manager, lambda frame: None, poll_hz=50.0)
+    watcher.start()
+    thread = watcher._thread
+    watcher.stop()
+    assert not thread.is_alive()
+    watcher.start()
+    assert watcher.running
+    watcher.stop()
+
+
+class ShadeBackend(BaseOCRBackend):
+    """把图像的灰度值当作识别结果，用来确认每个区域拿到的是自己的像素"""
+    name = 'shade'
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        return f"shade {int(image.mean())}"
+
+
+def test_multiple_regions_share_one_grab():
+    screen = np.zeros((100, 200, 3), np.uint8)
+    screen[10:30, 20:80] = 50     # 题目
+    screen[60:90, 120:190] = 150  # 选项
+    manager = ScreenshotManager(backend=FrameSourceBackend([screen]))
+    manager.add_region((20, 10, 80, 30), 'question')
+    options = manager.add_region((190, 90, 120, 60))
+    assert options == 'region1' and manager.selected_region == (20, 10, 190, 90)
+
+    views = manager.capture_regions()
+    assert list(views) == ['question', 'region1'] and manager.frames == 1
+    # 各区域都是同一次截图的视图，没有复制像素
+    assert views['question'].base is not None and views['question'].base is views['region1'].base
+    assert views['question'].shape == (20, 60, 3) and views['region1'].shape == (30, 70, 3)
+
+    config = dataclasses.replace(AppConfig(), OCR_CACHE_ENABLED=False, OCR_LAYOUT_ENABLED=False,
+                                 OCR_PREPROCESS_PROFILE='none', OCR_LANG_ROUTING=False, OCR_WORKERS=1)
+    texts = OCREngine(config=config, backend=ShadeBackend()).extract_regions(views, regions=manager.regions)
+    assert join_region_texts(texts) == 'shade 50\n\nshade 150'
+
+    manager.remove_region('question')
+    assert manager.selected_region == (120, 60, 190, 90)
+    assert list(manager.capture_regions()) == ['region1']
+
+
+@pytest.mark.skipif(not os.environ.get('DISPLAY'), reason='需要 X11 显示')
+def test_xshm_grabs_into_preallocated_buffer():
+    backend = XShmBackend()
+    try:
+        out = np.empty((32, 48, 3), np.uint8)
+        assert backend.grab((0, 0, 48, 32), out=out) is out
+        assert backend.grab((0, 0, 48, 32), out=out) is out
+    finally:
+        backend.close()
+
+
+class DigestBackend(BaseOCRBackend):
+    """把预处理后的像素哈希当作识别结果，任何像素差异都会改变结果"""
+    name = 'digest'
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        return hashlib.md5(np.ascontiguousarray(image).tobytes()).hexdigest()
+
+
+def test_parallel_regions_match_serial_preprocessing():
+    rng = np.random.default_rng(0)
+    images = {f"region{i}": rng.integers(0, 256, (60 + 10 * i, 240, 3), np.uint8) for i in range(8)}
+    # 默认预设包含 CLAHE 等有状态的 OpenCV 对象，各区域线程同时预处理时结果必须与逐个处理相同
+    config = dataclasses.replace(AppConfig(), OCR_CACHE_ENABLED=False, OCR_LAYOUT_ENABLED=False,
+                                 OCR_LANG_ROUTING=False, OCR_WORKERS=1, OCR_PREPROCESS_PROFILE='default')
+    engine = OCREngine(config=config, backend=DigestBackend())
+    serial = {name: engine.extract_text(image) for name, image in images.items()}
+    for _ in range(5):
+        assert dict(engine.extract_regions(images)) == serial
+
+
+class RecordingInvert(Invert):
+    """记录每次收到的缓冲区"""
+
+    def __init__(self, seen):
+        super().__init__()
+        self.seen = seen
+
+    def __call__(self, img):
+        self.seen.append(img)
+        return super().__call__(img)
+
+
+def test_inplace_stages_share_one_copy():
+    # 输入已经是灰度图（grayscale 原样返回）：第一个原地步骤复制一次，之后的原地步骤都在这份副本上进行
+    seen = []
+    pipeline = PreprocessPipeline([Grayscale()] + [RecordingInvert(seen) for _ in range(3)])
+    gray = np.full((130, 200), 40, np.uint8)
+    out = pipeline.run(gray)
+    assert seen[0] is not gray and all(img is seen[0] for img in seen)
+    assert out is seen[0]
+    assert int(gray[0, 0]) == 40 and int(out[0, 0]) == 215
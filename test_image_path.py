@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+测试截图 -> 预处理 -> OCR 后端之间的图像传递：统计每次 Solve 的整帧拷贝/分配
+"""
+
+import sys
+import os
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image, ImageGrab
+
+from core.ocr_backend import BaseOCRBackend, SubprocessBackend, parse_tsv
+from core.ocr_engine import OCREngine
+from core.capture_backend import ImageGrabBackend
+from core.screenshot import ScreenshotManager
+
+
+class RecordingBackend(BaseOCRBackend):
+    """记录收到的图像缓冲区，不真正调用 tesseract"""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.images = []
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        self.images.append(image)
+        return "题目 text\n"
+
+
+def _make_frame(w=1920, h=1080):
+    rng = np.random.default_rng(0)
+    frame = np.full((h, w, 3), 255, dtype=np.uint8)
+    # 模拟几行文字
+    for y in range(50, h - 50, 60):
+        frame[y:y + 20, 40:w - 40] = rng.integers(0, 80, size=(20, w - 80, 3), dtype=np.uint8)
+    return frame
+
+
+def _capture(monkeypatch, frame):
+    monkeypatch.setattr(ImageGrab, 'grab', lambda bbox=None: Image.fromarray(frame))
+    manager = ScreenshotManager(backend=ImageGrabBackend())
+    h, w = frame.shape[:2]
+    manager.set_region((0, 0, w, h))
+    return manager
+
+
+def test_capture_returns_single_uint8_buffer(monkeypatch):
+    frame = _make_frame()
+    manager = _capture(monkeypatch, frame)
+
+    tracemalloc.start()
+    try:
+        arr = manager.capture_region()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert arr.dtype == np.uint8 and arr.shape == frame.shape
+    # PIL -> NumPy 只保留一份整帧拷贝（tobytes 拼接时会有一份短暂的中间缓冲）
+    assert current < 1.1 * frame.nbytes
+    assert peak < 2.1 * frame.nbytes
+
+
+def test_backend_receives_capture_buffer_without_copy():
+    frame = _make_frame()
+    backend = RecordingBackend()
+    engine = OCREngine(backend=backend)
+
+    assert engine.extract_text(frame, preprocess=False) == "题目 text"
+    assert np.shares_memory(backend.images[0], frame)
+
+
+def test_preprocess_allocations_per_solve():
+    frame = _make_frame()
+    gray_nbytes = frame.shape[0] * frame.shape[1]
+    backend = RecordingBackend()
+    engine = OCREngine(backend=backend)
+    engine.extract_text(frame)  # 预热 OpenCV 内部状态
+
+    tracemalloc.start()
+    try:
+        engine.extract_text(frame)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    received = backend.images[-1]
+    assert received.dtype == np.uint8 and received.ndim == 2
+    # 灰度转换 + 双边滤波各一帧灰度，其余步骤原地完成
+    assert peak < 2.5 * gray_nbytes
+
+
+def test_subprocess_backend_encodes_in_memory():
+    gray = np.zeros((3, 4), dtype=np.uint8)
+    data = SubprocessBackend.encode_pnm(gray)
+    assert data.startswith(b'P5\n4 3\n255\n')
+    assert len(data) == len(b'P5\n4 3\n255\n') + gray.nbytes
+
+
+def _tsv(words):
+    header = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+    rows = [f"5\t1\t{b}\t{p}\t{l}\t{i}\t0\t0\t10\t10\t90\t{w}" for i, (b, p, l, w) in enumerate(words, 1)]
+    return '\n'.join([header] + rows)
+
+
+def test_parse_tsv_joins_cjk_like_text_output():
+    tsv = _tsv([(1, 1, 1, '下列'), (1, 1, 1, '说法'), (1, 1, 1, '正确的是'), (1, 1, 1, '？'),
+                (1, 1, 2, 'A.'), (1, 1, 2, 'Python'), (1, 1, 2, '是'), (1, 1, 2, '编译型语言'),
+                (2, 1, 1, 'hello'), (2, 1, 1, 'world')])
+    text, confidences = parse_tsv(tsv)
+    assert text == '下列说法正确的是？\nA. Python 是编译型语言\n\nhello world\n'
+    assert confidences == [90.0] * 10
+    assert parse_tsv(_tsv([])) == ('', [])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+增量识别的测试：按行间空白切出文字带，只识别新出现或变化了的文字带，滚动后的文字带直接复用
+"""
+
+import dataclasses
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from config.settings import AppConfig
+from core.layout import text_bands
+from core.metrics import SolveTrace
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+
+
+class LineBackend(BaseOCRBackend):
+    """把文字带中最深的灰度值当作识别结果，并记录识别次数"""
+    name = 'line'
+
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        self.calls += 1
+        return f"line {int(image.min())}"
+
+
+def _page(shades, top=10, line_h=12, gap=20, height=160):
+    """白底上画几行“文字”（不同灰度的横条）"""
+    page = np.full((height, 120, 3), 255, np.uint8)
+    for i, shade in enumerate(shades):
+        y = top + i * (line_h + gap)
+        page[y:y + line_h, 10:110] = shade
+    return page
+
+
+def test_text_bands_split_on_blank_rows():
+    bands = text_bands(_page([0, 30, 60]))
+    assert len(bands) == 3
+    # 带边距，且互不重叠
+    assert bands[0] == (6, 26)
+    assert all(a[1] <= b[0] for a, b in zip(bands, bands[1:]))
+    assert text_bands(np.full((40, 40, 3), 255, np.uint8)) == []
+
+
+def test_only_changed_bands_are_recognized():
+    config = dataclasses.replace(AppConfig(), OCR_CACHE_ENABLED=False, OCR_INCREMENTAL=True,
+                                 OCR_PREPROCESS_PROFILE='none', OCR_LANG_ROUTING=False, OCR_WORKERS=1)
+    backend = LineBackend()
+    engine = OCREngine(config=config, backend=backend)
+
+    assert engine.extract_text(_page([0, 30, 60])) == 'line 0\nline 30\nline 60'
+    assert backend.calls == 3
+
+    # 只换了最后一行（例如选项）
+    trace = SolveTrace()
+    assert engine.extract_text(_page([0, 30, 90]), trace=trace) == 'line 0\nline 30\nline 90'
+    assert backend.calls == 4
+    assert trace.meta['ocr_bands'] == {'total': 3, 'recognized': 1}
+
+    # 整体向上滚动了几像素：文字带内容不变，全部复用
+    meta = {}
+    assert engine.extract_text(_page([0, 30, 90], top=5), meta=meta) == 'line 0\nline 30\nline 90'
+    assert backend.calls == 4 and meta['ocr_bands'] == {'total': 3, 'recognized': 0}
+
+
+def test_default_config_does_not_start_pool(monkeypatch):
+    # 版面分析默认关闭：预热和大图识别都不拉起 OCR 进程池，输出与整图识别一致
+    def no_pool(*args, **kwargs):
+        raise AssertionError('OCR 进程池不应启动')
+    monkeypatch.setattr('core.ocr_engine.get_ocr_pool', no_pool)
+    backend = LineBackend()
+    engine = OCREngine(config=dataclasses.replace(AppConfig(), OCR_CACHE_ENABLED=False), backend=backend)
+    engine.warm_up()
+    big = np.full((800, 1600, 3), 255, np.uint8)
+    big[100:140, 100:1500] = 30
+    assert engine.extract_text(big, raise_errors=True) == 'line 0'
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Ollama 模型预加载与保活的测试：每个请求带上 keep_alive，预加载只加载不生成，
+模型被卸载后保活会重新加载，状态来自 /api/ps
+"""
+
+import dataclasses
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.stub_server import StubAIServer
+from config.settings import AppConfig
+from core.ai_client import get_ai_client
+from core.keep_warm import KeepWarm
+
+
+def _config(server, **overrides):
+    return dataclasses.replace(AppConfig(), AI_PROVIDER='ollama', OLLAMA_BASE_URL=server.url,
+                               OLLAMA_MODEL=server.model, AI_HEDGE_PROVIDER='', AI_CACHE_ENABLED=False,
+                               **overrides)
+
+
+def test_keep_alive_and_preload():
+    with StubAIServer(answer='B') as server:
+        client = get_ai_client(_config(server, OLLAMA_KEEP_ALIVE='-1'))
+        assert client.model_state() == 'unloaded'
+        assert client.preload()
+        assert client.model_state() == 'loaded'
+        assert client.generate_response('1+1=?') == 'B'
+
+        (_, preload), (_, generate) = server.requests
+        # 预加载不带 prompt，不会生成回答；'-1' 按数字发送
+        assert 'prompt' not in preload and preload['keep_alive'] == -1
+        assert generate['keep_alive'] == -1
+        assert server.loads == 1
+
+    # 远程提供方不需要预加载
+    remote = get_ai_client(dataclasses.replace(AppConfig(), AI_PROVIDER='ds', DEEPSEEK_API_KEY='test-key',
+                                                 AI_HEDGE_PROVIDER='', AI_CACHE_ENABLED=False))
+    assert remote.model_state() is None and not remote.preload()
+
+
+def test_keep_warm_reloads_unloaded_model():
+    with StubAIServer(load_delay=0.05) as server:
+        states = []
+        keeper = KeepWarm(get_ai_client(_config(server)), interval=60.0, on_state=states.append)
+        assert keeper.ping() == 'loaded'
+        assert states == ['loading', 'loaded']
+
+        # 已加载时只刷新常驻时间
+        assert keeper.ping() == 'loaded' and server.loads == 1
+
+        # 模型空闲过久被服务端卸载，下一次保活重新加载
+        server.loaded = False
+        assert keeper.ping() == 'loaded'
+        assert server.loads == 2
+        assert states[-2:] == ['loading', 'loaded']
+
+    # 服务不可达（新的客户端，不复用已建立的 keep-alive 连接）
+    assert KeepWarm(get_ai_client(_config(server))).ping() == 'offline'
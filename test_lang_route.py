@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+语言路由的测试：按样本文字选择语言模型、按选区记住判断结果、置信度过低时重新判断或改回完整的语言组合
+"""
+
+import dataclasses
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from config.settings import AppConfig
+from core.lang_route import choose_lang
+from core.metrics import SolveTrace
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+
+
+class MisleadingSampleBackend(BaseOCRBackend):
+    """样本条（选区的一小部分）只有英文，整个选区却以中文为主：只用 eng 识别整图时置信度很低"""
+    name = 'misleading'
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.calls = []
+
+    def recognize_data(self, image, lang=None, psm=None, oem=None):
+        self.calls.append(lang)
+        if image.shape != self.shape:
+            return 'Which of the following is correct', [90.0] * 5
+        if 'chi_sim' in lang:
+            return 'Which of the following 下列选项中哪一个是正确的', [90.0] * 5
+        return 'Which of the following T5 FUE BIE', [30.0] * 5
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        return self.recognize_data(image, lang, psm, oem)[0]
+
+
+class ScriptBackend(BaseOCRBackend):
+    """模拟中文题目：含 chi_sim 模型时识别正确（置信度高），只用 eng 时置信度很低"""
+    name = 'script'
+
+    def __init__(self, content='中文'):
+        self.content = content
+        self.calls = []
+
+    def recognize_data(self, image, lang=None, psm=None, oem=None):
+        self.calls.append(lang)
+        if self.content == '中文':
+            ok = 'chi_sim' in lang
+            return ('下列选项中哪一个是正确的' if ok else 'T5 FUE BIE'), [92.0 if ok else 20.0] * 3
+        return 'Which of the following is correct', [90.0] * 5
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        return self.recognize_data(image, lang, psm, oem)[0]
+
+
+def _engine(backend, **overrides):
+    config = dataclasses.replace(AppConfig(), OCR_CACHE_ENABLED=False, OCR_LAYOUT_ENABLED=False,
+                                 OCR_PREPROCESS_PROFILE='none', OCR_LANG_ROUTING=True, **overrides)
+    return OCREngine(config=config, backend=backend)
+
+
+def _frame():
+    frame = np.full((60, 200), 255, np.uint8)
+    frame[20:40, 10:190] = 0
+    return frame
+
+
+def test_choose_lang():
+    assert choose_lang('下列选项中哪一个是正确的 A. B.', 'chi_sim+eng') == 'chi_sim'
+    assert choose_lang('Which of the following is correct? A.', 'chi_sim+eng') == 'eng'
+    assert choose_lang('用 Python list comprehension 写一个', 'chi_sim+eng') == 'chi_sim+eng'
+    assert choose_lang('1+1', 'chi_sim+eng') is None
+    # 按字母计数：夹着代码的中文题目是混排，不能只用 chi_sim
+    question = '阅读下面的代码片段，运行之后变量的值是多少？请选择正确的答案 result = compute(values)'
+    assert choose_lang(question, 'chi_sim+eng') == 'chi_sim+eng'
+
+
+def test_region_remembers_detected_language():
+    backend = ScriptBackend()
+    engine = _engine(backend)
+    region = (0, 0, 200, 60)
+
+    assert engine.extract_text(_frame(), region=region) == '下列选项中哪一个是正确的'
+    # 样本判断（完整语言组合）+ 只用 chi_sim 的正式识别
+    assert backend.calls == ['chi_sim+eng', 'chi_sim']
+
+    backend.calls.clear()
+    engine.extract_text(_frame(), region=region)
+    assert backend.calls == ['chi_sim'] and engine.router.reused == 1
+
+
+def test_low_confidence_triggers_redetection():
+    backend = ScriptBackend(content='英文')
+    engine = _engine(backend)
+    region = (0, 0, 200, 60)
+    meta = {}
+    engine.extract_text(_frame(), region=region, meta=meta)
+    assert meta['ocr_lang'] == 'eng'
+
+    # 选区里换成了中文题目：eng 识别的置信度很低，重新判断后改用 chi_sim
+    backend.content = '中文'
+    backend.calls.clear()
+    assert engine.extract_text(_frame(), region=region) == '下列选项中哪一个是正确的'
+    assert backend.calls == ['eng', 'chi_sim+eng', 'chi_sim']
+    assert engine.router.remembered(region) == 'chi_sim'
+
+
+def test_first_decision_is_checked():
+    backend = MisleadingSampleBackend(_frame().shape)
+    engine = _engine(backend, OCR_LANG_FALLBACK_FRAMES=2)
+    region = (0, 0, 200, 60)
+
+    # 样本判断为英文，但只用 eng 识别整个选区置信度过低：改用完整的语言组合并记住
+    trace = SolveTrace()
+    assert engine.extract_text(_frame(), trace=trace, region=region) == 'Which of the following 下列选项中哪一个是正确的'
+    assert backend.calls == ['chi_sim+eng', 'eng', 'chi_sim+eng']
+    assert trace.meta['ocr_lang'] == 'chi_sim+eng'
+
+    # 完整的语言组合只沿用 OCR_LANG_FALLBACK_FRAMES 次，之后重新判断
+    for _ in range(2):
+        backend.calls.clear()
+        engine.extract_text(_frame(), region=region)
+        assert backend.calls == ['chi_sim+eng']
+    backend.calls.clear()
+    engine.extract_text(_frame(), region=region)
+    assert backend.calls == ['chi_sim+eng', 'eng', 'chi_sim+eng']
+
+
+def test_no_region_skips_detection():
+    # 批量 / HTTP 服务没有选区，判断结果无法复用：直接用完整的语言组合识别
+    backend = ScriptBackend()
+    engine = _engine(backend)
+    assert engine.extract_text(_frame()) == '下列选项中哪一个是正确的'
+    assert backend.calls == ['chi_sim+eng'] and engine.router.detections == 0
+
+
+def test_routing_is_opt_in():
+    assert not AppConfig().OCR_LANG_ROUTING
+    assert OCREngine(config=AppConfig(), backend=ScriptBackend()).router is None
+
+
+class RegionScriptBackend(BaseOCRBackend):
+    """深色文字的区域是中文题目，浅色文字的区域是英文题目"""
+    name = 'region-script'
+
+    def recognize_data(self, image, lang=None, psm=None, oem=None):
+        if image.min() < 50:
+            ok = 'chi_sim' in lang
+            return ('下列选项中哪一个是正确的' if ok else 'T5 FUE BIE'), [92.0 if ok else 20.0] * 3
+        return 'Which of the following is correct', [90.0] * 5
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        return self.recognize_data(image, lang, psm, oem)[0]
+
+
+def test_parallel_regions_report_their_own_language():
+    # 各区域在不同线程中识别，每个区域的语言记在自己的条目里，不会被最后完成的区域覆盖
+    engine = _engine(RegionScriptBackend(), OCR_WORKERS=1)
+    light = _frame()
+    light[20:40, 10:190] = 100
+    trace = SolveTrace()
+    texts = engine.extract_regions({'a': _frame(), 'b': light}, trace=trace,
+                                   regions={'a': (0, 0, 200, 60), 'b': (0, 60, 200, 60)})
+    assert texts == {'a': '下列选项中哪一个是正确的', 'b': 'Which of the following is correct'}
+    assert trace.meta['ocr_by_region'] == {'a': {'ocr_lang': 'chi_sim'}, 'b': {'ocr_lang': 'eng'}}
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Solve 分阶段计时、计数器/直方图以及 JSONL 日志的测试
+"""
+
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from core import metrics
+from core.metrics import SolveTrace, configure_solve_log
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+
+
+class EchoBackend(BaseOCRBackend):
+    name = 'echo'
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        return "题目"
+
+
+def test_trace_records_spans_and_histograms(tmp_path):
+    metrics.registry.reset()
+    log_path = tmp_path / 'solves.jsonl'
+    configure_solve_log(str(log_path))
+    try:
+        trace = SolveTrace(trigger='manual')
+        with trace.span('capture'):
+            pass
+        trace.add('ai_first_token', 0.25)
+        trace.add('ai_total', 0.5)
+        record = trace.finish('ok')
+    finally:
+        configure_solve_log('')
+
+    assert record['spans_ms']['ai_total'] == 500.0
+    assert '首字 250' in trace.summary_text()
+    snap = metrics.snapshot()
+    assert snap['counters']['solve.count'] == 1
+    assert snap['histograms']['solve.ai_total_ms']['p50'] == 500.0
+
+    lines = log_path.read_text(encoding='utf-8').splitlines()
+    assert json.loads(lines[0])['id'] == record['id']
+
+
+def test_ocr_engine_reports_preprocess_and_ocr_spans():
+    engine = OCREngine(backend=EchoBackend())
+    trace = SolveTrace()
+    assert engine.extract_text(np.full((40, 120, 3), 255, np.uint8), trace=trace) == "题目"
+    assert {'preprocess', 'ocr'} <= set(trace.spans)
+    assert 'grayscale' in trace.meta['preprocess_ms']
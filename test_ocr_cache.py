@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+OCR 结果缓存的测试：按条目数和字节数淘汰、SQLite 持久化、缓存键覆盖画面内容与识别设置
+"""
+
+import dataclasses
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from config.settings import AppConfig
+from core.frame_hash import frame_digest
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_cache import OCRCache
+from core.ocr_engine import OCREngine
+
+
+class CountingBackend(BaseOCRBackend):
+    """记录识别次数，结果带上使用的语言"""
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        self.calls += 1
+        return f"text {lang}"
+
+
+def _frame(shade=0):
+    frame = np.full((60, 200, 3), 255, np.uint8)
+    frame[20:40, 10:190] = shade
+    return frame
+
+
+def _engine(backend, **overrides):
+    settings = dict(OCR_CACHE_ENABLED=True, OCR_PREPROCESS_PROFILE='none')
+    settings.update(overrides)
+    config = dataclasses.replace(AppConfig(), **settings)
+    return OCREngine(config=config, backend=backend)
+
+
+def test_lru_evicts_by_entries():
+    cache = OCRCache(max_entries=2)
+    cache.put('a', '1')
+    cache.put('b', '2')
+    assert cache.get('a') == '1'
+    # b 最久没有使用，被淘汰
+    cache.put('c', '3')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1' and cache.get('c') == '3'
+    assert cache.stats()['entries'] == 2
+
+
+def test_lru_evicts_by_bytes():
+    # 按 UTF-8 字节数计算：每个汉字 3 字节
+    cache = OCRCache(max_entries=100, max_bytes=12)
+    cache.put('a', '中文')
+    cache.put('b', '题目')
+    assert cache.stats()['bytes'] == 12
+    cache.put('c', 'ABC')
+    assert cache.get('a') is None and cache.get('b') == '题目'
+    assert cache.stats()['bytes'] == 9
+    # 单条超过上限的结果不缓存，也不挤掉已有条目
+    cache.put('d', 'x' * 13)
+    assert cache.get('d') is None and cache.get('b') == '题目' and cache.get('c') == 'ABC'
+
+
+def test_sqlite_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'cache' / 'ocr.db')
+    cache = OCRCache(max_entries=2, db_path=path)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key.upper())
+
+    # 新实例（相当于重启）从数据库中读到结果；磁盘上同样只保留最近的 max_entries 条
+    reopened = OCRCache(max_entries=2, db_path=path)
+    assert reopened.get('c') == 'C' and reopened.get('b') == 'B'
+    assert reopened.get('a') is None
+    assert reopened.stats()['hits'] == 2
+
+    reopened.clear()
+    assert OCRCache(db_path=path).get('c') is None
+
+
+def test_frame_digest():
+    frame = _frame()
+    assert frame_digest(frame) == frame_digest(frame.copy())
+    # 文字变化、尺寸变化都会改变哈希
+    changed = frame.copy()
+    changed[20:40, 100:190] = 255
+    assert frame_digest(changed) != frame_digest(frame)
+    assert frame_digest(frame[:, :150]) != frame_digest(frame)
+    # 灰度图与同内容的 RGB 图一致
+    assert frame_digest(frame[:, :, 0].copy()) == frame_digest(frame)
+
+
+def test_cache_key_covers_settings():
+    frame = _frame()
+    base = _engine(CountingBackend())
+    key = base.cache_key(frame)
+    assert 'psm' in key and 'oem' in key
+    assert key == _engine(CountingBackend()).cache_key(frame.copy())
+    assert base.cache_key(frame, preprocess=False) != key
+    assert _engine(CountingBackend(), OCR_LANG='eng').cache_key(frame) != key
+    assert _engine(CountingBackend(), OCR_PREPROCESS_PROFILE='default').cache_key(frame) != key
+    assert base.cache_key(_frame(shade=128)) != key
+
+
+def test_engine_cache_hits_only_with_same_settings(tmp_path):
+    path = str(tmp_path / 'ocr.db')
+    backend = CountingBackend()
+    engine = _engine(backend, OCR_CACHE_PATH=path, OCR_LANG='eng')
+    assert engine.extract_text(_frame()) == 'text eng'
+    assert engine.extract_text(_frame()) == 'text eng'
+    assert backend.calls == 1
+
+    # 同一个数据库、不同的语言：不能用 eng 的结果
+    other = _engine(backend, OCR_CACHE_PATH=path, OCR_LANG='chi_sim')
+    assert other.extract_text(_frame()) == 'text chi_sim'
+    assert backend.calls == 2
+    # 同样的设置重启后直接命中
+    assert _engine(backend, OCR_CACHE_PATH=path, OCR_LANG='eng').extract_text(_frame()) == 'text eng'
+    assert backend.calls == 2
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+发送前整理 OCR 文本的测试：去噪和去掉界面文字、识别选择题、按题型设置回答长度
+"""
+
+import dataclasses
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.stub_server import StubAIServer
+from config.settings import AppConfig
+from core.ai_client import get_ai_client
+from core.prompt import build_prompt, count_tokens, detect_choices, normalize_ocr_text
+
+RAW = """第 3 题 / 共 20 题
+剩余时间 05:12
+| 下 列 哪 个 是 Python 的 关 键 字 ？  |
+A. lambda   B. func
+C． define  D、 method
+~~~ ||| ___
+上一题
+下一题
+"""
+
+
+def test_normalize_removes_noise_and_boilerplate():
+    text = normalize_ocr_text(RAW)
+    assert text.splitlines()[0] == '下列哪个是 Python 的关键字？'
+    for junk in ('剩余时间', '上一题', '下一题', '共 20 题', '|', '~'):
+        assert junk not in text
+    # 全角字母数字转半角，中文标点保持不变
+    assert normalize_ocr_text('ＡＢＣ１２３，中 文') == 'ABC123，中文'
+
+
+def test_choices_and_max_tokens():
+    stem, choices = detect_choices(normalize_ocr_text(RAW))
+    assert stem.endswith('关键字？')
+    assert [letter for letter, _ in choices] == ['A', 'B', 'C', 'D']
+    assert choices[2] == ('C', 'define')
+
+    plan = build_prompt(RAW, AppConfig(), provider='deepseek', simplify=True)
+    assert plan.question_type == 'choice'
+    assert plan.prompt.endswith('C. define\nD. method')
+    assert plan.max_tokens == 8
+    assert '字母' in plan.system_prompt
+    assert plan.tokens_sent < plan.tokens_raw and plan.tokens_saved > 0
+
+    config = dataclasses.replace(AppConfig(), PROMPT_MAX_TOKENS={'open': 2048})
+    plan = build_prompt('请解释 TCP 三 次 握 手 的 过 程', config)
+    assert (plan.question_type, plan.max_tokens, plan.system_prompt) == ('open', 2048, None)
+    assert plan.prompt == '请解释 TCP 三次握手的过程'
+
+    # 关闭整理时原样发送
+    config = dataclasses.replace(AppConfig(), PROMPT_COMPACT=False)
+    assert build_prompt(RAW, config).prompt == RAW.strip()
+    # OpenAI 的词表对汉字更不紧凑
+    assert count_tokens('下列哪个是关键字', 'openai') > count_tokens('下列哪个是关键字', 'deepseek')
+
+
+def test_max_tokens_reaches_the_request():
+    with StubAIServer(answer='B') as server:
+        for provider in ('ollama', 'ds'):
+            config = dataclasses.replace(
+                AppConfig(), AI_PROVIDER=provider, OLLAMA_BASE_URL=server.url,
+                DEEPSEEK_API_URL=server.openai_url, DEEPSEEK_API_KEY='test-key',
+                AI_HEDGE_PROVIDER='', AI_CACHE_ENABLED=False
+            )
+            assert get_ai_client(config).generate_response('1+1=?', max_tokens=8) == 'B'
+        (_, ollama), (_, openai) = server.requests
+        assert ollama['options'] == {'num_predict': 8}
+        assert openai['max_tokens'] == 8
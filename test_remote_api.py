@@ -1,67 +1,208 @@
 #!/usr/bin/env python3
 """
 测试远程API支持的脚本
+
+客户端通过 get_ai_client(config) 创建，请求发给本地的 StubAIServer（模拟 Ollama 和
+OpenAI 兼容接口），不需要真实的模型服务或 API 密钥。
 """
 
+import asyncio
+import dataclasses
+import threading
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from core.ai_client import AIClientFactory
+from benchmarks.stub_server import StubAIServer
+from core.ai_cache import AnswerCache, CachedAIClient
+from core.ai_client import get_ai_client, is_error_response, OllamaClient, OpenAIClient
 from config.settings import AppConfig
 
-def test_ollama_client():
-    """测试Ollama客户端"""
-    print("=== 测试Ollama客户端 ===")
-    try:
-        client = AIClientFactory.create_client(
-            provider='ollama',
-            base_url='http://localhost:11434',
-            model='qwen3:4b'
-        )
-        response = client.generate_response("你好，请简单介绍一下你自己")
-        print(f"Ollama响应: {response}")
-        print("✅ Ollama客户端测试通过")
-    except Exception as e:
-        print(f"❌ Ollama客户端测试失败: {e}")
+ANSWER = "答案：B，因为题干给出的条件只满足B"
+
+
+def _config(server, provider):
+    return dataclasses.replace(
+        AppConfig(),
+        AI_PROVIDER=provider,
+        OLLAMA_BASE_URL=server.url,
+        DEEPSEEK_API_URL=server.openai_url,
+        DEEPSEEK_API_KEY='test-key',
+        QIANWEN_API_URL=server.openai_url,
+        QIANWEN_API_KEY='test-key',
+        AI_HEDGE_PROVIDER='',
+        AI_CACHE_ENABLED=False,
+    )
 
-def test_openai_client():
-    """测试OpenAI客户端"""
-    print("\n=== 测试OpenAI客户端 ===")
-    config = AppConfig()
-    if not config.OPENAI_API_KEY:
-        print("⚠️ OpenAI API密钥未设置，跳过测试")
-        return
-    
-    try:
-        client = AIClientFactory.create_client(
-            provider='openai',
-            api_key=config.OPENAI_API_KEY,
-            base_url=config.OPENAI_BASE_URL,
-            model=config.OPENAI_MODEL
-        )
-        response = client.generate_response("你好，请简单介绍一下你自己")
-        print(f"OpenAI响应: {response}")
-        print("✅ OpenAI客户端测试通过")
-    except Exception as e:
-        print(f"❌ OpenAI客户端测试失败: {e}")
 
 def test_config_loading():
     """测试配置加载"""
-    print("\n=== 测试配置加载 ===")
-    try:
-        config = AppConfig()
-        print(f"AI提供商: {config.AI_PROVIDER}")
-        print(f"Ollama URL: {config.OLLAMA_BASE_URL}")
-        print(f"Ollama模型: {config.OLLAMA_MODEL}")
-        print(f"OpenAI模型: {config.OPENAI_MODEL}")
-        print("✅ 配置加载测试通过")
-    except Exception as e:
-        print(f"❌ 配置加载测试失败: {e}")
+    config = AppConfig()
+    assert config.AI_PROVIDER
+    assert config.OLLAMA_BASE_URL.startswith('http')
+    assert config.OLLAMA_MODEL
+
+
+def test_missing_api_key_falls_back_to_ollama():
+    """默认使用本地 Ollama；远程提供方没有 API key 时也改用 Ollama，而不是每次都返回“未配置”"""
+    config = dataclasses.replace(AppConfig(), AI_HEDGE_PROVIDER='', AI_CACHE_ENABLED=False)
+    assert isinstance(get_ai_client(config), OllamaClient)
+    for provider in ('ds', 'qw', 'openai'):
+        assert isinstance(get_ai_client(dataclasses.replace(config, AI_PROVIDER=provider)), OllamaClient)
+    keyed = dataclasses.replace(config, AI_PROVIDER='ds', DEEPSEEK_API_KEY='test-key')
+    assert isinstance(get_ai_client(keyed), OpenAIClient)
+
+
+def test_ollama_client():
+    """测试Ollama客户端：非流式、流式和异步三种调用方式"""
+    with StubAIServer(answer=ANSWER) as server:
+        client = get_ai_client(_config(server, 'ollama'))
+        assert isinstance(client, OllamaClient)
+        assert client.generate_response("你好，请简单介绍一下你自己") == ANSWER
+        assert ''.join(client.stream_response("你好")) == ANSWER
+        assert asyncio.run(client.agenerate_response("你好")) == ANSWER
+        path, body = server.requests[0]
+        assert path == '/api/generate'
+        assert body['prompt'] == "你好，请简单介绍一下你自己"
+
+
+def test_openai_client():
+    """测试OpenAI兼容客户端（deepseek / qianwen 共用同一实现）"""
+    with StubAIServer(answer=ANSWER) as server:
+        for provider in ('ds', 'qw'):
+            client = get_ai_client(_config(server, provider))
+            assert isinstance(client, OpenAIClient)
+            assert client.generate_response("你好") == ANSWER
+            assert ''.join(client.stream_response("你好")) == ANSWER
+        assert all(path == '/v1/chat/completions' for path, _ in server.requests)
+
+
+def test_cached_client_skips_second_request():
+    with StubAIServer(answer=ANSWER) as server:
+        config = dataclasses.replace(_config(server, 'ollama'), AI_CACHE_ENABLED=True, AI_CACHE_PATH='')
+        client = get_ai_client(config)
+        assert client.generate_response("同一个问题") == ANSWER
+        assert client.generate_response("同一个问题 ") == ANSWER
+        assert len(server.requests) == 1
+
+
+def test_cached_client_caches_multiline_stream():
+    """流式回答中只含换行/空格的一段是正常输出，整段回答仍会被缓存"""
+    answer = "答案：B\n\n理由： 条件只满足 B"
+    with StubAIServer(answer=answer, chunk_size=1) as server:
+        config = dataclasses.replace(_config(server, 'ollama'), AI_CACHE_ENABLED=True, AI_CACHE_PATH='')
+        client = get_ai_client(config)
+        chunks = list(client.stream_response("多行的问题"))
+        assert '\n' in chunks and ' ' in chunks
+        assert ''.join(chunks) == answer
+        assert ''.join(client.stream_response("多行的问题")) == answer
+        assert asyncio.run(client.agenerate_response("多行的问题")) == answer
+        assert len(server.requests) == 1
+
+
+def test_read_timeout_is_not_retried():
+    """请求已经发出后读取超时不重发：重发会让服务端再生成（并计费）一次"""
+    with StubAIServer(answer=ANSWER, first_token_delay=1.0) as server:
+        config = dataclasses.replace(_config(server, 'ollama'), AI_READ_TIMEOUT=0.2, AI_RETRY_BACKOFF=0.01)
+        client = get_ai_client(config)
+        assert is_error_response(client.generate_response("慢问题"))
+
+        async def agenerate():
+            try:
+                return await client.agenerate_response("慢问题")
+            finally:
+                await client.aclose()
+
+        assert is_error_response(asyncio.run(agenerate()))
+        assert len(server.requests) == 2
+
+
+def test_cache_hits_do_not_write():
+    """命中只读数据库，最近使用时间攒够一批或下一次写入时才提交"""
+    cache = AnswerCache()
+    cache.put('a', '答案A')
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    for _ in range(5):
+        assert cache.get('a') == '答案A'
+    assert all(sql.startswith('SELECT') for sql in statements)
+    cache.put('b', '答案B')
+    assert any(sql.startswith('UPDATE') for sql in statements)
+
+
+def test_async_cache_io_runs_off_the_loop():
+    class RecordingCache(AnswerCache):
+        def get(self, key):
+            threads.add(threading.current_thread())
+            return super().get(key)
+
+        def put(self, key, answer):
+            threads.add(threading.current_thread())
+            super().put(key, answer)
+
+    threads = set()
+    with StubAIServer(answer=ANSWER) as server:
+        client = CachedAIClient(get_ai_client(_config(server, 'ollama')), RecordingCache())
+
+        async def run():
+            try:
+                first = await client.agenerate_response("问题")
+                second = ''.join([chunk async for chunk in client.astream_response("问题")])
+                return first, second
+            finally:
+                await client.aclose()
+
+        assert asyncio.run(run()) == (ANSWER, ANSWER)
+        assert len(server.requests) == 1
+    assert threads and threading.main_thread() not in threads
+
+
+def _generate_both(client, prompt):
+    """同步与异步接口各请求一次"""
+    async def agenerate():
+        try:
+            return await client.agenerate_response(prompt)
+        finally:
+            await client.aclose()
+
+    return client.generate_response(prompt), asyncio.run(agenerate())
+
+
+def test_reset_before_response_is_retried():
+    """服务端没有返回任何字节就断开（被关闭的 keep-alive 连接）：请求没有被处理，重试一次"""
+    with StubAIServer(answer=ANSWER) as server:
+        client = get_ai_client(dataclasses.replace(_config(server, 'ollama'), AI_RETRY_BACKOFF=0.01))
+        client.generate_response("预热连接")
+        server.requests.clear()
+        server.disconnects = 2
+        assert _generate_both(client, "问题") == (ANSWER, ANSWER)
+        assert server.disconnects == 0 and len(server.requests) == 2
+
+
+def test_post_retries_only_unprocessed_statuses():
+    """503 按 Retry-After 重试；500 说明请求已经到达服务端，不重发"""
+    with StubAIServer(answer=ANSWER) as server:
+        client = get_ai_client(dataclasses.replace(_config(server, 'ollama'), AI_RETRY_BACKOFF=0.01))
+        server.fail_statuses = [503, 503]
+        assert _generate_both(client, "问题") == (ANSWER, ANSWER)
+        assert len(server.requests) == 4
+
+        server.requests.clear()
+        server.fail_statuses = [500, 500]
+        assert all(is_error_response(answer) for answer in _generate_both(client, "问题"))
+        assert len(server.requests) == 2 and not server.fail_statuses
+
 
 if __name__ == "__main__":
     print("开始测试远程API支持...")
-    test_config_loading()
-    test_ollama_client()
-    test_openai_client()
+    for test in (test_config_loading, test_missing_api_key_falls_back_to_ollama, test_ollama_client,
+                 test_openai_client, test_cached_client_skips_second_request,
+                 test_cached_client_caches_multiline_stream, test_read_timeout_is_not_retried,
+                 test_reset_before_response_is_retried, test_post_retries_only_unprocessed_statuses,
+                 test_cache_hits_do_not_write, test_async_cache_io_runs_off_the_loop):
+        try:
+            test()
+            print(f"✅ {test.__name__} 通过")
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
     print("\n测试完成！")
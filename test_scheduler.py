@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Solve 调度器的测试：新的 Solve 取消旧的、排队的 Solve 合并为最新一次、取消时中断进行中的 AI 流式请求
+"""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from benchmarks.stub_server import StubAIServer
+from config.settings import AppConfig
+from core.ai_client import get_ai_client
+from core.event_loop import AsyncLoopThread
+from core.scheduler import SolveScheduler
+
+
+def test_latest_submission_wins():
+    scheduler = SolveScheduler(AsyncLoopThread(name='test-scheduler'))
+    started = threading.Event()
+    skipped = []
+
+    async def slow(request_id):
+        started.set()
+        await asyncio.sleep(30)
+
+    async def quick(request_id):
+        return request_id
+
+    first_id, first = scheduler.submit(slow)
+    assert started.wait(5)
+    second_id, second = scheduler.submit(quick, on_skip=skipped.append)
+    third_id, third = scheduler.submit(quick, on_skip=skipped.append)
+
+    assert third.result(5) == third_id
+    assert scheduler.is_current(third_id) and not scheduler.is_current(first_id)
+    with pytest.raises(concurrent.futures.CancelledError):
+        first.result(5)
+    # 第二次提交在等待第一次退出时就被第三次取代，没有运行
+    with pytest.raises(concurrent.futures.CancelledError):
+        second.result(5)
+    assert skipped == [second_id]
+
+    # cancel() 之后没有任何请求是最新的，迟到的结果都会被丢弃
+    scheduler.cancel()
+    assert not scheduler.is_current(third_id)
+    scheduler.shutdown()
+    scheduler.loop_thread.stop()
+
+
+def test_superseding_aborts_streaming_request():
+    with StubAIServer(answer='x' * 200, first_token_delay=0.0, token_delay=0.1, chunk_size=1) as server:
+        config = dataclasses.replace(AppConfig(), AI_PROVIDER='ollama', OLLAMA_BASE_URL=server.url,
+                                     AI_HEDGE_PROVIDER='', AI_CACHE_ENABLED=False)
+        client = get_ai_client(config)
+        scheduler = SolveScheduler(AsyncLoopThread(name='test-scheduler'))
+        chunks = []
+        first_chunk = threading.Event()
+
+        async def stream(request_id):
+            async for chunk in client.astream_response('题目'):
+                chunks.append(chunk)
+                first_chunk.set()
+
+        async def quick(request_id):
+            return 'done'
+
+        _, first = scheduler.submit(stream)
+        assert first_chunk.wait(5)
+        began = time.perf_counter()
+        _, second = scheduler.submit(quick)
+        assert second.result(5) == 'done'
+        assert time.perf_counter() - began < 1.0
+        assert first.cancelled()
+        received = len(chunks)
+        time.sleep(0.3)
+        # 连接已释放，之后不再收到任何输出
+        assert len(chunks) == received < 200
+        scheduler.loop_thread.run(client.aclose(), timeout=5)
+        scheduler.shutdown()
+        scheduler.loop_thread.stop()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+本地 HTTP 服务模式的测试：文字/图片请求、健康检查、无效请求，队列满或 AI 积压时的 429，以及超时请求被取消
+"""
+
+import dataclasses
+import http.client
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.stub_server import StubAIServer
+from config.settings import AppConfig
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+from core.server import SolveServer, SolveService
+
+
+class GatedBackend(BaseOCRBackend):
+    """gate 打开之前阻塞识别，用来把队列塞满"""
+    name = 'gated'
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        self.entered.set()
+        self.gate.wait(10)
+        return "题目"
+
+
+def _post(url, data, content_type):
+    request = urllib.request.Request(url + '/solve', data=data, headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _png():
+    buf = io.BytesIO()
+    Image.fromarray(np.full((40, 120, 3), 200, np.uint8)).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def _start(ai, backend, queue_size=4, max_inflight=None, request_timeout=180.0):
+    config = dataclasses.replace(
+        AppConfig(), AI_PROVIDER='ollama', OLLAMA_BASE_URL=ai.url,
+        AI_CACHE_ENABLED=False, AI_HEDGE_PROVIDER='', OCR_CACHE_ENABLED=False, OCR_PREPROCESS_PROFILE='none'
+    )
+    engine = OCREngine(config=config, backend=backend)
+    service = SolveService(config, engine=engine, workers=1, queue_size=queue_size, max_inflight=max_inflight)
+    return SolveServer(service, port=0, request_timeout=request_timeout).start()
+
+
+def _wait(predicate, timeout=10):
+    for _ in range(int(timeout / 0.02)):
+        if predicate():
+            return True
+        threading.Event().wait(0.02)
+    return predicate()
+
+
+def test_text_image_and_health():
+    with StubAIServer(answer='B') as ai:
+        server = _start(ai, GatedBackend())
+        try:
+            status, result = _post(server.url, json.dumps({'text': '1+1=?'}).encode(), 'application/json')
+            assert status == 200 and result['answer'] == 'B' and 'ai_total' in result['timings_ms']
+
+            status, result = _post(server.url, _png(), 'image/png')
+            assert status == 200 and result['ocr_text'] == '题目'
+            assert {'queue_wait', 'load', 'ocr', 'ai_total'} <= set(result['timings_ms'])
+
+            status, _ = _post(server.url, b'not an image', 'image/png')
+            assert status == 400
+
+            with urllib.request.urlopen(server.url + '/health', timeout=5) as resp:
+                health = json.loads(resp.read())
+            assert health['status'] == 'ok' and health['capacity'] == 4
+        finally:
+            server.stop()
+
+
+def test_queue_full_returns_429():
+    backend = GatedBackend()
+    backend.gate.clear()
+    with StubAIServer(answer='B') as ai:
+        server = _start(ai, backend, queue_size=1)
+        results = []
+        try:
+            # 第一个请求占住工作线程，第二个排队，第三个应被拒绝；
+            # 等第一个请求进入识别后再发第二个，否则两者会争抢唯一的队列位置
+            threads = [threading.Thread(target=lambda: results.append(_post(server.url, _png(), 'image/png')))
+                       for _ in range(2)]
+            threads[0].start()
+            assert backend.entered.wait(10)
+            threads[1].start()
+            assert _wait(lambda: server.service.queue.qsize() == 1)
+            status, body = _post(server.url, _png(), 'image/png')
+            assert status == 429 and body['error'] == 'queue full'
+        finally:
+            backend.gate.set()
+            for t in threads:
+                t.join(10)
+            server.stop()
+        assert sorted(s for s, _ in results) == [200, 200]
+
+
+def test_slow_ai_returns_429():
+    # OCR 很快、AI 很慢：识别完的请求仍占着名额，积压到上限后拒绝新请求
+    with StubAIServer(answer='B', first_token_delay=1.0) as ai:
+        server = _start(ai, GatedBackend(), queue_size=1, max_inflight=1)
+        service = server.service
+        assert service.max_pending == 3
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(_post(server.url, _png(), 'image/png')))
+                   for _ in range(3)]
+        try:
+            # 逐个发送：每个请求都已离开队列（识别完，在等 AI）后再发下一个
+            for i, t in enumerate(threads, 1):
+                t.start()
+                assert _wait(lambda: service.health()['pending'] == i and service.queue.qsize() == 0)
+            status, body = _post(server.url, _png(), 'image/png')
+            assert status == 429 and body['error'] == 'queue full'
+        finally:
+            for t in threads:
+                t.join(10)
+            server.stop()
+        assert sorted(s for s, _ in results) == [200, 200, 200]
+        assert service.health()['pending'] == 0
+
+
+def test_timeout_cancels_ai_request():
+    with StubAIServer(answer='B', first_token_delay=5.0) as ai:
+        server = _start(ai, GatedBackend(), request_timeout=0.3)
+        service = server.service
+        try:
+            status, body = _post(server.url, json.dumps({'text': '1+1=?'}).encode(), 'application/json')
+            assert status == 504 and body['error'] == 'timeout'
+            # AI 请求被取消，名额立即归还，不会等 AI 答完
+            assert _wait(lambda: service.health()['ai_inflight'] == 0 and service.health()['pending'] == 0,
+                         timeout=2)
+        finally:
+            server.stop()
+
+
+def _raw_post(url, body, headers):
+    host, port = url.split('//', 1)[1].split(':')
+    conn = http.client.HTTPConnection(host, int(port), timeout=10)
+    try:
+        conn.putrequest('POST', '/solve')
+        for key, value in headers.items():
+            conn.putheader(key, value)
+        conn.endheaders(body)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def test_invalid_requests():
+    with StubAIServer(answer='B') as ai:
+        server = _start(ai, GatedBackend())
+        try:
+            json_type = {'Content-Type': 'application/json'}
+            assert _raw_post(server.url, None, json_type)[0] == 411
+            assert _raw_post(server.url, None, dict(json_type, **{'Content-Length': '-1'}))[0] == 400
+            assert _raw_post(server.url, None, dict(json_type, **{'Content-Length': 'abc'}))[0] == 400
+            assert _raw_post(server.url, None, dict(json_type, **{'Content-Length': str(1 << 30)}))[0] == 413
+            for body in (b'[]', b'"x"', b'{"text": 5}'):
+                status, result = _post(server.url, body, 'application/json')
+                assert status == 400 and result['error']
+            assert ai.requests == []
+        finally:
+            server.stop()
+
+
+def test_ai_error_returns_502():
+    with StubAIServer(answer='B') as ai:
+        ai.fail_statuses = [500]
+        server = _start(ai, GatedBackend())
+        try:
+            status, result = _post(server.url, json.dumps({'text': '1+1=?'}).encode(), 'application/json')
+            assert status == 502 and result['status'] == 'ai_error'
+        finally:
+            server.stop()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+推测识别的测试：同一画面只识别一次，Solve 时画面未变直接拿到结果，画面或区域变化后不再命中
+"""
+
+import dataclasses
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from config.settings import AppConfig
+from core.capture_backend import FrameSourceBackend
+from core.ocr_backend import BaseOCRBackend
+from core.ocr_engine import OCREngine
+from core.screenshot import ScreenshotManager
+from core.speculative import SpeculativeOCR
+
+
+class CountingBackend(BaseOCRBackend):
+    """记录识别次数；release 之前识别一直阻塞，用来模拟 Solve 时推测识别还没完成"""
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def recognize(self, image, lang=None, psm=None, oem=None):
+        self.release.wait(5)
+        self.calls += 1
+        return f"text {int(image.mean())}"
+
+
+def _setup():
+    screen = np.full((40, 80, 3), 60, np.uint8)
+    manager = ScreenshotManager(backend=FrameSourceBackend([screen]))
+    manager.set_region((0, 0, 80, 40))
+    config = dataclasses.replace(AppConfig(), OCR_CACHE_ENABLED=False, OCR_LAYOUT_ENABLED=False,
+                                 OCR_PREPROCESS_PROFILE='none', OCR_LANG_ROUTING=False, OCR_WORKERS=1)
+    backend = CountingBackend()
+    return manager, backend, SpeculativeOCR(OCREngine(config=config, backend=backend), manager)
+
+
+def test_solve_reuses_speculative_result():
+    manager, backend, speculative = _setup()
+    frame = manager.capture_region()
+    future = speculative.schedule(frame)
+    # 同一画面再次触发不会重复识别
+    assert speculative.schedule(frame.copy()) is future
+
+    # Solve 截到的新帧内容相同：拿到的是同一个（还在进行的）识别
+    pending = speculative.lookup(manager.capture_region())
+    assert pending is future and not pending.done()
+    backend.release.set()
+    assert pending.result(5) == 'text 60'
+    assert backend.calls == 1 and (speculative.runs, speculative.hits) == (1, 1)
+    speculative.shutdown()
+
+
+def test_changed_frame_or_regions_miss():
+    manager, backend, speculative = _setup()
+    backend.release.set()
+    frame = manager.capture_region()
+    speculative.schedule(frame).result(5)
+
+    changed = frame.copy()
+    changed[10:30, 10:70] = 200
+    assert speculative.lookup(changed) is None
+
+    # 同样的像素，区域不同也不能使用
+    manager.set_region((0, 0, 40, 40))
+    assert speculative.lookup(frame) is None
+    manager.set_region((0, 0, 80, 40))
+    assert speculative.lookup(frame) is not None
+    # 清除选区后作废
+    speculative.invalidate()
+    assert speculative.lookup(frame) is None
+    assert (speculative.hits, speculative.misses) == (1, 3)
+    speculative.shutdown()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+启动时间测试：导入 main.py 不加载重模块，冷启动到可以 Solve 的时间在预算之内
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from benchmarks.startup import BUDGET_MS, over_budget, probe_gui, probe_headless
+from benchmarks.stub_server import StubAIServer
+
+
+def test_headless_startup_within_budget():
+    with StubAIServer() as server:
+        result = probe_headless({'AI_PROVIDER': 'ollama', 'OLLAMA_BASE_URL': server.url, 'AI_HEDGE_PROVIDER': ''})
+    assert result['heavy_modules'] == []
+    milestones = result['milestones']
+    assert {'import_main', 'components', 'solve_ready'} <= set(milestones)
+    assert over_budget(milestones) == {}
+
+
+@pytest.mark.skipif(sys.platform.startswith('linux') and not os.environ.get('DISPLAY'), reason='需要显示器')
+def test_window_appears_before_components_load():
+    milestones = probe_gui()['milestones']
+    assert milestones['window'] < milestones['solve_ready']
+    assert milestones['window'] <= BUDGET_MS['window']